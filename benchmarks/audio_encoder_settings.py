@@ -0,0 +1,66 @@
+"""
+Reports the total media bytes of a deck encoded with the old settings (mp3 at 128 kbps, silence kept)
+and with the given encoder settings. The clips are synthetic speech-like noise with the leading and trailing
+silence the synthesizers produce: short word clips and longer sentence clips, like the cards of a deck.
+Needs lame, and opusenc for `--codec opus`.
+
+Usage: uv run python benchmarks/audio_encoder_settings.py [--words 50] [--codec mp3] [--bitrate 64] [--vbr]
+"""
+
+import argparse
+import asyncio
+import time
+
+import numpy as np
+
+from app.tts import AudioEncoderSettings, audio_codec_choices
+
+_SAMPLE_RATE = 22050
+
+
+def _speech_like_clip(rng: np.random.Generator, speech_seconds: float) -> np.ndarray:
+    speech_samples = int(speech_seconds * _SAMPLE_RATE)
+    # Syllables of about 200ms
+    envelope = np.abs(np.sin(np.linspace(0, np.pi * speech_seconds * 5, speech_samples)))
+    speech = rng.normal(0, 4000, speech_samples) * envelope
+    silence_before = np.zeros(int(0.3 * _SAMPLE_RATE))
+    silence_after = np.zeros(int(0.6 * _SAMPLE_RATE))
+    return np.concatenate([silence_before, speech, silence_after]).astype(np.int16)
+
+
+async def _encode_deck(encoder: AudioEncoderSettings, clips: list[np.ndarray]) -> tuple[int, float]:
+    start = time.perf_counter()
+    encoded = await asyncio.gather(*[encoder.encode_pcm(clip, _SAMPLE_RATE) for clip in clips])
+    return sum(len(audio) for audio in encoded), time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--words", type=int, default=50, help="Number of cards, each with a word and a sentence clip")
+    parser.add_argument("--codec", choices=audio_codec_choices(), default="mp3")
+    parser.add_argument("--bitrate", type=int, default=64)
+    parser.add_argument("--vbr", action="store_true")
+    parser.add_argument("--no-trim-silence", action="store_true")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    clips = [_speech_like_clip(rng, 0.6) for _ in range(args.words)]
+    clips += [_speech_like_clip(rng, 2.5) for _ in range(args.words)]
+    encoders = {
+        "before (mp3 128 kbps)": AudioEncoderSettings(bitrate_kbps=128, trim_silence=False),
+        "after": AudioEncoderSettings(
+            codec=args.codec, bitrate_kbps=args.bitrate, vbr=args.vbr, trim_silence=not args.no_trim_silence
+        ),
+    }
+    before_bytes = None
+    for name, encoder in encoders.items():
+        media_bytes, seconds = asyncio.run(_encode_deck(encoder, clips))
+        before_bytes = before_bytes or media_bytes
+        print(
+            f"{name:<22} {len(clips)} clips, {media_bytes:>9} bytes ({media_bytes / before_bytes:.0%}), "
+            f"encoded in {seconds:.3f}s, {encoder.describe()}"
+        )
+
+
+if __name__ == "__main__":
+    main()
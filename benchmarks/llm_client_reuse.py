@@ -0,0 +1,99 @@
+"""
+Compares a new Ollama client per LLM request with the pooled client of OllamaLlmProvider.
+A local stand-in server answers like Ollama's /api/generate and counts TCP connections.
+
+Usage: uv run python benchmarks/llm_client_reuse.py [--requests 200]
+"""
+
+import argparse
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+import ollama
+
+from app.llm_interact import LlmProviderSettings, OllamaLlmProvider
+
+
+class _FakeOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    connections = 0
+    connections_lock = threading.Lock()
+
+    def setup(self) -> None:
+        super().setup()
+        with _FakeOllamaHandler.connections_lock:
+            _FakeOllamaHandler.connections += 1
+
+    def do_GET(self) -> None:
+        # Model list requested by OllamaLlmProvider.check_available
+        self._send_json({"models": [{"model": OllamaLlmProvider.OLLAMA_MODEL, "name": OllamaLlmProvider.OLLAMA_MODEL}]})
+
+    def do_POST(self) -> None:
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self._send_json({"model": OllamaLlmProvider.OLLAMA_MODEL, "response": "Die Katze schläft.", "done": True})
+
+    def _send_json(self, body: dict[str, Any]) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args: Any) -> None:
+        pass
+
+
+class _FakeOllamaServer(ThreadingHTTPServer):
+    # The old code path opens a connection per request, all of them at once
+    request_queue_size = 1024
+    daemon_threads = True
+
+
+async def _new_client_per_request(host: str, prompts: list[str]) -> None:
+    async def ask(prompt: str) -> None:
+        client = ollama.AsyncClient(host=host)
+        await client.generate(model=OllamaLlmProvider.OLLAMA_MODEL, prompt=prompt)
+        await client.close()
+
+    await asyncio.gather(*[ask(p) for p in prompts])
+
+
+async def _pooled_client(host: str, prompts: list[str]) -> None:
+    provider = OllamaLlmProvider(LlmProviderSettings(ollama_hosts=[host], max_connections=8))
+    try:
+        await asyncio.gather(*[provider.ask_llm(p) for p in prompts])
+    finally:
+        await provider.aclose()
+
+
+def _measure(name: str, run: Any, host: str, prompts: list[str]) -> None:
+    _FakeOllamaHandler.connections = 0
+    start = time.perf_counter()
+    asyncio.run(run(host, prompts))
+    elapsed = time.perf_counter() - start
+    print(f"{name:<24} {len(prompts)} requests, {_FakeOllamaHandler.connections:>4} connections, {elapsed:.3f}s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    server = _FakeOllamaServer(("127.0.0.1", 0), _FakeOllamaHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host = f"http://127.0.0.1:{server.server_address[1]}"
+    prompts = [f"prompt {i}" for i in range(args.requests)]
+    try:
+        _measure("new client per request", _new_client_per_request, host, prompts)
+        _measure("pooled client", _pooled_client, host, prompts)
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
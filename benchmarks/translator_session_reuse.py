@@ -0,0 +1,120 @@
+"""
+Compares a new googletrans session per translation with the pooled session of GoogleTranslatorImpl.
+The https requests to Google Translate are redirected to a local stand-in server, which counts TCP connections.
+TLS handshakes are not measured, so the saving on the real server is bigger.
+
+Usage: uv run python benchmarks/translator_session_reuse.py [--requests 200]
+"""
+
+import argparse
+import asyncio
+import json
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+import googletrans
+import httpx
+
+from app.translate import GoogleTranslatorImpl, TranslatorSettings
+
+
+class _FakeGoogleTranslateHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    connections = 0
+    connections_lock = threading.Lock()
+
+    def setup(self) -> None:
+        super().setup()
+        with _FakeGoogleTranslateHandler.connections_lock:
+            _FakeGoogleTranslateHandler.connections += 1
+
+    def do_GET(self) -> None:
+        # The response format of translate.googleapis.com/translate_a/single
+        query = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)
+        text = query["q"][0]
+        data = json.dumps([[[text.upper(), text, None, None, 1]], None, query["sl"][0]]).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args: Any) -> None:
+        pass
+
+
+class _FakeGoogleTranslateServer(ThreadingHTTPServer):
+    # The old code path opens a connection per request, all of them at once
+    request_queue_size = 1024
+    daemon_threads = True
+
+
+class _RedirectingTransport(httpx.AsyncHTTPTransport):
+    """Sends all requests to the local server instead of the host of the URL."""
+
+    def __init__(self, port: int, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.port = port
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        request.url = request.url.copy_with(scheme="http", host="127.0.0.1", port=self.port)
+        return await super().handle_async_request(request)
+
+
+class _LocalGoogleTranslator(GoogleTranslatorImpl):
+    def __init__(self, port: int) -> None:
+        super().__init__(TranslatorSettings())
+        self.port = port
+
+    def _create_http_transport(self) -> httpx.AsyncBaseTransport:
+        return _RedirectingTransport(self.port, http2=True, limits=self.settings.http_limits())
+
+
+async def _new_session_per_translation(port: int, texts: list[str]) -> None:
+    async def translate(text: str) -> None:
+        async with googletrans.Translator() as translator:
+            # Without verification the replaced transport doesn't load the certificates a second time,
+            # googletrans.Translator() has already loaded them like the old code did
+            translator.client = httpx.AsyncClient(transport=_RedirectingTransport(port, http2=True, verify=False))
+            await translator.translate(text, src="de", dest="en")
+
+    await asyncio.gather(*[translate(t) for t in texts])
+
+
+async def _pooled_session(port: int, texts: list[str]) -> None:
+    translator = _LocalGoogleTranslator(port)
+    try:
+        await asyncio.gather(*[translator.translate_text(t, src="de", dest="en") for t in texts])
+    finally:
+        await translator.aclose()
+
+
+def _measure(name: str, run: Any, port: int, texts: list[str]) -> None:
+    _FakeGoogleTranslateHandler.connections = 0
+    start = time.perf_counter()
+    asyncio.run(run(port, texts))
+    elapsed = time.perf_counter() - start
+    print(f"{name:<30} {len(texts)} requests, {_FakeGoogleTranslateHandler.connections:>4} connections, {elapsed:.3f}s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    server = _FakeGoogleTranslateServer(("127.0.0.1", 0), _FakeGoogleTranslateHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+    texts = [f"Text {i}" for i in range(args.requests)]
+    try:
+        _measure("new session per translation", _new_session_per_translation, port, texts)
+        _measure("pooled session", _pooled_session, port, texts)
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
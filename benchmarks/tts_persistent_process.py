@@ -0,0 +1,130 @@
+"""
+Compares starting a piper process per clip with the long-lived piper processes of PiperTextToSpeechEngineImpl.
+By default a local stand-in for piper is used, which sleeps for `--model-load-seconds` on startup like piper does
+while loading a voice model, and the samples are copied instead of encoded.
+Pass `--voices-dir` to measure the real piper and lame instead.
+
+Usage: uv run python benchmarks/tts_persistent_process.py [--clips 50] [--workers 4] [--voices-dir ~/.local/share/piper]
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from app.tts import AudioEncoderSettings, PiperSettings, PiperTextToSpeechEngineImpl
+
+_STAND_IN_PIPER = """
+import argparse, json, sys, time, wave
+parser = argparse.ArgumentParser()
+parser.add_argument("--model")
+parser.add_argument("--json-input", action="store_true")
+parser.add_argument("--output_dir")
+parser.add_argument("--output_file")
+parser.add_argument("--model-load-seconds", type=float)
+args = parser.parse_args()
+time.sleep(args.model_load_seconds)
+if args.output_file:
+    lines = [json.dumps({"text": sys.stdin.read(), "output_file": args.output_file})]
+else:
+    lines = sys.stdin
+for line in lines:
+    utterance = json.loads(line)
+    with wave.open(utterance["output_file"], "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(22050)
+        wav.writeframes(b"\\x10\\x20" * 20000)
+    print(utterance["output_file"], flush=True)
+"""
+
+
+class _CopyingAudioEncoderSettings(AudioEncoderSettings):
+    def command(self, raw_sample_rate: Optional[int] = None) -> list[str]:
+        return [sys.executable, "-c", "import sys; sys.stdout.buffer.write(sys.stdin.buffer.read())"]
+
+
+def _settings(args: argparse.Namespace, voices_dir: str) -> tuple[PiperSettings, AudioEncoderSettings]:
+    if args.voices_dir:
+        return PiperSettings(voices_dir=args.voices_dir, processes_per_voice=args.workers), AudioEncoderSettings()
+    piper_settings = PiperSettings(
+        command=[sys.executable, "-c", _STAND_IN_PIPER, "--model-load-seconds", str(args.model_load_seconds)],
+        voices_dir=voices_dir,
+        processes_per_voice=args.workers,
+    )
+    return piper_settings, _CopyingAudioEncoderSettings()
+
+
+def _process_per_clip(settings: PiperSettings, encoder: AudioEncoderSettings, texts: list[str], workers: int) -> None:
+    model_path = os.path.join(settings.voices_dir, f"{settings.voices['de']}.onnx")
+
+    def speak(text: str) -> bytes:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            wav_path = os.path.join(temp_dir, "speech.wav")
+            subprocess.run(
+                [*settings.command, "--model", model_path, "--output_file", wav_path],
+                input=text,
+                text=True,
+                capture_output=True,
+                check=True,
+            )
+            with open(wav_path, "rb") as f:
+                return subprocess.run(encoder.command(), input=f.read(), capture_output=True, check=True).stdout
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(speak, texts))
+
+
+def _persistent_processes(
+    settings: PiperSettings, encoder: AudioEncoderSettings, texts: list[str], workers: int
+) -> None:
+    engine = PiperTextToSpeechEngineImpl(settings, encoder)
+    try:
+
+        async def speak_all() -> None:
+            await asyncio.gather(*[engine.text_to_speech(text, "de") for text in texts])
+
+        asyncio.run(speak_all())
+    finally:
+        engine.close()
+
+
+def _measure(
+    name: str,
+    run: Callable,
+    settings: tuple[PiperSettings, AudioEncoderSettings],
+    texts: list[str],
+    workers: int,
+) -> None:
+    start = time.perf_counter()
+    run(*settings, texts, workers)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<25} {len(texts)} clips, {workers} workers, {elapsed:.3f}s, {len(texts) / elapsed:.1f} clips/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clips", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--model-load-seconds", type=float, default=0.5)
+    parser.add_argument("--voices-dir", help="Directory with the real piper voice models")
+    args = parser.parse_args()
+
+    texts = [f"Das ist der {i}. Satz, den wir heute vorlesen." for i in range(args.clips)]
+    with tempfile.TemporaryDirectory() as voices_dir:
+        for voice in PiperSettings().voices.values():
+            open(os.path.join(voices_dir, f"{voice}.onnx"), "w").close()
+        settings = _settings(args, voices_dir)
+        if not args.voices_dir:
+            print(f"Stand-in for piper with {args.model_load_seconds}s model load, not the real piper")
+        _measure("process per clip", _process_per_clip, settings, texts, args.workers)
+        _measure("persistent processes", _persistent_processes, settings, texts, args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,61 @@
-import random
+import asyncio
+import logging
+import os
 import re
-import string
 
+from app.tts import audio_file_extension, audio_key, record_deck_media, text_to_speech_batch_into_files
 
-def get_audio_file_name_for_phrase(phrase: str, lang: str) -> str:
-    return _get_audio_file_name_for_common(phrase, lang, "phrase")
+_READABLE_PART_MAX_LENGTH = 40
+# 96 bits of the key, collisions are practically impossible
+_KEY_PART_LENGTH = 24
 
 
-def get_audio_file_name_for_sentence(phrase: str, lang: str) -> str:
-    return _get_audio_file_name_for_common(phrase, lang, "sentence")
+def get_audio_file_name(text: str, lang: str) -> str:
+    """
+    The same for the same speech, so identical clips are stored once in a deck and shared between decks.
+    The start of the text is only for the readability of the name.
+    """
+    readable_part = sanitize_string(text)[:_READABLE_PART_MAX_LENGTH].strip("_")
+    key_part = audio_key(text, lang)[:_KEY_PART_LENGTH]
+    return f"anki_card_generator_{lang}_{readable_part}_{key_part}.{audio_file_extension()}"
 
 
 def sanitize_string(s: str) -> str:
     return re.sub(r"[^a-zöüäßA-ZÖÜÄ0-9\-_]", "_", s.strip())
 
 
-def _get_audio_file_name_for_common(phrase: str, lang: str, content_type: str) -> str:
-    phrase = sanitize_string(phrase)
-    # Doing our best to protect from audio file name collisions
-    random_suffix = _generate_random_string(length=6)
-    return f"anki_card_generator_{lang}_{phrase}_{content_type}_{random_suffix}.mp3"
-
-
-def _generate_random_string(length: int) -> str:
-    return "".join(random.choices(string.ascii_letters + string.digits, k=length))
+class AudioFiles:
+    """
+    The audio files of one deck in a directory. The same text in the same language is spoken once,
+    the notes share its file. Files are added while the notes are created and synthesized together afterwards.
+    """
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        self.media_files: list[str] = []
+        self._file_names: dict[tuple[str, str], str] = {}
+
+    def add(self, text: str, lang: str) -> str:
+        """Returns the file name of the spoken text."""
+        key = (text, lang)
+        file_name = self._file_names.get(key)
+        if file_name is None:
+            file_name = get_audio_file_name(text, lang)
+            self.media_files.append(f"{self.directory}/{file_name}")
+            self._file_names[key] = file_name
+        return file_name
+
+    async def synthesize(self) -> None:
+        """Synthesizes all added texts in batches per language, the TTS worker limit bounds the parallelism."""
+        texts_and_paths_by_lang: dict[str, list[tuple[str, str]]] = {}
+        for (text, lang), file_name in self._file_names.items():
+            texts_and_paths_by_lang.setdefault(lang, []).append((text, f"{self.directory}/{file_name}"))
+        await asyncio.gather(
+            *(
+                text_to_speech_batch_into_files(texts_and_paths, lang)
+                for lang, texts_and_paths in texts_and_paths_by_lang.items()
+            )
+        )
+        media_bytes = sum(os.path.getsize(path) for path in self.media_files)
+        logging.info(f"Deck media: {len(self.media_files)} audio files, {media_bytes} bytes")
+        record_deck_media(len(self.media_files), media_bytes)
@@ -0,0 +1,109 @@
+import collections
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from typing import Any
+
+from app.utils import check
+
+
+class AudioCache:
+    """
+    Persistent cache of audio clips, stored as files in a directory. The keys are the file names,
+    e.g., a content-addressed hash with the extension of the audio format.
+    Least recently used clips are removed once the total size exceeds `max_bytes`.
+    """
+
+    def __init__(self, directory: str, max_bytes: int) -> None:
+        check(max_bytes > 0, f"Expected max_bytes to be positive, but got {max_bytes}")
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        # Clip sizes by key, least recently used first
+        self._sizes: collections.OrderedDict[str, int] = collections.OrderedDict()
+        self._total_bytes = 0
+        # Flask serves requests from several threads
+        self._lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        entries = []
+        for entry in os.scandir(directory):
+            # Temporary files are left over by interrupted writes
+            if entry.is_file() and not entry.name.endswith(".tmp"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.name, stat.st_size))
+        for _, key, size in sorted(entries):
+            self._sizes[key] = size
+            self._total_bytes += size
+        logging.info(f'Opened audio cache "{directory}" with {len(self._sizes)} clips, {self._total_bytes} bytes')
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def copy_to(self, key: str, path: str) -> bool:
+        """Puts the cached clip at `path`, returns False if the key is not cached."""
+        with self._lock:
+            if key not in self._sizes:
+                self.misses += 1
+                return False
+            cached_path = self._path(key)
+            try:
+                # The modification time orders the clips by use after a restart
+                os.utime(cached_path)
+            except FileNotFoundError:
+                # Removed from the directory behind the cache's back, e.g., by cleaning it up by hand
+                self._total_bytes -= self._sizes.pop(key)
+                self.misses += 1
+                return False
+            self._sizes.move_to_end(key)
+            try:
+                # A hard link stays valid even if the clip is evicted while the deck is written
+                os.link(cached_path, path)
+            except OSError:
+                shutil.copyfile(cached_path, path)
+            self.hits += 1
+            return True
+
+    def put(self, key: str, audio: bytes) -> None:
+        # Written into a temporary file and renamed, so a clip is never read half-written
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(audio)
+        with self._lock:
+            os.replace(temp_path, self._path(key))
+            self._total_bytes += len(audio) - self._sizes.pop(key, 0)
+            self._sizes[key] = len(audio)
+            self._evict_least_recently_used()
+
+    def _evict_least_recently_used(self) -> None:
+        # Must be called under the lock
+        while self._total_bytes > self.max_bytes and len(self._sizes) > 1:
+            key, size = self._sizes.popitem(last=False)
+            self._total_bytes -= size
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def clear(self) -> None:
+        with self._lock:
+            for key in self._sizes:
+                try:
+                    os.remove(self._path(key))
+                except FileNotFoundError:
+                    pass
+            self._sizes.clear()
+            self._total_bytes = 0
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "path": self.directory,
+                "entries": len(self._sizes),
+                "bytes": self._total_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
@@ -0,0 +1,79 @@
+import struct
+from typing import Optional
+
+import numpy as np
+
+
+def pcm_from_wav(wav: bytes) -> tuple[np.ndarray, int]:
+    """
+    Returns the samples and the sample rate of a 16-bit mono WAV file. The sizes in the header are ignored
+    if they don't fit, as they are unknown when the WAV file is written into a pipe.
+    """
+    if wav[:4] != b"RIFF" or wav[8:12] != b"WAVE":
+        raise ValueError("Expected a WAV file")
+    sample_rate = None
+    offset = 12
+    while offset + 8 <= len(wav):
+        chunk_id, chunk_size = struct.unpack("<4sI", wav[offset : offset + 8])
+        if chunk_id == b"fmt ":
+            channels, sample_rate = struct.unpack("<HI", wav[offset + 10 : offset + 16])
+            (bits_per_sample,) = struct.unpack("<H", wav[offset + 22 : offset + 24])
+            if channels != 1 or bits_per_sample != 16:
+                raise ValueError(f"Expected 16-bit mono WAV, but got {bits_per_sample}-bit with {channels} channels")
+        elif chunk_id == b"data":
+            if sample_rate is None:
+                raise ValueError("WAV file has no format chunk before its data")
+            data = wav[offset + 8 :]
+            if 0 < chunk_size <= len(data):
+                data = data[:chunk_size]
+            return np.frombuffer(data[: len(data) - len(data) % 2], dtype="<i2"), sample_rate
+        # Chunks are padded to an even size
+        offset += 8 + chunk_size + chunk_size % 2
+    raise ValueError("WAV file has no data chunk")
+
+
+def split_at_silences(
+    samples: np.ndarray,
+    count: int,
+    sample_rate: int,
+    min_silence_seconds: float,
+    keep_silence_seconds: float = 0.1,
+    silence_threshold: int = 64,
+) -> Optional[list[np.ndarray]]:
+    """
+    Splits the samples of utterances separated by silences into `count` segments at the `count - 1` longest
+    silences of at least `min_silence_seconds`. Each segment keeps up to `keep_silence_seconds` of the silence
+    around it. Returns None if there are fewer such silences, e.g., when the separators were not spoken.
+    """
+    if count == 1:
+        return [samples]
+    silent = np.abs(samples.astype(np.int32)) <= silence_threshold
+    # Starts and ends of the runs of silent samples
+    changes = np.flatnonzero(np.diff(np.concatenate(([False], silent, [False])).astype(np.int8)))
+    starts, ends = changes[0::2], changes[1::2]
+    lengths = ends - starts
+    # Leading and trailing silences don't separate utterances
+    is_separator = (starts > 0) & (ends < len(samples)) & (lengths >= min_silence_seconds * sample_rate)
+    candidates = np.flatnonzero(is_separator)
+    if len(candidates) < count - 1:
+        return None
+    longest = candidates[np.argsort(-lengths[candidates], kind="stable")[: count - 1]]
+    keep = int(keep_silence_seconds * sample_rate)
+    segments = []
+    segment_start = 0
+    for separator in np.sort(longest):
+        segments.append(samples[segment_start : min(starts[separator] + keep, ends[separator])])
+        segment_start = max(ends[separator] - keep, starts[separator])
+    segments.append(samples[segment_start:])
+    return segments
+
+
+def trim_silence(
+    samples: np.ndarray, sample_rate: int, keep_silence_seconds: float = 0.05, silence_threshold: int = 64
+) -> np.ndarray:
+    """Removes the leading and trailing silence, except for `keep_silence_seconds`. Silence only is kept as is."""
+    loud = np.flatnonzero(np.abs(samples.astype(np.int32)) > silence_threshold)
+    if len(loud) == 0:
+        return samples
+    keep = int(keep_silence_seconds * sample_rate)
+    return samples[max(loud[0] - keep, 0) : loud[-1] + 1 + keep]
@@ -0,0 +1,82 @@
+import asyncio
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Generic, Hashable, Optional, TypeVar
+
+from app.loop_local import LoopLocal
+from app.utils import check
+
+K = TypeVar("K", bound=Hashable)
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+@dataclass
+class _PendingBatch(Generic[T, R]):
+    items: list[T] = field(default_factory=list)
+    futures: list["asyncio.Future[R]"] = field(default_factory=list)
+    timer: Optional[asyncio.TimerHandle] = None
+
+
+class MicroBatcher(Generic[K, T, R]):
+    """
+    Collects items submitted concurrently and processes them together.
+    Items with the same batch key are flushed as one batch once `max_batch_size` items are collected
+    or `max_delay_seconds` passed since the first item of the batch.
+    `process_batch` must return exactly one result per item, in the same order.
+    """
+
+    def __init__(
+        self,
+        process_batch: Callable[[K, list[T]], Awaitable[list[R]]],
+        max_batch_size: int,
+        max_delay_seconds: float,
+    ) -> None:
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_delay_seconds = max_delay_seconds
+        self._pending: LoopLocal[dict[K, _PendingBatch[T, R]]] = LoopLocal(dict)
+        self._flush_tasks: LoopLocal[set[asyncio.Task[None]]] = LoopLocal(set)
+
+    async def submit(self, batch_key: K, item: T) -> R:
+        pending = self._pending.get()
+        batch = pending.get(batch_key)
+        if batch is None:
+            batch = _PendingBatch()
+            pending[batch_key] = batch
+            batch.timer = asyncio.get_running_loop().call_later(self.max_delay_seconds, self._flush, batch_key)
+
+        future: asyncio.Future[R] = asyncio.get_running_loop().create_future()
+        batch.items.append(item)
+        batch.futures.append(future)
+        if len(batch.items) >= self.max_batch_size:
+            self._flush(batch_key)
+        return await future
+
+    def _flush(self, batch_key: K) -> None:
+        batch = self._pending.get().pop(batch_key, None)
+        if batch is None:
+            return
+        if batch.timer is not None:
+            batch.timer.cancel()
+        task = asyncio.create_task(self._process(batch_key, batch))
+        # Keep a strong reference, otherwise the task may be garbage collected before it's done
+        flush_tasks = self._flush_tasks.get()
+        flush_tasks.add(task)
+        task.add_done_callback(flush_tasks.discard)
+
+    async def _process(self, batch_key: K, batch: _PendingBatch[T, R]) -> None:
+        try:
+            results = await self.process_batch(batch_key, batch.items)
+            check(
+                len(results) == len(batch.items), f"Expected {len(batch.items)} batch results, but got {len(results)}"
+            )
+        except Exception as e:
+            for future in batch.futures:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for future, result in zip(batch.futures, results):
+            # The submitter may have been cancelled in the meantime
+            if not future.done():
+                future.set_result(result)
@@ -0,0 +1,163 @@
+import collections
+import contextlib
+import logging
+import threading
+import time
+from enum import Enum
+from typing import Any, AsyncContextManager, AsyncIterator, Callable, Optional
+
+from app.utils import DependencyUnavailableError, check
+
+
+class CircuitState(Enum):
+    Closed = "closed"
+    Open = "open"
+    HalfOpen = "half_open"
+
+
+class CircuitOpenError(DependencyUnavailableError):
+    pass
+
+
+class CircuitBreaker:
+    """
+    Stops calling a dependency which fails or is slow, so the callers don't wait for it.
+    While closed, the outcomes of the recent calls are kept. Once at least `min_calls` are known and the rate of
+    failed calls or of calls slower than `slow_call_seconds` reaches its threshold, the circuit opens and calls are
+    rejected with CircuitOpenError. After `open_seconds` the circuit is half-open: up to `half_open_probes` calls
+    are let through as probes. If all of them succeed quickly the circuit closes, otherwise it opens again.
+
+    The breaker can be shared between threads and event loops, like AdaptiveConcurrencyLimiter.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate_threshold: float = 0.5,
+        slow_call_seconds: Optional[float] = None,
+        slow_call_rate_threshold: float = 0.5,
+        window_size: int = 20,
+        min_calls: int = 5,
+        open_seconds: float = 30.0,
+        half_open_probes: int = 1,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        check(0 < failure_rate_threshold <= 1, f"Expected rate in (0, 1], but got {failure_rate_threshold}")
+        check(0 < slow_call_rate_threshold <= 1, f"Expected rate in (0, 1], but got {slow_call_rate_threshold}")
+        check(1 <= min_calls <= window_size, f"Expected 1 <= min_calls <= window_size, got {min_calls}, {window_size}")
+        check(half_open_probes >= 1, f"Expected at least one half-open probe, but got {half_open_probes}")
+        self.name = name
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.opened_count = 0
+        self.rejected_count = 0
+        self._state = CircuitState.Closed
+        # (failed, slow) of the recent calls made while closed
+        self._outcomes: collections.deque[tuple[bool, bool]] = collections.deque(maxlen=window_size)
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self._clock = clock
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> CircuitState:
+        with self._lock:
+            return self._state
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "state": self._state.value,
+                "opened": self.opened_count,
+                "rejected": self.rejected_count,
+                "recent_calls": len(self._outcomes),
+            }
+
+    @contextlib.asynccontextmanager
+    async def guard(self, wait_for: Optional[AsyncContextManager[Any]] = None) -> AsyncIterator[None]:
+        """
+        Runs the block if the circuit lets the call through, otherwise raises CircuitOpenError.
+        `wait_for`, e.g., a slot of a concurrency limiter, is entered once the call is let through,
+        so rejected calls don't wait for it, and the time waiting for it doesn't count as slowness.
+        """
+        is_probe = self._admit()
+        recorded = False
+        try:
+            async with wait_for if wait_for is not None else contextlib.nullcontext():
+                start = self._clock()
+                try:
+                    yield
+                except Exception:
+                    recorded = True
+                    self._record(is_probe, failed=True, latency=None)
+                    raise
+                except BaseException:
+                    # A call cancelled early, e.g., by hedging, says nothing about the dependency,
+                    # but a call cancelled by a latency budget was slow
+                    recorded = True
+                    latency = self._clock() - start
+                    is_slow = self.slow_call_seconds is not None and latency > self.slow_call_seconds
+                    self._record(is_probe, failed=False, latency=latency if is_slow else None)
+                    raise
+                recorded = True
+                self._record(is_probe, failed=False, latency=self._clock() - start)
+        finally:
+            if not recorded:
+                # Cancelled while waiting, only a probe needs to be given back
+                self._record(is_probe, failed=False, latency=None)
+
+    def _admit(self) -> bool:
+        """Returns whether the call is a half-open probe."""
+        with self._lock:
+            now = self._clock()
+            if self._state == CircuitState.Open and now - self._opened_at >= self.open_seconds:
+                logging.info(f"{self.name} circuit is half-open, probing")
+                self._state = CircuitState.HalfOpen
+                self._probes_in_flight = 0
+                self._probe_successes = 0
+            if self._state == CircuitState.Closed:
+                return False
+            if self._state == CircuitState.HalfOpen and self._probes_in_flight < self.half_open_probes:
+                self._probes_in_flight += 1
+                return True
+            self.rejected_count += 1
+            retry_in = max(self.open_seconds - (now - self._opened_at), 0.0)
+        raise CircuitOpenError(f"{self.name} is unavailable after repeated failures, retrying in {retry_in:.0f}s")
+
+    def _record(self, is_probe: bool, failed: bool, latency: Optional[float]) -> None:
+        slow = latency is not None and self.slow_call_seconds is not None and latency > self.slow_call_seconds
+        with self._lock:
+            if is_probe:
+                self._probes_in_flight -= 1
+                if self._state != CircuitState.HalfOpen:
+                    return
+                if failed or slow:
+                    self._open()
+                elif latency is not None:
+                    self._probe_successes += 1
+                    if self._probe_successes >= self.half_open_probes:
+                        logging.info(f"{self.name} circuit is closed")
+                        self._state = CircuitState.Closed
+                        self._outcomes.clear()
+            elif self._state == CircuitState.Closed and (failed or latency is not None):
+                self._outcomes.append((failed, slow))
+                if len(self._outcomes) >= self.min_calls and self._is_over_threshold():
+                    self._open()
+
+    def _is_over_threshold(self) -> bool:
+        failure_rate = sum(failed for failed, _ in self._outcomes) / len(self._outcomes)
+        slow_rate = sum(slow for _, slow in self._outcomes) / len(self._outcomes)
+        return failure_rate >= self.failure_rate_threshold or slow_rate >= self.slow_call_rate_threshold
+
+    def _open(self) -> None:
+        # Must be called under the lock
+        logging.warning(f"{self.name} circuit is open for {self.open_seconds}s")
+        self._state = CircuitState.Open
+        self._opened_at = self._clock()
+        self._outcomes.clear()
+        self.opened_count += 1
@@ -1,15 +1,257 @@
-from typing import Literal
+import json
+import logging
+import re
+from typing import Literal, Optional, Tuple, Any, Final
 
-from app.llm_interact import ask_llm
-from app.prompts import get_sentence_example_prompt
+from app.batching import MicroBatcher
+from app.llm_interact import ask_llm, find_first_sentence_end
+from app.prompts import get_sentence_example_prompt, get_sentence_examples_batch_prompt, get_all_in_one_prompt
+from app.stage_graph import Stage, StageGraph, StageTimings
 from app.utils import check
 
+_BATCH_MAX_DELAY_SECONDS = 0.05
+
+# The sentence example and the fields asked from the LLM together with it
+SentenceWithTranslations = Tuple[str, dict[str, Optional[str]]]
+
 
 async def generate_sentence_example_with_llm(word: str, language: Literal["English", "German"], is_phrase: bool) -> str:
+    if __SENTENCE_EXAMPLES_BATCHER.max_batch_size > 1:
+        sentence_example = await __SENTENCE_EXAMPLES_BATCHER.submit((language, is_phrase), word)
+        if sentence_example is not None:
+            return sentence_example
+        logging.info(f'No valid sentence example for "{word}" in the batch, asking for it separately')
+
     prompt = get_sentence_example_prompt(word, language, is_phrase)
 
-    res = (await ask_llm(prompt)).strip()
-    check(len(res) > len(word), f"Too short response: {res}")
-    check(len(res) < 1000, f"Too long response, len={len(res)}")
+    def validate(response: str) -> None:
+        check_sentence_example(word, response.strip())
+
+    def accept_invalid(response: str) -> None:
+        # A sentence example which is not perfect is better than failing the whole deck
+        _check_sentence_example_length(word, response.strip())
+
+    response = await ask_llm(
+        prompt,
+        validate=validate,
+        stop_at_sentence_end=__STOP_SENTENCE_EXAMPLE_AT_SENTENCE_END,
+        accept_invalid=accept_invalid,
+        # A period after an unknown abbreviation, like in "Mrs. Brown", looks like a sentence end too
+        accept_sentence_end=lambda first_sentence: _contains_word(first_sentence, word),
+    )
+    sentence_example = response.strip()
+    warn_if_word_not_used(word, sentence_example)
+    return sentence_example
+
+
+async def generate_sentence_example_with_translations(
+    word: str, language: Literal["English", "German"], is_phrase: bool, fields: dict[str, str]
+) -> SentenceWithTranslations:
+    """
+    In the all-in-one mode asks the LLM for the sentence example together with the extra `fields`
+    (e.g., its translations) in one request. `fields` maps the field names to their descriptions for the prompt.
+    Returns the sentence example and the values of the fields. A field is None if it's missing or invalid
+    in the response, or if the mode is disabled, then the caller should get it another way, e.g., by translate_text.
+    """
+    no_fields: dict[str, Optional[str]] = {name: None for name in fields}
+    if not __ALL_IN_ONE_LLM_MODE:
+        return await generate_sentence_example_with_llm(word, language, is_phrase), no_fields
+
+    prompt = get_all_in_one_prompt(word, language, is_phrase, fields)
+
+    def check_response(response: str) -> None:
+        parsed = parse_json_object_response(response)
+        sentence_example = parsed.get("sentence_example")
+        check(isinstance(sentence_example, str), f"No sentence_example in the response: {response}")
+        check_sentence_example(word, sentence_example.strip())
+
+    try:
+        parsed = parse_json_object_response(await ask_llm(prompt, validate=check_response))
+    except ValueError as e:
+        logging.warning(f'Invalid all-in-one response for "{word}", asking for the sentence example separately: {e}')
+        return await generate_sentence_example_with_llm(word, language, is_phrase), no_fields
+
+    values: dict[str, Optional[str]] = {}
+    for name in fields:
+        value = parsed.get(name)
+        if _is_valid_field_value(value):
+            values[name] = value.strip()
+        else:
+            logging.warning(f'Invalid field {name} in the all-in-one response for "{word}": {value!r}')
+            values[name] = None
+    sentence_example = parsed["sentence_example"].strip()
+    warn_if_word_not_used(word, sentence_example)
+    return sentence_example, values
+
+
+def _is_valid_field_value(value: Any) -> bool:
+    return isinstance(value, str) and 0 < len(value.strip()) < 1000 and "\n" not in value.strip()
+
+
+_MARKDOWN_PATTERN: Final[re.Pattern[str]] = re.compile(r"\*\*|__|`|^\s*(#|[-*] )", re.MULTILINE)
+# Words which are not looked for in the sentence example, e.g., "die" of "die Katze"
+_NOT_CHECKED_WORDS: Final[set[str]] = {"der", "die", "das", "sich", "to", "the", "a", "an"}
+
+
+def check_sentence_example(word: str, sentence_example: str) -> None:
+    """Raises ValueError if the sentence example should be asked again, possibly from a bigger model."""
+    _check_sentence_example_length(word, sentence_example)
+    check("\n" not in sentence_example, f"Several lines in response: {sentence_example}")
+    check(_MARKDOWN_PATTERN.search(sentence_example) is None, f"Markdown in response: {sentence_example}")
+    check(find_first_sentence_end(sentence_example) is None, f"More than one sentence in response: {sentence_example}")
+
+
+def warn_if_word_not_used(word: str, sentence_example: str) -> None:
+    """
+    Not a reason to ask again: separable verbs ("steht ... auf") and irregular forms ("ging", "went")
+    can't be found by comparing the text, and asking again doesn't make the LLM use another form.
+    """
+    if not _contains_word(sentence_example, word):
+        logging.warning(f'"{word}" may be not used in the sentence example: {sentence_example}')
+
+
+def _check_sentence_example_length(word: str, sentence_example: str) -> None:
+    check(len(sentence_example) > len(word), f"Too short response: {sentence_example}")
+    check(len(sentence_example) < 1000, f"Too long response, len={len(sentence_example)}")
+
+
+def _contains_word(sentence: str, word_or_phrase: str) -> bool:
+    """
+    Whether any word of `word_or_phrase` is in the sentence. Only the beginning of a word is compared,
+    and umlauts are ignored, so that inflected forms like "fährt" of "fahren" are found.
+    The prefix of a German separable verb may be separated from it, like in "steht ... auf" of "aufstehen".
+    """
+    sentence = _normalize_umlauts(sentence.lower())
+    sentence_words = set(re.findall(r"\w+", sentence))
+    words = [w for w in re.findall(r"\w+", _normalize_umlauts(word_or_phrase.lower())) if w not in _NOT_CHECKED_WORDS]
+    for w in words:
+        if _word_stem(w) in sentence:
+            return True
+        prefix = next((p for p in _SEPARABLE_PREFIXES if w.startswith(p) and len(w) - len(p) >= 4), None)
+        if prefix is not None and prefix in sentence_words and _word_stem(w[len(prefix) :]) in sentence:
+            return True
+    return not words
+
+
+def _word_stem(word: str) -> str:
+    return word[: max(3, len(word) - 3)]
+
+
+# Longer prefixes first, so that "zuruck" is taken before "zu"
+_SEPARABLE_PREFIXES: Final[list[str]] = sorted(
+    ["ab", "an", "auf", "aus", "bei", "ein", "fest", "fort", "her", "hin", "los", "mit", "nach", "vor", "weg",
+     "weiter", "zu", "zuruck", "zusammen"],
+    key=len,
+    reverse=True,
+)  # fmt: skip
+
+
+def _normalize_umlauts(text: str) -> str:
+    return text.replace("ä", "a").replace("ö", "o").replace("ü", "u")
+
+
+async def _generate_sentence_examples_batch(
+    batch_key: Tuple[Literal["English", "German"], bool], words: list[str]
+) -> list[Optional[str]]:
+    """Returns a sentence example for each word, or None for the words which should be asked separately."""
+    if len(words) == 1:
+        return [None]
+
+    language, is_phrase = batch_key
+    prompt = get_sentence_examples_batch_prompt(words, language, is_phrase)
+
+    def check_batch_response(response: str) -> None:
+        sentences = parse_json_array_response(response)
+        check(len(sentences) == len(words), f"Expected {len(words)} sentences, but got {len(sentences)}")
+
+    try:
+        sentences = parse_json_array_response(await ask_llm(prompt, validate=check_batch_response))
+    except ValueError as e:
+        logging.warning(f"Invalid batch response for the words {words}: {e}")
+        return [None] * len(words)
+
+    results: list[Optional[str]] = []
+    for word, sentence in zip(words, sentences):
+        sentence = sentence.strip() if isinstance(sentence, str) else ""
+        try:
+            check_sentence_example(word, sentence)
+            warn_if_word_not_used(word, sentence)
+            results.append(sentence)
+        except ValueError as e:
+            logging.warning(f'Invalid sentence example for "{word}" in the batch: {e}')
+            results.append(None)
+    return results
+
+
+def parse_json_array_response(response: str) -> list[Any]:
+    text = _strip_markdown_code_block(response)
+    try:
+        parsed = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Response is not a valid JSON: {response}") from e
+    check(isinstance(parsed, list), f"Expected JSON array, but got: {response}")
+    return parsed
+
+
+def parse_json_object_response(response: str) -> dict[str, Any]:
+    text = _strip_markdown_code_block(response)
+    try:
+        parsed = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Response is not a valid JSON: {response}") from e
+    check(isinstance(parsed, dict), f"Expected JSON object, but got: {response}")
+    return parsed
+
+
+def _strip_markdown_code_block(response: str) -> str:
+    # Models often wrap JSON into ```json ... ``` even when asked not to use markdown
+    text = response.strip()
+    if text.startswith("```"):
+        text = text.split("\n", 1)[1] if "\n" in text else ""
+        text = text.removesuffix("```")
+    return text.strip()
+
+
+__SENTENCE_EXAMPLES_BATCHER: MicroBatcher[Tuple[Literal["English", "German"], bool], str, Optional[str]] = MicroBatcher(
+    _generate_sentence_examples_batch, max_batch_size=1, max_delay_seconds=_BATCH_MAX_DELAY_SECONDS
+)
+
+
+# The prompt asks for one sentence, so the generation is stopped once the first sentence is complete
+__STOP_SENTENCE_EXAMPLE_AT_SENTENCE_END: bool = True
+
+
+def set_stop_sentence_example_at_sentence_end(enabled: bool) -> None:
+    global __STOP_SENTENCE_EXAMPLE_AT_SENTENCE_END
+    __STOP_SENTENCE_EXAMPLE_AT_SENTENCE_END = enabled
+
+
+# Disabled by default: small local models often get the translations wrong, Google Translate is more reliable
+__ALL_IN_ONE_LLM_MODE: bool = False
+
+
+def set_all_in_one_llm_mode(enabled: bool) -> None:
+    global __ALL_IN_ONE_LLM_MODE
+    __ALL_IN_ONE_LLM_MODE = enabled
+
+
+def is_all_in_one_llm_mode() -> bool:
+    return __ALL_IN_ONE_LLM_MODE
+
+
+__WORD_STAGE_TIMINGS: StageTimings = StageTimings()
+
+
+async def run_word_stages(graph_name: str, stages: list[Stage]) -> dict[str, Any]:
+    """Runs the stages of preparing a word, independent stages concurrently. Returns the results by stage names."""
+    return await StageGraph(graph_name, stages, hooks=__WORD_STAGE_TIMINGS).run()
+
+
+def get_word_stage_metrics() -> dict[str, dict[str, float]]:
+    return __WORD_STAGE_TIMINGS.stats()
+
 
-    return res
+def set_sentence_examples_batch_size(batch_size: int) -> None:
+    """Batch size 1 disables batching: every word gets its own prompt."""
+    check(batch_size >= 1, f"Expected batch size to be at least 1, but got {batch_size}")
+    __SENTENCE_EXAMPLES_BATCHER.max_batch_size = batch_size
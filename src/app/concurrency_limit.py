@@ -0,0 +1,138 @@
+import asyncio
+import collections
+import contextlib
+import math
+import threading
+import time
+from typing import AsyncIterator, Callable, Optional
+
+from app.utils import check
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Limits the number of concurrent calls and adapts the limit with AIMD (additive increase, multiplicative decrease).
+    A call that succeeds with latency close to the best recently observed one raises the limit by 1/limit,
+    so the limit grows by about one per round of calls. A failed call, or a call much slower than the best one,
+    which means that the server queues requests instead of running them in parallel, multiplies the limit by
+    `backoff_ratio`.
+
+    The limiter can be shared between threads and event loops: Flask runs requests in separate threads,
+    but all of them use the same LLM server.
+    """
+
+    def __init__(
+        self,
+        min_limit: int,
+        max_limit: int,
+        initial_limit: Optional[int] = None,
+        backoff_ratio: float = 0.7,
+        latency_tolerance: float = 2.0,
+        latency_window_size: int = 50,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        check(1 <= min_limit <= max_limit, f"Expected 1 <= min_limit <= max_limit, but got {min_limit}, {max_limit}")
+        check(0 < backoff_ratio < 1, f"Expected backoff_ratio to be in (0, 1), but got {backoff_ratio}")
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff_ratio = backoff_ratio
+        self.latency_tolerance = latency_tolerance
+        self._limit = float(initial_limit if initial_limit is not None else min_limit)
+        self._limit = min(max(self._limit, min_limit), max_limit)
+        self._in_flight = 0
+        self._waiters: collections.deque[tuple[asyncio.AbstractEventLoop, asyncio.Future[None]]] = collections.deque()
+        self._recent_latencies: collections.deque[float] = collections.deque(maxlen=latency_window_size)
+        self._clock = clock
+        self._lock = threading.Lock()
+
+    @property
+    def limit(self) -> int:
+        return math.floor(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    def stats(self) -> dict[str, int]:
+        return {"limit": self.limit, "in_flight": self.in_flight, "queue_depth": self.queue_depth}
+
+    @contextlib.asynccontextmanager
+    async def acquire(self) -> AsyncIterator[None]:
+        await self._acquire_slot()
+        start = self._clock()
+        try:
+            yield
+        except Exception:
+            self._release_slot(latency=None, failed=True)
+            raise
+        except BaseException:
+            # Cancellation says nothing about the server, so the limit is not adjusted
+            self._release_slot(latency=None, failed=False)
+            raise
+        self._release_slot(latency=self._clock() - start, failed=False)
+
+    async def _acquire_slot(self) -> None:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if not self._waiters and self._in_flight < self.limit:
+                self._in_flight += 1
+                return
+            waiter: asyncio.Future[None] = loop.create_future()
+            entry = (loop, waiter)
+            self._waiters.append(entry)
+
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            with self._lock:
+                if entry in self._waiters:
+                    self._waiters.remove(entry)
+                elif waiter.done() and not waiter.cancelled():
+                    # The slot was handed over right before the cancellation, give it back
+                    self._in_flight -= 1
+                    self._wake_up_waiters()
+                # Otherwise the slot is handed over to the cancelled waiter and _grant_slot gives it back
+            raise
+
+    def _release_slot(self, latency: Optional[float], failed: bool) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            if failed:
+                self._decrease_limit()
+            elif latency is not None:
+                self._on_latency_sample(latency)
+            self._wake_up_waiters()
+
+    def _on_latency_sample(self, latency: float) -> None:
+        self._recent_latencies.append(latency)
+        best_latency = min(self._recent_latencies)
+        if latency > best_latency * self.latency_tolerance:
+            self._decrease_limit()
+        else:
+            self._limit = min(self._limit + 1 / self._limit, self.max_limit)
+
+    def _decrease_limit(self) -> None:
+        self._limit = max(self._limit * self.backoff_ratio, self.min_limit)
+
+    def _wake_up_waiters(self) -> None:
+        # Must be called under the lock
+        while self._waiters and self._in_flight < self.limit:
+            loop, waiter = self._waiters.popleft()
+            self._in_flight += 1
+            try:
+                loop.call_soon_threadsafe(self._grant_slot, waiter)
+            except RuntimeError:
+                # The loop of the waiter is already closed
+                self._in_flight -= 1
+
+    def _grant_slot(self, waiter: "asyncio.Future[None]") -> None:
+        if waiter.cancelled():
+            with self._lock:
+                self._in_flight -= 1
+                self._wake_up_waiters()
+        else:
+            waiter.set_result(None)
@@ -1,6 +1,25 @@
 import argparse
+import os
 
 from app.llm_interact import llm_provider_choices
+from app.tts import audio_codec_choices, default_piper_voices_dir, tts_engine_choices
+
+
+def default_cache_dir() -> str:
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "anki-cards-generator")
+
+
+def default_translation_cache_path() -> str:
+    return os.path.join(default_cache_dir(), "translations.sqlite3")
+
+
+def parse_keep_alive(value: str) -> float | str:
+    """Ollama accepts a number of seconds or a duration string like "30m"."""
+    try:
+        return float(value)
+    except ValueError:
+        return value
 
 
 def parse_arguments() -> argparse.Namespace:
@@ -13,4 +32,271 @@ def parse_arguments() -> argparse.Namespace:
         default=default_llm_provider,
         help=f"LLM provider to use (default: {default_llm_provider})",
     )
+    parser.add_argument(
+        "--llm-max-connections",
+        type=int,
+        default=16,
+        help="Maximum number of connections kept open to the LLM server (default: 16)",
+    )
+    parser.add_argument(
+        "--llm-model",
+        help="Model to ask first, a small and fast one is recommended (default: the default model of the provider)",
+    )
+    parser.add_argument(
+        "--llm-fallback-model",
+        action="append",
+        default=[],
+        help="Bigger model to ask when the response of the previous model is invalid, may be repeated",
+    )
+    parser.add_argument(
+        "--llm-max-attempts",
+        type=int,
+        default=2,
+        help="Maximum number of LLM requests for a prompt, including the ones to the fallback models (default: 2)",
+    )
+    parser.add_argument(
+        "--ollama-host",
+        action="append",
+        default=[],
+        help="Ollama server to send requests to, may be repeated to balance the load between several servers "
+        "(default: OLLAMA_HOST environment variable or the local server)",
+    )
+    parser.add_argument(
+        "--ollama-keep-alive",
+        type=parse_keep_alive,
+        default="30m",
+        help='How long Ollama keeps the model loaded after a request, e.g., "30m", or seconds, -1 keeps it forever '
+        '(default: "30m")',
+    )
+    parser.add_argument(
+        "--llm-keep-warm-interval",
+        type=float,
+        help="Seconds between requests which keep the model loaded while the app is idle (default: disabled)",
+    )
+    parser.add_argument(
+        "--llm-min-concurrency",
+        type=int,
+        default=1,
+        help="Concurrent LLM requests are adapted to the observed latency, but never limited below this "
+        "per LLM server (default: 1)",
+    )
+    parser.add_argument(
+        "--llm-max-concurrency",
+        type=int,
+        default=8,
+        help="Maximum number of concurrent LLM requests per LLM server (default: 8)",
+    )
+    parser.add_argument(
+        "--no-llm-streaming",
+        action="store_true",
+        help="Wait for the complete LLM response instead of streaming it and stopping after the first sentence",
+    )
+    parser.add_argument(
+        "--llm-max-tokens",
+        type=int,
+        default=256,
+        help="Maximum number of tokens generated for a streamed LLM response (default: 256)",
+    )
+    parser.add_argument(
+        "--no-hedging",
+        action="store_true",
+        help="Don't send a duplicate LLM or translation request when the original one is unusually slow",
+    )
+    parser.add_argument(
+        "--word-latency-budget",
+        type=float,
+        default=None,
+        help="Fail the request if preparing a single word takes longer than this number of seconds",
+    )
+    parser.add_argument(
+        "--llm-latency-budget",
+        type=float,
+        default=None,
+        help="Fail an LLM request, including its hedged duplicate, after this number of seconds",
+    )
+    parser.add_argument(
+        "--translation-latency-budget",
+        type=float,
+        default=None,
+        help="Fail a translation request, including its hedged duplicate, after this number of seconds",
+    )
+    default_llm_cache_path = os.path.join(default_cache_dir(), "llm_responses.sqlite3")
+    parser.add_argument(
+        "--llm-cache-path",
+        default=default_llm_cache_path,
+        help=f"SQLite file to cache LLM responses in (default: {default_llm_cache_path})",
+    )
+    parser.add_argument(
+        "--llm-cache-max-entries",
+        type=int,
+        default=100_000,
+        help="Maximum number of cached LLM responses, least recently used ones are evicted (default: 100000)",
+    )
+    parser.add_argument(
+        "--llm-cache-ttl-days",
+        type=float,
+        default=90,
+        help="Cached LLM responses older than this are requested again (default: 90)",
+    )
+    parser.add_argument(
+        "--no-llm-cache",
+        action="store_true",
+        help="Always ask the LLM, don't read or write the LLM response cache",
+    )
+    parser.add_argument(
+        "--translation-max-connections",
+        type=int,
+        default=8,
+        help="Maximum number of connections kept open to the translation server (default: 8)",
+    )
+    parser.add_argument(
+        "--translation-min-concurrency",
+        type=int,
+        default=1,
+        help="Lowest number of concurrent translation requests the adaptive limit can go down to (default: 1)",
+    )
+    parser.add_argument(
+        "--translation-max-concurrency",
+        type=int,
+        default=8,
+        help="Highest number of concurrent translation requests the adaptive limit can go up to (default: 8)",
+    )
+    parser.add_argument(
+        "--translation-batch-size",
+        type=int,
+        default=1,
+        help="Number of texts to translate in a single request, 1 disables batching (default: 1). "
+        "Off by default: the texts of a batch are translated together as numbered lines, which gives the translator "
+        "the other words as context and may change the translation of a single word",
+    )
+    parser.add_argument(
+        "--translation-batch-delay",
+        type=float,
+        default=0.05,
+        help="Seconds to wait for more texts to translate in the same batch (default: 0.05)",
+    )
+    parser.add_argument(
+        "--translation-slow-call-seconds",
+        type=float,
+        default=5.0,
+        help="Translations slower than this count as failures of the translator, when half of the recent ones "
+        "fail, translations go to the fallback translator for a while (default: 5)",
+    )
+    parser.add_argument(
+        "--translation-circuit-open-seconds",
+        type=float,
+        default=30.0,
+        help="Seconds to use the fallback translator before trying the translator again (default: 30)",
+    )
+    parser.add_argument(
+        "--no-llm-translation-fallback",
+        action="store_true",
+        help="Fail the translations while the translator fails or is slow, instead of translating with the LLM",
+    )
+    default_translation_cache_file = default_translation_cache_path()
+    parser.add_argument(
+        "--translation-cache-path",
+        default=default_translation_cache_file,
+        help=f"SQLite file to cache translations in (default: {default_translation_cache_file})",
+    )
+    parser.add_argument(
+        "--translation-cache-max-entries",
+        type=int,
+        default=200_000,
+        help="Maximum number of cached translations, least recently used ones are evicted (default: 200000)",
+    )
+    parser.add_argument(
+        "--no-translation-cache",
+        action="store_true",
+        help="Always ask the translator, don't read or write the translation cache",
+    )
+    parser.add_argument(
+        "--offline-dictionary-path",
+        help="Dictionary file to translate single words with before asking the translator, "
+        "build it with `python -m app.offline_dictionary` (default: disabled)",
+    )
+    parser.add_argument(
+        "--tts-engine",
+        choices=tts_engine_choices(),
+        default="auto",
+        help="Text-to-speech engine, 'auto' is 'say' on macOS and 'piper' elsewhere (default: auto)",
+    )
+    default_voices_dir = default_piper_voices_dir()
+    parser.add_argument(
+        "--piper-voices-dir",
+        default=default_voices_dir,
+        help=f"Directory with the piper voice models de_DE-thorsten-medium and en_US-lessac-medium "
+        f"(default: {default_voices_dir})",
+    )
+    parser.add_argument(
+        "--piper-processes-per-voice",
+        type=int,
+        help="Number of long-lived piper processes per voice, each holds the voice model in memory "
+        "(default: --tts-max-workers, but at most 4)",
+    )
+    parser.add_argument(
+        "--tts-max-workers",
+        type=int,
+        help="Number of audio clips synthesized at the same time (default: the number of CPU cores)",
+    )
+    parser.add_argument(
+        "--tts-batch-size",
+        type=int,
+        default=20,
+        help="Maximum number of texts spoken by one synthesizer run and split into clips afterwards, "
+        "1 speaks every text separately (default: 20)",
+    )
+    parser.add_argument(
+        "--audio-codec",
+        choices=audio_codec_choices(),
+        default="mp3",
+        help="Codec of the card audio, 'opus' needs opusenc and is stored as .ogg, which older Anki clients "
+        "on iOS don't play (default: mp3)",
+    )
+    parser.add_argument(
+        "--audio-bitrate",
+        type=int,
+        default=64,
+        help="Bitrate of the card audio in kbps, the average one with --audio-vbr (default: 64)",
+    )
+    parser.add_argument(
+        "--audio-vbr",
+        action="store_true",
+        help="Encode the card audio with a variable bitrate",
+    )
+    parser.add_argument(
+        "--no-audio-trim-silence",
+        action="store_true",
+        help="Keep the leading and trailing silence of the synthesized speech",
+    )
+    default_audio_cache_path = os.path.join(default_cache_dir(), "audio")
+    parser.add_argument(
+        "--audio-cache-path",
+        default=default_audio_cache_path,
+        help=f"Directory to cache the synthesized audio clips in (default: {default_audio_cache_path})",
+    )
+    parser.add_argument(
+        "--audio-cache-max-mb",
+        type=float,
+        default=500,
+        help="Maximum size of the cached audio clips, least recently used ones are removed (default: 500)",
+    )
+    parser.add_argument(
+        "--no-audio-cache",
+        action="store_true",
+        help="Always synthesize the audio clips, don't read or write the audio cache",
+    )
+    parser.add_argument(
+        "--llm-batch-size",
+        type=int,
+        default=1,
+        help="Number of words to generate sentence examples for in a single LLM request, 1 disables batching "
+        "(default: 1)",
+    )
+    parser.add_argument(
+        "--llm-all-in-one",
+        action="store_true",
+        help="Ask the LLM for the sentence example together with its translations in a single request, "
+        "Google Translate is used only for the translations missing or invalid in the response",
+    )
     return parser.parse_args()
@@ -0,0 +1,111 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Optional
+
+from app.utils import check
+
+
+def make_cache_key(*parts: Any) -> str:
+    """Content-addressed key: the same parts always give the same key, across runs and machines."""
+    serialized = json.dumps(parts, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+
+class DiskCache:
+    """
+    Persistent key-value cache stored in a SQLite file.
+    Least recently used entries are evicted once `max_entries` is exceeded,
+    and entries older than `ttl_seconds` (if set) are treated as absent.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int,
+        ttl_seconds: Optional[float] = None,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        check(max_entries > 0, f"Expected max_entries to be positive, but got {max_entries}")
+        check(ttl_seconds is None or ttl_seconds > 0, f"Expected ttl_seconds to be positive, but got {ttl_seconds}")
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._clock = clock
+        # Flask serves requests from several threads, so the connection is shared under a lock
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)")
+        logging.info(f'Opened cache "{path}" with {len(self)} entries')
+
+    def get(self, key: str) -> Optional[str]:
+        now = self._clock()
+        with self._lock:
+            row = self._connection.execute("SELECT value, created_at FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is not None and self._is_expired(row[1], now):
+                self._connection.execute("DELETE FROM entries WHERE key = ?", (key,))
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._connection.execute("UPDATE entries SET last_access = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            value: str = row[0]
+            return value
+
+    def put(self, key: str, value: str) -> None:
+        now = self._clock()
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO entries (key, value, created_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            self._evict_least_recently_used()
+
+    def items(self) -> list[tuple[str, str]]:
+        with self._lock:
+            return self._connection.execute("SELECT key, value FROM entries ORDER BY last_access").fetchall()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._connection.execute("DELETE FROM entries")
+            self.hits = 0
+            self.misses = 0
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    def stats(self) -> dict[str, Any]:
+        return {"path": self.path, "entries": len(self), "hits": self.hits, "misses": self.misses}
+
+    def __len__(self) -> int:
+        with self._lock:
+            count: int = self._connection.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            return count
+
+    def _is_expired(self, created_at: float, now: float) -> bool:
+        return self.ttl_seconds is not None and now - created_at > self.ttl_seconds
+
+    def _evict_least_recently_used(self) -> None:
+        count: int = self._connection.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            self._connection.execute(
+                "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY last_access LIMIT ?)", (excess,)
+            )
@@ -0,0 +1,128 @@
+import contextlib
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, Optional
+
+from app.utils import check
+
+
+@dataclass
+class Endpoint:
+    address: str
+    # Requests sent to the endpoint, but not answered yet
+    outstanding: int = 0
+    # Exponentially weighted moving average of successful request latencies
+    latency_ewma_seconds: Optional[float] = None
+    requests: int = 0
+    failures: int = 0
+    consecutive_failures: int = 0
+    unhealthy_until: float = 0.0
+
+
+class EndpointPool:
+    """
+    Balances requests between several servers of the same service with the power of two choices:
+    two random healthy endpoints are compared, and the one with fewer outstanding requests is used.
+
+    Health is checked passively: after `failure_threshold` failed requests in a row
+    an endpoint is not used for `unhealthy_cooldown_seconds`, then it gets requests again.
+    """
+
+    _LATENCY_EWMA_WEIGHT = 0.2
+
+    def __init__(
+        self,
+        addresses: list[str],
+        failure_threshold: int = 3,
+        unhealthy_cooldown_seconds: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+        rng: Optional[random.Random] = None,
+    ) -> None:
+        check(len(addresses) > 0, "Expected at least one endpoint")
+        self.endpoints = [Endpoint(address) for address in addresses]
+        self.failure_threshold = failure_threshold
+        self.unhealthy_cooldown_seconds = unhealthy_cooldown_seconds
+        self._clock = clock
+        self._rng = rng or random.Random()
+        self._lock = threading.Lock()
+
+    def healthy_endpoints(self) -> list[Endpoint]:
+        now = self._clock()
+        return [e for e in self.endpoints if e.unhealthy_until <= now]
+
+    def choose(self, exclude: Optional[set[str]] = None) -> Endpoint:
+        exclude = exclude or set()
+        candidates = [e for e in self.healthy_endpoints() if e.address not in exclude]
+        if not candidates:
+            # Better to try an unhealthy endpoint than to fail without trying
+            candidates = [e for e in self.endpoints if e.address not in exclude] or self.endpoints
+            return min(candidates, key=lambda e: e.unhealthy_until)
+        if len(candidates) == 1:
+            return candidates[0]
+        first, second = self._rng.sample(candidates, 2)
+        return min(first, second, key=self._load_key)
+
+    @staticmethod
+    def _load_key(endpoint: Endpoint) -> tuple[int, float]:
+        latency = endpoint.latency_ewma_seconds if endpoint.latency_ewma_seconds is not None else 0.0
+        return endpoint.outstanding, latency
+
+    @contextlib.asynccontextmanager
+    async def use(self, exclude: Optional[set[str]] = None) -> AsyncIterator[Endpoint]:
+        with self._lock:
+            endpoint = self.choose(exclude)
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+        start = self._clock()
+        try:
+            yield endpoint
+        except Exception:
+            self._on_done(endpoint, latency=None, failed=True)
+            raise
+        except GeneratorExit:
+            # A streamed response which the consumer stopped reading early, the endpoint did answer
+            self._on_done(endpoint, latency=self._clock() - start, failed=False)
+            raise
+        except BaseException:
+            self._on_done(endpoint, latency=None, failed=False)
+            raise
+        self._on_done(endpoint, latency=self._clock() - start, failed=False)
+
+    def mark_unhealthy(self, address: str) -> None:
+        with self._lock:
+            for endpoint in self.endpoints:
+                if endpoint.address == address:
+                    endpoint.unhealthy_until = self._clock() + self.unhealthy_cooldown_seconds
+
+    def _on_done(self, endpoint: Endpoint, latency: Optional[float], failed: bool) -> None:
+        with self._lock:
+            endpoint.outstanding -= 1
+            if failed:
+                endpoint.failures += 1
+                endpoint.consecutive_failures += 1
+                if endpoint.consecutive_failures >= self.failure_threshold:
+                    endpoint.unhealthy_until = self._clock() + self.unhealthy_cooldown_seconds
+            elif latency is not None:
+                endpoint.consecutive_failures = 0
+                if endpoint.latency_ewma_seconds is None:
+                    endpoint.latency_ewma_seconds = latency
+                else:
+                    endpoint.latency_ewma_seconds += self._LATENCY_EWMA_WEIGHT * (
+                        latency - endpoint.latency_ewma_seconds
+                    )
+
+    def stats(self) -> list[dict[str, object]]:
+        now = self._clock()
+        return [
+            {
+                "address": e.address,
+                "healthy": e.unhealthy_until <= now,
+                "outstanding": e.outstanding,
+                "requests": e.requests,
+                "failures": e.failures,
+                "latency_ewma_seconds": e.latency_ewma_seconds,
+            }
+            for e in self.endpoints
+        ]
@@ -6,9 +6,8 @@ from typing import Final
 import genanki
 
 from app.anki_card_style import ANKI_CARD_CSS
-from app.anki_common import get_audio_file_name_for_phrase, get_audio_file_name_for_sentence
+from app.anki_common import AudioFiles
 from app.english_data_extract import EnglishWordData
-from app.tts import text_to_speech_into_file
 from app.utils import check
 
 # Magic constant. Just random number, because we have to assign something unique.
@@ -86,7 +85,7 @@ def _create_anki_note(
     )
 
 
-def export_results_to_anki_deck(
+async def export_results_to_anki_deck(
     results: list[EnglishWordData], deck_filename: str, deck_name: str = _GENERATED_DECK_NAME
 ) -> None:
     check(deck_filename.endswith(".apkg"), f"Expected deck filename to have .apkg extension, but got {deck_filename}")
@@ -94,25 +93,18 @@ def export_results_to_anki_deck(
     my_model = _get_anki_card_model()
     my_deck = genanki.Deck(_GENERATED_DECK_ID, deck_name)
 
-    all_media_files = []
-
     with tempfile.TemporaryDirectory(prefix="anki_cards_generator_media_") as temp_dir:
         logging.info("Created temporary directory " + temp_dir)
+        audio_files = AudioFiles(temp_dir)
         for r in results:
-            word_audio_name = get_audio_file_name_for_phrase(r.original_word, lang="en")
-            word_audio_path = f"{temp_dir}/{word_audio_name}"
-            text_to_speech_into_file(r.original_word, word_audio_path, lang="en")
-            all_media_files.append(word_audio_path)
-
-            sentence_audio_name = get_audio_file_name_for_sentence(r.original_word, lang="en")
-            sentence_audio_path = f"{temp_dir}/{sentence_audio_name}"
-            text_to_speech_into_file(r.sentence_example, sentence_audio_path, lang="en")
-            all_media_files.append(sentence_audio_path)
+            word_audio_name = audio_files.add(r.original_word, "en")
+            sentence_audio_name = audio_files.add(r.sentence_example, "en")
 
             note = _create_anki_note(my_model, data=r, word_audio=word_audio_name, sentence_audio=sentence_audio_name)
             my_deck.add_note(note)
 
+        await audio_files.synthesize()
         pkg = genanki.Package(my_deck)
-        pkg.media_files = all_media_files
+        pkg.media_files = audio_files.media_files
         logging.info(f"Writing deck to temporary file {deck_filename}")
         pkg.write_to_file(deck_filename)
@@ -1,9 +1,16 @@
 import logging
 from dataclasses import dataclass
+from typing import Optional
 
-from app.common_data_extract import generate_sentence_example_with_llm
+from app.common_data_extract import (
+    SentenceWithTranslations,
+    generate_sentence_example_with_translations,
+    is_all_in_one_llm_mode,
+    run_word_stages,
+)
 from app.spelling import correct_spelling
-from app.translate import translate_text
+from app.stage_graph import Stage, StageCache
+from app.translate import translate_text, translate_word
 from app.utils import check
 from app.word_hints import WordHints
 
@@ -16,24 +23,70 @@ class EnglishWordData:
     sentence_example_translated: str
 
 
+def canonical_english_word(word: str) -> str:
+    """Same for the spellings of a word which give the same card, e.g., "Cat" and "cat"."""
+    return " ".join(word.lower().split())
+
+
 async def prepare_data_for_english_word(word: str, hints: WordHints) -> EnglishWordData:
     check(len(word.strip()) > 0, "Expected non empty word")
 
-    orig_word = word
-    word = correct_spelling(word, language="en")
-    if orig_word != word:
-        logging.info(f"Corrected spelling from {orig_word} to {word}")
+    all_in_one = is_all_in_one_llm_mode()
+
+    async def corrected_word() -> str:
+        corrected = correct_spelling(word, language="en")
+        if corrected != word:
+            logging.info(f"Corrected spelling from {word} to {corrected}")
+        return corrected
+
+    async def sentence(corrected_word: str) -> SentenceWithTranslations:
+        fields = {"sentence_example_translated": "Russian translation of the sentence"}
+        if not hints.translated_ru:
+            fields["translated"] = f'Russian translation of "{corrected_word}"'
+        return await generate_sentence_example_with_translations(
+            corrected_word, language="English", is_phrase=False, fields=fields
+        )
+
+    async def sentence_translated(sentence: SentenceWithTranslations) -> str:
+        sentence_example, llm_translations = sentence
+        return llm_translations["sentence_example_translated"] or await translate_text(
+            sentence_example, src="en", dest="ru"
+        )
 
-    en_sentence_example = await generate_sentence_example_with_llm(word, language="English", is_phrase=False)
+    # Without the all-in-one mode the word is translated while the LLM generates the sentence example
+    async def translated(corrected_word: str, sentence: Optional[SentenceWithTranslations] = None) -> str:
+        if hints.translated_ru:
+            return hints.translated_ru
+        llm_translation = sentence[1]["translated"] if sentence else None
+        return (llm_translation or await _translate_from_english(corrected_word)).lower()
 
-    if hints.translated_ru:
-        translated = hints.translated_ru
-    else:
-        translated = (await translate_text(word, src="en", dest="ru")).lower()
+    results = await run_word_stages(
+        "english_word",
+        [
+            Stage("corrected_word", corrected_word, cache=__ENGLISH_SPELLING_CACHE, cache_key=lambda: word),
+            Stage("sentence", sentence, depends_on=["corrected_word"]),
+            Stage("sentence_translated", sentence_translated, depends_on=["sentence"]),
+            Stage(
+                "translated",
+                translated,
+                depends_on=["corrected_word", "sentence"] if all_in_one else ["corrected_word"],
+            ),
+        ],
+    )
 
     return EnglishWordData(
-        original_word=word,
-        translated=translated,
-        sentence_example=en_sentence_example,
-        sentence_example_translated=await translate_text(en_sentence_example, src="en", dest="ru"),
+        original_word=results["corrected_word"],
+        translated=results["translated"],
+        sentence_example=results["sentence"][0],
+        sentence_example_translated=results["sentence_translated"],
     )
+
+
+# Spelling correction takes a noticeable time, its results never change
+__ENGLISH_SPELLING_CACHE: StageCache = StageCache(max_entries=10_000)
+
+
+async def _translate_from_english(word: str) -> str:
+    if " " not in word.strip():
+        return await translate_word(word, src="en", dest="ru")
+    return await translate_text(word, src="en", dest="ru")
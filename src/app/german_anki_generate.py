@@ -7,9 +7,8 @@ import genanki
 from genanki import Note
 
 from app.anki_card_style import ANKI_CARD_CSS
-from app.anki_common import get_audio_file_name_for_phrase, get_audio_file_name_for_sentence
+from app.anki_common import AudioFiles
 from app.german_data_extract import GermanWordData
-from app.tts import text_to_speech_into_file
 from app.utils import check
 
 # Magic constant. Just random number, because we have to assign something unique.
@@ -115,7 +114,7 @@ def shorten_german_noun_plural_form_for_anki_card(word_singular: str, word_plura
         return "die " + word_plural
 
 
-def export_results_to_anki_deck(
+async def export_results_to_anki_deck(
     results: list[GermanWordData], deck_filename: str, deck_name: str = _GENERATED_DECK_NAME
 ) -> None:
     check(deck_filename.endswith(".apkg"), f"Expected deck filename to have .apkg extension, but got {deck_filename}")
@@ -123,34 +122,28 @@ def export_results_to_anki_deck(
     my_model = _get_anki_card_model()
     my_deck = genanki.Deck(_GENERATED_DECK_ID, deck_name)
 
-    all_media_files: list[str] = []
-
     with tempfile.TemporaryDirectory(prefix="anki_cards_generator_media_") as temp_dir:
         logging.info("Created temporary directory " + temp_dir)
+        audio_files = AudioFiles(temp_dir)
         for r in results:
             logging.info(f'Creating Anki note for word "{r.word}"')
-            note = _create_anki_note_for_german_word_data(r, my_model, all_media_files, temp_dir)
+            note = _create_anki_note_for_german_word_data(r, my_model, audio_files)
             my_deck.add_note(note)
 
+        await audio_files.synthesize()
         pkg = genanki.Package(my_deck)
-        pkg.media_files = all_media_files
+        pkg.media_files = audio_files.media_files
         logging.info(f"Writing deck to temporary file {deck_filename}")
         pkg.write_to_file(deck_filename)
 
 
-def _create_anki_note_for_german_word_data(
-    r: GermanWordData, model: genanki.Model, all_media_files: list[str], temp_dir: str
-) -> Note:
+def _create_anki_note_for_german_word_data(r: GermanWordData, model: genanki.Model, audio_files: AudioFiles) -> Note:
     word_translated = f"{r.translated_ru}, {r.translated_en}"
     word_de_for_card = r.word
     if r.word_note_suffix:
         word_de_for_card += " " + r.word_note_suffix
     word_article = ""
-    word_audio_name = get_audio_file_name_for_phrase(r.word, lang="de")
-    word_audio_path = f"{temp_dir}/{word_audio_name}"
-    sentence_audio_name = get_audio_file_name_for_sentence(r.word, lang="de")
-    sentence_audio_path = f"{temp_dir}/{sentence_audio_name}"
-    text_to_speech_into_file(r.sentence_example, sentence_audio_path, lang="de")
+    sentence_audio_name = audio_files.add(r.sentence_example, "de")
     if r.noun_properties:
         noun_props = r.noun_properties
 
@@ -166,8 +159,7 @@ def _create_anki_note_for_german_word_data(
 
         word_article = noun_props.article
 
-    word_audio_text = get_word_audio_text(r)
-    text_to_speech_into_file(word_audio_text, word_audio_path, lang="de")
+    word_audio_name = audio_files.add(get_word_audio_text(r), "de")
     note = _create_anki_note(
         model,
         word_de=word_de_for_card,
@@ -178,8 +170,6 @@ def _create_anki_note_for_german_word_data(
         word_audio=word_audio_name,
         sentence_audio=sentence_audio_name,
     )
-    all_media_files.append(word_audio_path)
-    all_media_files.append(sentence_audio_path)
     return note
 
 
@@ -1,19 +1,39 @@
+import functools
 import logging
 from dataclasses import dataclass
 from enum import Enum
-from typing import Final, Optional, Literal, Tuple
+from typing import Optional, Literal, Tuple
 
 import german_nouns.lookup
 from HanTa.HanoverTagger import HanoverTagger
 
-from app.common_data_extract import generate_sentence_example_with_llm
+from app.common_data_extract import (
+    SentenceWithTranslations,
+    generate_sentence_example_with_translations,
+    is_all_in_one_llm_mode,
+    run_word_stages,
+)
 from app.spelling import correct_spelling
-from app.translate import translate_text
+from app.stage_graph import Stage, StageCache
+from app.translate import translate_text, translate_word
 from app.utils import check
 from app.word_hints import WordHints
 
-_pos_tagger_de = HanoverTagger("morphmodel_ger.pgz")
-_german_nouns_obj: Final[german_nouns.lookup.Nouns] = german_nouns.lookup.Nouns()
+
+# Dictionaries take seconds to load, so they are loaded on the first use or by preload_german_dictionaries
+@functools.cache
+def _get_pos_tagger_de() -> HanoverTagger:
+    return HanoverTagger("morphmodel_ger.pgz")
+
+
+@functools.cache
+def _get_german_nouns() -> german_nouns.lookup.Nouns:
+    return german_nouns.lookup.Nouns()
+
+
+def preload_german_dictionaries() -> None:
+    _get_pos_tagger_de()
+    _get_german_nouns()
 
 
 class PartOfSpeech(Enum):
@@ -31,7 +51,7 @@ def pos_tag_to_part_of_speech(pos_tag: str) -> PartOfSpeech:
 
 
 def get_extra_noun_info(word: str) -> Tuple[str, str, str]:
-    result = _german_nouns_obj[word]
+    result = _get_german_nouns()[word]
 
     if len(result) == 0:
         raise NotImplementedError(f'No noun info for word "{word}"')
@@ -117,6 +137,19 @@ def extract_note_suffix(word_infinitive: str) -> Tuple[str, str]:
     return word_infinitive, ""
 
 
+def canonical_german_word(word_or_phrase: str) -> str:
+    """
+    Same for the spellings of a word which give the same card, e.g., "die Katze", "Katze" and "Katze (+Dat)".
+    The case is kept, because it distinguishes nouns from other words, like "Essen" and "essen",
+    unless the article tells that it's a noun.
+    """
+    word = " ".join(word_or_phrase.split())
+    without_article = strip_noun_article(word)
+    if without_article != word:
+        without_article = without_article[:1].upper() + without_article[1:]
+    return extract_note_suffix(without_article)[0]
+
+
 async def prepare_data_for_german_word(original_word_or_phrase: str, hints: WordHints) -> GermanWordData:
     word_or_phrase = strip_noun_article(original_word_or_phrase)
     check(len(word_or_phrase.strip()) > 0, "Expected non empty word_or_phrase")
@@ -124,8 +157,77 @@ async def prepare_data_for_german_word(original_word_or_phrase: str, hints: Word
     if not is_single_word(word_or_phrase):
         return await prepare_data_for_german_phrase(word_or_phrase, hints)
 
-    word = word_or_phrase
-    word, word_note_suffix = extract_note_suffix(word)
+    word, word_note_suffix = extract_note_suffix(word_or_phrase)
+    all_in_one = is_all_in_one_llm_mode()
+
+    async def analyze() -> GermanWordAnalysis:
+        return analyze_german_word(word)
+
+    async def sentence(analysis: GermanWordAnalysis) -> SentenceWithTranslations:
+        return await generate_sentence_example_with_translations(
+            analysis.word_with_article,
+            language="German",
+            is_phrase=False,
+            fields=get_translation_fields(analysis.word_with_article, analysis.part_of_speech, hints),
+        )
+
+    async def sentence_translated_en(sentence: SentenceWithTranslations) -> str:
+        sentence_example, llm_translations = sentence
+        return llm_translations["sentence_example_translated_en"] or await translate_text(
+            sentence_example, src="de", dest="en"
+        )
+
+    # Without the all-in-one mode the word is translated while the LLM generates the sentence example
+    async def translated_en(analysis: GermanWordAnalysis, sentence: Optional[SentenceWithTranslations] = None) -> str:
+        llm_translation = sentence[1]["translated_en"] if sentence else None
+        return await translate_de_to_en(analysis.word_with_article, analysis.part_of_speech, llm_translation)
+
+    async def translated_ru(analysis: GermanWordAnalysis, sentence: Optional[SentenceWithTranslations] = None) -> str:
+        llm_translation = sentence[1].get("translated_ru") if sentence else None
+        return await translate_de_to_ru(analysis.word_with_article, hints, llm_translation, analysis.part_of_speech)
+
+    translation_dependencies = ["analysis", "sentence"] if all_in_one else ["analysis"]
+    results = await run_word_stages(
+        "german_word",
+        [
+            Stage("analysis", analyze, cache=__GERMAN_WORD_ANALYSIS_CACHE, cache_key=lambda: word),
+            Stage("sentence", sentence, depends_on=["analysis"]),
+            Stage("sentence_translated_en", sentence_translated_en, depends_on=["sentence"]),
+            Stage("translated_en", translated_en, depends_on=translation_dependencies),
+            Stage("translated_ru", translated_ru, depends_on=translation_dependencies),
+        ],
+    )
+
+    analysis = results["analysis"]
+    return GermanWordData(
+        word=analysis.word,
+        pos_tag=analysis.pos_tag,
+        part_of_speech=analysis.part_of_speech,
+        word_note_suffix=word_note_suffix,
+        translated_en=results["translated_en"],
+        translated_ru=results["translated_ru"],
+        noun_properties=analysis.noun_properties,
+        sentence_example=results["sentence"][0],
+        sentence_example_translated_en=results["sentence_translated_en"],
+    )
+
+
+@dataclass
+class GermanWordAnalysis:
+    # Spelling corrected word
+    word: str
+    pos_tag: str
+    part_of_speech: PartOfSpeech
+    noun_properties: Optional[GermanNounProperties]
+
+    @property
+    def word_with_article(self) -> str:
+        if self.noun_properties:
+            return f"{self.noun_properties.article} {self.word}"
+        return self.word
+
+
+def analyze_german_word(word: str) -> GermanWordAnalysis:
     before_correcting_word = word
     word = correct_spelling(word, language="de")
     if before_correcting_word != word:
@@ -135,9 +237,6 @@ async def prepare_data_for_german_word(original_word_or_phrase: str, hints: Word
     part_of_speech = detect_part_of_speech_for_single_word(word, pos_tag)
 
     noun_properties = None
-    word_infinitive_for_card = word
-    word_with_article = word
-
     if part_of_speech == PartOfSpeech.Noun:
         singular, plural, genus = get_extra_noun_info(word)
         noun_properties = GermanNounProperties(
@@ -146,28 +245,17 @@ async def prepare_data_for_german_word(original_word_or_phrase: str, hints: Word
             genus=genus,
             article=get_article_for_german_genus(genus),
         )
-        word_with_article = f"{noun_properties.article} {word}"
-
-    german_sentence_example = await generate_sentence_example_with_llm(
-        word_with_article, language="German", is_phrase=False
+    return GermanWordAnalysis(
+        word=word, pos_tag=pos_tag, part_of_speech=part_of_speech, noun_properties=noun_properties
     )
-    sentence_example_translated_en = await translate_text(german_sentence_example, src="de", dest="en")
 
-    return GermanWordData(
-        word=word_infinitive_for_card,
-        pos_tag=pos_tag,
-        part_of_speech=part_of_speech,
-        word_note_suffix=word_note_suffix,
-        translated_en=await translate_de_to_en(word_with_article, part_of_speech),
-        translated_ru=await translate_de_to_ru(word_with_article, hints),
-        noun_properties=noun_properties,
-        sentence_example=german_sentence_example,
-        sentence_example_translated_en=sentence_example_translated_en,
-    )
+
+# Spelling correction and the dictionary lookups take a noticeable time, their results never change
+__GERMAN_WORD_ANALYSIS_CACHE: StageCache = StageCache(max_entries=10_000)
 
 
 def get_part_of_speech(word: str) -> Tuple[str, str]:
-    return _pos_tagger_de.analyze(strip_sich_from_reflexive_verb(word))
+    return _get_pos_tagger_de().analyze(strip_sich_from_reflexive_verb(word))
 
 
 def strip_sich_from_reflexive_verb(word: str) -> str:
@@ -199,33 +287,90 @@ def detect_part_of_speech_for_single_word(word: str, pos_tag: str) -> PartOfSpee
 
 async def prepare_data_for_german_phrase(phrase: str, hints: WordHints) -> GermanWordData:
     phrase, note_suffix = extract_note_suffix(phrase)
-    german_sentence_example = await generate_sentence_example_with_llm(phrase, language="German", is_phrase=True)
+    all_in_one = is_all_in_one_llm_mode()
+
+    async def sentence() -> SentenceWithTranslations:
+        return await generate_sentence_example_with_translations(
+            phrase, language="German", is_phrase=True, fields=get_translation_fields(phrase, PartOfSpeech.Other, hints)
+        )
+
+    async def sentence_translated_en(sentence: SentenceWithTranslations) -> str:
+        sentence_example, llm_translations = sentence
+        return llm_translations["sentence_example_translated_en"] or await translate_text(
+            sentence_example, src="de", dest="en"
+        )
+
+    async def translated_en(sentence: Optional[SentenceWithTranslations] = None) -> str:
+        llm_translation = sentence[1]["translated_en"] if sentence else None
+        return await translate_de_to_en(phrase, PartOfSpeech.Other, llm_translation)
+
+    async def translated_ru(sentence: Optional[SentenceWithTranslations] = None) -> str:
+        return await translate_de_to_ru(phrase, hints, sentence[1].get("translated_ru") if sentence else None)
+
+    translation_dependencies = ["sentence"] if all_in_one else []
+    results = await run_word_stages(
+        "german_phrase",
+        [
+            Stage("sentence", sentence),
+            Stage("sentence_translated_en", sentence_translated_en, depends_on=["sentence"]),
+            Stage("translated_en", translated_en, depends_on=translation_dependencies),
+            Stage("translated_ru", translated_ru, depends_on=translation_dependencies),
+        ],
+    )
 
     return GermanWordData(
         word=phrase,
         pos_tag="",
         part_of_speech=PartOfSpeech.Other,
-        translated_en=await translate_de_to_en(phrase, PartOfSpeech.Other),
-        translated_ru=await translate_de_to_ru(phrase, hints),
+        translated_en=results["translated_en"],
+        translated_ru=results["translated_ru"],
         noun_properties=None,
-        sentence_example=german_sentence_example,
-        sentence_example_translated_en=await translate_text(german_sentence_example, src="de", dest="en"),
+        sentence_example=results["sentence"][0],
+        sentence_example_translated_en=results["sentence_translated_en"],
         word_note_suffix=note_suffix,
     )
 
 
-async def translate_de_to_ru(text: str, hints: WordHints) -> str:
+def get_translation_fields(word_or_phrase: str, part_of_speech: PartOfSpeech, hints: WordHints) -> dict[str, str]:
+    """Translations to ask from the LLM together with the sentence example in the all-in-one mode."""
+    translated_en_description = f'English translation of "{word_or_phrase}"'
+    if part_of_speech == PartOfSpeech.Verb:
+        translated_en_description += ' starting with "to "'
+    elif part_of_speech == PartOfSpeech.Noun:
+        translated_en_description += " without an article"
+    fields = {
+        "sentence_example_translated_en": "English translation of the sentence",
+        "translated_en": translated_en_description,
+    }
+    if not hints.translated_ru:
+        fields["translated_ru"] = f'Russian translation of "{word_or_phrase}"'
+    return fields
+
+
+async def translate_de_to_ru(
+    text: str,
+    hints: WordHints,
+    llm_translation: Optional[str] = None,
+    part_of_speech: PartOfSpeech = PartOfSpeech.Other,
+) -> str:
     if hints.translated_ru:
         return hints.translated_ru
     else:
-        return (await translate_text(text, src="de", dest="ru")).lower()
+        return (llm_translation or await _translate_from_german(text, "ru", part_of_speech)).lower()
 
 
-async def translate_de_to_en(text: str, part_of_speech: PartOfSpeech) -> str:
-    translation = (await translate_text(text, src="de", dest="en")).lower()
+async def translate_de_to_en(text: str, part_of_speech: PartOfSpeech, llm_translation: Optional[str] = None) -> str:
+    translation = (llm_translation or await _translate_from_german(text, "en", part_of_speech)).lower()
     return post_process_en_translation(translation, part_of_speech)
 
 
+async def _translate_from_german(text: str, dest: str, part_of_speech: PartOfSpeech) -> str:
+    # Single words, including nouns with their article, may be in the offline dictionary
+    if is_single_word(strip_noun_article(text)):
+        return await translate_word(text, src="de", dest=dest, part_of_speech=part_of_speech.value)
+    return await translate_text(text, src="de", dest=dest)
+
+
 def is_single_word(word_or_phrase: str) -> bool:
     word_or_phrase = strip_sich_from_reflexive_verb(word_or_phrase)
     word_or_phrase, _ = extract_note_suffix(word_or_phrase)
@@ -0,0 +1,151 @@
+import asyncio
+import collections
+import logging
+import math
+import threading
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from app.utils import check
+
+R = TypeVar("R")
+
+
+class LatencyTracker:
+    """Keeps the most recent latencies to estimate latency percentiles."""
+
+    def __init__(self, window_size: int = 200, min_samples: int = 20) -> None:
+        self.min_samples = min_samples
+        self._latencies: collections.deque[float] = collections.deque(maxlen=window_size)
+        self._lock = threading.Lock()
+
+    def record(self, latency: float) -> None:
+        with self._lock:
+            self._latencies.append(latency)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Returns None until there are enough samples for a meaningful estimate."""
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            ordered = sorted(self._latencies)
+        index = min(math.ceil(p * len(ordered)) - 1, len(ordered) - 1)
+        return ordered[max(index, 0)]
+
+
+@dataclass
+class HedgingStats:
+    calls: int = 0
+    # Calls which were slower than the percentile threshold, so a duplicate call was sent
+    hedged: int = 0
+    # Hedged calls where the duplicate answered first
+    hedge_won: int = 0
+
+
+class HedgedCaller:
+    """
+    Sends a duplicate (hedged) call when the original one is slower than the given percentile
+    of the recent latencies, uses whichever answers first and cancels the other one.
+    The tail latency then doesn't depend on a single hung call.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        percentile: float = 0.95,
+        min_hedge_delay_seconds: float = 0.1,
+        tracker: Optional[LatencyTracker] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        check(0 < percentile < 1, f"Expected percentile to be in (0, 1), but got {percentile}")
+        self.name = name
+        self.percentile = percentile
+        # Duplicating calls which are fast anyway only adds load
+        self.min_hedge_delay_seconds = min_hedge_delay_seconds
+        self.enabled = True
+        self.tracker = tracker or LatencyTracker()
+        self.stats = HedgingStats()
+        self._clock = clock
+
+    async def call(self, fn: Callable[[], Awaitable[R]]) -> R:
+        self.stats.calls += 1
+        hedge_delay = self.hedge_delay() if self.enabled else None
+        start = self._clock()
+        original = asyncio.ensure_future(fn())
+        try:
+            if hedge_delay is None:
+                return await original
+            done, _ = await asyncio.wait({original}, timeout=hedge_delay)
+            if done:
+                return original.result()
+
+            self.stats.hedged += 1
+            logging.info(f"{self.name} call is slower than {hedge_delay:.2f}s, sending a hedged call")
+            hedge = asyncio.ensure_future(fn())
+            try:
+                winner = await self._first_successful(original, hedge)
+            finally:
+                hedge.cancel()
+            if winner is hedge:
+                self.stats.hedge_won += 1
+            return winner.result()
+        finally:
+            # The latency of a cancelled original call is still recorded as a lower bound,
+            # otherwise the slow calls would never get into the statistics
+            self.tracker.record(self._clock() - start)
+            original.cancel()
+
+    def hedge_delay(self) -> Optional[float]:
+        threshold = self.tracker.percentile(self.percentile)
+        return max(threshold, self.min_hedge_delay_seconds) if threshold is not None else None
+
+    @staticmethod
+    async def _first_successful(*calls: "asyncio.Future[R]") -> "asyncio.Future[R]":
+        pending = set(calls)
+        while True:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for call in done:
+                if call.exception() is None:
+                    return call
+            if not pending:
+                # All calls failed, the original call error is the most relevant one
+                return calls[0]
+
+    def metrics(self) -> dict[str, Optional[float]]:
+        return {
+            "calls": self.stats.calls,
+            "hedged": self.stats.hedged,
+            "hedge_won": self.stats.hedge_won,
+            "hedge_delay_seconds": self.hedge_delay(),
+        }
+
+
+@dataclass
+class LatencyBudgets:
+    """Maximum time in seconds to spend on each stage and on a whole word, None means no limit."""
+
+    word_seconds: Optional[float] = None
+    llm_seconds: Optional[float] = None
+    translation_seconds: Optional[float] = None
+
+
+async def with_latency_budget(awaitable: Awaitable[R], budget_seconds: Optional[float], description: str) -> R:
+    if budget_seconds is None:
+        return await awaitable
+    try:
+        return await asyncio.wait_for(awaitable, budget_seconds)
+    except TimeoutError as e:
+        raise TimeoutError(f"{description} took longer than the latency budget of {budget_seconds}s") from e
+
+
+__LATENCY_BUDGETS: LatencyBudgets = LatencyBudgets()
+
+
+def set_latency_budgets(budgets: LatencyBudgets) -> None:
+    global __LATENCY_BUDGETS
+    __LATENCY_BUDGETS = budgets
+
+
+def get_latency_budgets() -> LatencyBudgets:
+    return __LATENCY_BUDGETS
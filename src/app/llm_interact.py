@@ -1,93 +1,682 @@
+import asyncio
+import collections
+import contextlib
+import dataclasses
+import functools
 import logging
-import sys
+import os
+import re
+import threading
 from abc import abstractmethod, ABC
-from typing import Final, Callable
+from dataclasses import dataclass, field
+from typing import Final, Callable, Any, Optional, AsyncIterator, TYPE_CHECKING, Awaitable, TypeVar
 
+import httpx
 import ollama
-import openai
 
+from app.concurrency_limit import AdaptiveConcurrencyLimiter
+from app.disk_cache import DiskCache, make_cache_key
+from app.endpoint_pool import EndpointPool
+from app.latency import HedgedCaller, with_latency_budget, get_latency_budgets
+from app.loop_local import LoopLocal
+from app.single_flight import SingleFlight
+from app.utils import DependencyUnavailableError, check
 
-async def ask_llm(prompt: str) -> str:
-    llm_provider = __LLM_PROVIDER
+if TYPE_CHECKING:
+    import openai
+
+T = TypeVar("T")
+
+
+class InvalidLlmResponseError(ValueError):
+    """The response was rejected by the validator on all attempts, `response` is the last one."""
+
+    def __init__(self, message: str, response: str):
+        super().__init__(message)
+        self.response = response
+
+
+async def ask_llm(
+    prompt: str,
+    validate: Optional[Callable[[str], None]] = None,
+    bypass_cache: bool = False,
+    stop_at_sentence_end: bool = False,
+    accept_invalid: Optional[Callable[[str], None]] = None,
+    accept_sentence_end: Optional[Callable[[str], bool]] = None,
+) -> str:
+    """
+    Asks the global LLM provider. Responses are served from and stored into the global LLM cache, if it's set.
+    `validate` is called on the response and must raise ValueError if the response is unusable,
+    so that an invalid response is never cached.
+    An invalid response is asked again from the next, usually bigger, fallback model,
+    or from the last model when there are no more fallback models, up to the maximum number of attempts.
+    Then the last response is returned if `accept_invalid` doesn't raise ValueError for it, otherwise
+    InvalidLlmResponseError is raised. An accepted response is not cached, so the next time the models are asked again.
+    With `stop_at_sentence_end` the response is streamed and the generation is stopped after the first sentence,
+    if `accept_sentence_end` returns True for it, e.g., when it contains the asked word. Otherwise the sentence end
+    may be a false one, e.g., after an unknown abbreviation, and the generation goes on.
+    """
+    llm_providers = [__LLM_PROVIDER, *__LLM_FALLBACK_PROVIDERS]
+    max_attempts = __LLM_MAX_ATTEMPTS if validate is not None else 1
+    for attempt in range(max_attempts):
+        llm_provider = llm_providers[min(attempt, len(llm_providers) - 1)]
+        __LLM_ROUTING_STATS[f"attempts.{_provider_name(llm_provider)}"] += 1
+        try:
+            return await _ask_llm_provider(
+                llm_provider,
+                prompt,
+                validate,
+                bypass_cache,
+                stop_at_sentence_end,
+                accept_sentence_end,
+            )
+        except InvalidLlmResponseError as e:
+            if attempt + 1 == max_attempts:
+                if accept_invalid is not None:
+                    _validate_response(accept_invalid, e.response)
+                    logging.warning(f"Using the LLM response which failed the validation: {e}")
+                    __LLM_ROUTING_STATS["accepted_invalid"] += 1
+                    return e.response
+                __LLM_ROUTING_STATS["failed"] += 1
+                raise
+            __LLM_ROUTING_STATS["retried"] += 1
+            logging.warning(f"Invalid LLM response, attempt {attempt + 1} of {max_attempts}: {e}")
+    raise AssertionError("Unreachable")
+
+
+async def _ask_llm_provider(
+    llm_provider: "LlmProvider",
+    prompt: str,
+    validate: Optional[Callable[[str], None]],
+    bypass_cache: bool,
+    stop_at_sentence_end: bool,
+    accept_sentence_end: Optional[Callable[[str], bool]] = None,
+) -> str:
+    llm_cache = None if bypass_cache else __LLM_CACHE
+    model_description = _model_description(llm_provider, stop_at_sentence_end)
+    cache_key = _llm_cache_key(llm_provider, prompt, stop_at_sentence_end)
+
+    if llm_cache is not None:
+        cached_response = llm_cache.get(cache_key)
+        if cached_response is not None:
+            logging.info(f"LLM cache hit, prompt='{prompt}', response='{cached_response}'")
+            _validate_response(validate, cached_response)
+            return cached_response
+
+    # Identical prompts sent at the same time, e.g., by two users with overlapping words, are asked only once
+    single_flight_key = make_cache_key(llm_provider.__class__.__name__, model_description, normalize_prompt(prompt))
+    response_text = await __LLM_SINGLE_FLIGHT.run(
+        single_flight_key, lambda: _request_llm(llm_provider, prompt, stop_at_sentence_end, accept_sentence_end)
+    )
+
+    _validate_response(validate, response_text)
+    if llm_cache is not None:
+        llm_cache.put(cache_key, response_text)
+    return response_text
+
+
+def _model_description(llm_provider: "LlmProvider", stop_at_sentence_end: bool) -> dict[str, Any]:
+    generation_mode = {"stop_at_sentence_end": stop_at_sentence_end}
+    if stop_at_sentence_end:
+        generation_mode["max_tokens"] = __LLM_MAX_GENERATED_TOKENS
+    return {**llm_provider.describe_model(), **generation_mode}
+
+
+def _llm_cache_key(llm_provider: "LlmProvider", prompt: str, stop_at_sentence_end: bool) -> str:
+    model_description = _model_description(llm_provider, stop_at_sentence_end)
+    return make_cache_key(llm_provider.__class__.__name__, model_description, prompt)
+
+
+def _validate_response(validate: Optional[Callable[[str], None]], response: str) -> None:
+    if validate is None:
+        return
+    try:
+        validate(response)
+    except ValueError as e:
+        raise InvalidLlmResponseError(str(e), response) from e
+
+
+async def _request_llm(
+    llm_provider: "LlmProvider",
+    prompt: str,
+    stop_at_sentence_end: bool,
+    accept_sentence_end: Optional[Callable[[str], bool]] = None,
+) -> str:
     logging.info(f"LLM request, provider={llm_provider.__class__.__name__}, prompt='{prompt}'")
     try:
-        response_text = await llm_provider.ask_llm(prompt)
+        response_text = await with_latency_budget(
+            _request_llm_hedged(llm_provider, prompt, stop_at_sentence_end, accept_sentence_end),
+            get_latency_budgets().llm_seconds,
+            description="LLM request",
+        )
+    except TimeoutError:
+        # Reported as a timeout, not as a failure of the request
+        raise
     except Exception as e:
         raise Exception("Exception during LLM request") from e
     logging.info(f"LLM response='{response_text}'")
     return response_text
 
 
+async def _request_llm_hedged(
+    llm_provider: "LlmProvider",
+    prompt: str,
+    stop_at_sentence_end: bool,
+    accept_sentence_end: Optional[Callable[[str], bool]],
+) -> str:
+    # The hedging clock starts once the slot is taken, so the time waiting for it isn't taken for a slow call.
+    # The hedged call shares the slot of the original one, and only one of them runs after the winner is known
+    async with get_llm_concurrency_limiter(llm_provider).acquire():
+        return await get_llm_hedged_caller(llm_provider).call(
+            lambda: _request_llm_once(llm_provider, prompt, stop_at_sentence_end, accept_sentence_end)
+        )
+
+
+async def _request_llm_once(
+    llm_provider: "LlmProvider",
+    prompt: str,
+    stop_at_sentence_end: bool,
+    accept_sentence_end: Optional[Callable[[str], bool]],
+) -> str:
+    if stop_at_sentence_end:
+        return await _ask_llm_until_sentence_end(llm_provider, prompt, accept_sentence_end)
+    return await llm_provider.ask_llm(prompt)
+
+
+async def _ask_llm_until_sentence_end(
+    llm_provider: "LlmProvider", prompt: str, accept_sentence_end: Optional[Callable[[str], bool]]
+) -> str:
+    response_text = ""
+    # Closing the stream closes the connection, and the server stops the generation
+    async with contextlib.aclosing(llm_provider.ask_llm_stream(prompt, __LLM_MAX_GENERATED_TOKENS)) as chunks:
+        async for chunk in chunks:
+            response_text += chunk
+            sentence_end = find_first_sentence_end(response_text)
+            if sentence_end is None:
+                continue
+            first_sentence = response_text[:sentence_end]
+            if accept_sentence_end is not None and not accept_sentence_end(first_sentence):
+                # Once a false sentence end is found, the response is read till the end and validated as a whole
+                logging.info(f"LLM generation not stopped after '{first_sentence}', it may be not a sentence")
+                async for chunk in chunks:
+                    response_text += chunk
+                return response_text
+            logging.info("LLM generation stopped after the first sentence")
+            return first_sentence
+    return response_text
+
+
+# Abbreviations of more than two letters which are mostly followed by a capitalized word, not a sentence end
+_ABBREVIATIONS: Final[frozenset[str]] = frozenset(
+    {
+        # English
+        "mrs", "prof", "etc", "approx", "dept", "inc", "ltd", "jan", "feb", "apr", "aug", "sep", "sept", "oct",
+        "nov", "ave", "blvd",
+        # German
+        "usw", "bzw", "inkl", "exkl", "vgl", "evtl", "ggf", "bspw", "sog", "str", "frl", "hrsg", "geb", "gest",
+        "jhd", "mio", "mrd", "tel", "bzgl", "einschl", "zzgl", "zzt", "usf", "insb", "allg", "eigtl", "dgl", "abt",
+        "anm", "ebd",
+    }
+)  # fmt: skip
+
+# Sentence end punctuation (possibly followed by a closing quote or bracket), whitespace and the next sentence start
+_SENTENCE_END_PATTERN: Final[re.Pattern[str]] = re.compile(r"(\w*)([.!?…]+[\"'»“”)]*)\s+[\"'„«“(]?[A-ZÄÖÜ0-9]")
+
+
+def find_first_sentence_end(text: str) -> Optional[int]:
+    """
+    Returns the end position of the first sentence, if it is followed by the start of another sentence.
+    The sentence end can't be detected before the next sentence starts: "3." may be continued as "3.5".
+    Periods after numbers, one- or two-letter words and known abbreviations are skipped, because they are mostly
+    German ordinals and abbreviations, like "am 3. Mai", "z. B." or "usw.".
+    """
+    for match in _SENTENCE_END_PATTERN.finditer(text):
+        word_before, punctuation = match.group(1), match.group(2)
+        word_before = word_before.lower()
+        # Street names are shortened like "Hauptstr."
+        is_abbreviation = (
+            len(word_before) <= 2
+            or word_before.isdigit()
+            or word_before in _ABBREVIATIONS
+            or word_before.endswith("str")
+        )
+        if punctuation.startswith(".") and is_abbreviation:
+            continue
+        return match.end(2)
+    return None
+
+
+def normalize_prompt(prompt: str) -> str:
+    return " ".join(prompt.split())
+
+
+async def check_llm_provider_is_available() -> None:
+    for llm_provider in [__LLM_PROVIDER, *__LLM_FALLBACK_PROVIDERS]:
+        try:
+            await llm_provider.check_available()
+        finally:
+            await llm_provider.aclose()
+
+
+async def warm_up_llm() -> None:
+    """
+    Loads the model of the global LLM provider. Errors are only logged: a cold model is slow, but still works.
+    Fallback models are rarely needed, so they aren't kept in memory.
+    """
+    llm_provider = __LLM_PROVIDER
+    try:
+        await llm_provider.warm_up()
+    except Exception as e:
+        logging.warning(f"LLM warm-up failed: {e}")
+    finally:
+        await llm_provider.aclose()
+
+
+async def check_llm_provider_and_warm_up() -> None:
+    """
+    The warm-up runs after the check, never at the same time: both use the clients of the running loop
+    and close them when they are done.
+    """
+    await check_llm_provider_is_available()
+    await warm_up_llm()
+
+
+def start_llm_keep_warm(interval_seconds: float) -> None:
+    """Warms up the LLM periodically in a background thread, so the model isn't unloaded while the app is idle."""
+
+    async def keep_warm() -> None:
+        while True:
+            await asyncio.sleep(interval_seconds)
+            await warm_up_llm()
+
+    threading.Thread(target=lambda: asyncio.run(keep_warm()), name="llm-keep-warm", daemon=True).start()
+
+
+async def release_llm_clients() -> None:
+    """Closes the LLM clients created on the running event loop. Must be called before the loop is closed."""
+    for llm_provider in [__LLM_PROVIDER, *__LLM_FALLBACK_PROVIDERS]:
+        await llm_provider.aclose()
+
+
+@dataclass
+class LlmProviderSettings:
+    # Hosts of Ollama servers to balance requests between,
+    # by default OLLAMA_HOST environment variable or the local server
+    ollama_hosts: list[str] = field(default_factory=list)
+    # Overrides the default model of the provider
+    model: Optional[str] = None
+    # How long Ollama keeps the model loaded after a request, e.g., "30m", or seconds, -1 is forever.
+    # None is the default of the server
+    ollama_keep_alive: Optional[float | str] = None
+    # Limits of the connection pool kept by every client
+    max_connections: int = 16
+    max_keepalive_connections: int = 16
+    keepalive_expiry_seconds: float = 60.0
+
+    def http_limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry_seconds,
+        )
+
+
 class LlmProvider(ABC):
     @abstractmethod
     async def ask_llm(self, prompt: str) -> str:
         pass
 
+    async def ask_llm_stream(self, prompt: str, max_tokens: int) -> AsyncIterator[str]:
+        """
+        Yields the response in chunks as soon as they are generated, but not more than `max_tokens` tokens.
+        Closing the iterator early must stop the generation.
+        """
+        yield await self.ask_llm(prompt)
+
+    def describe_model(self) -> dict[str, Any]:
+        """Model name and generation options. Cached responses are only reused for the same description."""
+        return {}
+
+    async def aclose(self) -> None:
+        """Releases the resources bound to the running event loop, e.g., HTTP connection pools."""
+        pass
+
+    async def check_available(self) -> None:
+        """Raises DependencyUnavailableError if the provider can't be used, e.g., the server isn't running."""
+        pass
+
+    def metrics(self) -> dict[str, Any]:
+        return {}
+
+    def server_count(self) -> int:
+        """Number of servers the requests are balanced between, each of them runs requests in parallel."""
+        return 1
+
+    async def warm_up(self) -> None:
+        """Loads the model, so that the first request doesn't wait for it."""
+        pass
+
+
+# Loading from the disk takes seconds, while the load duration of an already loaded model is milliseconds
+_COLD_LOAD_THRESHOLD_SECONDS: Final[float] = 0.5
+
+
+@dataclass
+class ModelLoadStats:
+    # Requests which waited for the model to be loaded into memory
+    cold_loads: int = 0
+    total_load_seconds: float = 0.0
+    last_load_seconds: Optional[float] = None
+
+    def record(self, load_duration_ns: Optional[int]) -> None:
+        if load_duration_ns is None:
+            return
+        load_seconds = load_duration_ns / 1e9
+        if load_seconds < _COLD_LOAD_THRESHOLD_SECONDS:
+            return
+        logging.info(f"LLM model was loaded in {load_seconds:.2f}s")
+        self.cold_loads += 1
+        self.total_load_seconds += load_seconds
+        self.last_load_seconds = load_seconds
+
 
 class OllamaLlmProvider(LlmProvider):
+    """Sends requests to one or several Ollama servers, balancing the load and failing over between them."""
+
     OLLAMA_MODEL: Final[str] = "qwen3.5:4b"
+    # Set top_k to have more conservative answers
+    OLLAMA_OPTIONS: Final[dict[str, Any]] = {"top_k": 20}
+
+    def __init__(self, settings: Optional[LlmProviderSettings] = None):
+        self.settings = settings or LlmProviderSettings()
+        self.model = self.settings.model or self.OLLAMA_MODEL
+        hosts = self.settings.ollama_hosts or [os.environ.get("OLLAMA_HOST") or "127.0.0.1:11434"]
+        self.endpoint_pool = EndpointPool(hosts)
+        self.load_stats = ModelLoadStats()
+        # The clients with their connection pools are reused by all requests on the same event loop
+        self._clients: dict[str, LoopLocal[ollama.AsyncClient]] = {
+            host: LoopLocal(functools.partial(self._create_client, host)) for host in hosts
+        }
 
-    def __init__(self):
-        self.early_check_ollama()
+    def _create_client(self, host: str) -> ollama.AsyncClient:
+        return ollama.AsyncClient(host=host, limits=self.settings.http_limits())
+
+    async def aclose(self) -> None:
+        for clients in self._clients.values():
+            client = clients.pop()
+            if client is not None:
+                await client.close()
 
     async def ask_llm(self, prompt: str) -> str:
-        client = ollama.AsyncClient()
-        # Set top_k to have more conservative answers
-        res = await client.generate(model=self.OLLAMA_MODEL, prompt=prompt, options={"top_k": 20}, think=False)
-        response_text: str = res["response"]
-        return response_text
+        async def generate(client: ollama.AsyncClient) -> str:
+            res = await client.generate(
+                model=self.model,
+                prompt=prompt,
+                options=self.OLLAMA_OPTIONS,
+                think=False,
+                keep_alive=self.settings.ollama_keep_alive,
+            )
+            self.load_stats.record(res.load_duration)
+            response_text: str = res["response"]
+            return response_text
+
+        return await self._request_with_failover(generate)
+
+    async def _request_with_failover(self, request: Callable[[ollama.AsyncClient], Awaitable[T]]) -> T:
+        tried_hosts: set[str] = set()
+        while True:
+            try:
+                async with self.endpoint_pool.use(exclude=tried_hosts) as endpoint:
+                    tried_hosts.add(endpoint.address)
+                    return await request(self._clients[endpoint.address].get())
+            except Exception as e:
+                if not _is_server_failure(e) or len(tried_hosts) >= len(self.endpoint_pool.endpoints):
+                    raise
+                logging.warning(f"Ollama request failed, trying another server: {e}")
+
+    async def ask_llm_stream(self, prompt: str, max_tokens: int) -> AsyncIterator[str]:
+        # No failover for streaming: a part of the response may be already consumed
+        async with self.endpoint_pool.use() as endpoint:
+            parts = (
+                await self._clients[endpoint.address]
+                .get()
+                .generate(
+                    model=self.model,
+                    prompt=prompt,
+                    options={**self.OLLAMA_OPTIONS, "num_predict": max_tokens},
+                    think=False,
+                    stream=True,
+                    keep_alive=self.settings.ollama_keep_alive,
+                )
+            )
+            async with contextlib.aclosing(parts):
+                async for part in parts:
+                    # Only the last part has the durations, it's not received if the generation is stopped early
+                    self.load_stats.record(part.load_duration)
+                    yield part["response"]
 
-    def early_check_ollama(self) -> None:
+    def describe_model(self) -> dict[str, Any]:
+        return {"model": self.model, "options": self.OLLAMA_OPTIONS, "think": False}
+
+    def metrics(self) -> dict[str, Any]:
+        return {"endpoints": self.endpoint_pool.stats(), "model_loads": dataclasses.asdict(self.load_stats)}
+
+    def server_count(self) -> int:
+        return len(self.endpoint_pool.endpoints)
+
+    async def warm_up(self) -> None:
+        hosts = [e.address for e in self.endpoint_pool.healthy_endpoints()]
+        await asyncio.gather(*(self._warm_up_host(host) for host in hosts))
+
+    async def _warm_up_host(self, host: str) -> None:
+        # A request without a prompt only loads the model
+        res = await self._clients[host].get().generate(model=self.model, keep_alive=self.settings.ollama_keep_alive)
+        self.load_stats.record(res.load_duration)
+        logging.info(f"Ollama model {self.model} is loaded on {host}")
+
+    async def check_available(self) -> None:
+        hosts = [e.address for e in self.endpoint_pool.endpoints]
+        results = await asyncio.gather(*(self._check_host(host) for host in hosts), return_exceptions=True)
+        errors = [r for r in results if isinstance(r, BaseException)]
+        if len(errors) == len(hosts):
+            raise errors[0]
+        for host, result in zip(hosts, results):
+            if isinstance(result, BaseException):
+                logging.warning(f"Ollama server {host} is not used: {result}")
+                self.endpoint_pool.mark_unhealthy(host)
+
+    async def _check_host(self, host: str) -> None:
         try:
-            available_models = ollama.list().models
-        except ConnectionError:
-            print("Error: Ollama is not accessible. Did you forget to start it?")
-            sys.exit(1)
+            available_models = (await self._clients[host].get().list()).models
+        except ConnectionError as e:
+            raise DependencyUnavailableError("Ollama is not accessible. Did you forget to start it?") from e
 
         available_model_names: list[str] = [m.model for m in available_models if m.model is not None]
-        if self.OLLAMA_MODEL in available_model_names:
-            logging.info(f"Ollama model {self.OLLAMA_MODEL} is available")
+        if self.model in available_model_names:
+            logging.info(f"Ollama model {self.model} is available on {host}")
             return
 
-        print(f"Error: model '{self.OLLAMA_MODEL}' is not found in Ollama.")
+        message = f"model '{self.model}' is not found in Ollama."
         if available_model_names:
-            print(f"Available models: {', '.join(available_model_names)}")
-        print(f"To install it execute: ollama pull '{self.OLLAMA_MODEL}'")
-        sys.exit(1)
+            message += f"\nAvailable models: {', '.join(available_model_names)}"
+        message += f"\nTo install it execute: ollama pull '{self.model}'"
+        raise DependencyUnavailableError(message)
+
+
+def _is_server_failure(e: Exception) -> bool:
+    """Whether the request may succeed on another server."""
+    if isinstance(e, (ConnectionError, httpx.TransportError)):
+        return True
+    return isinstance(e, ollama.ResponseError) and e.status_code >= 500
 
 
 class OpenaiLlmProvider(LlmProvider):
-    def __init__(self):
-        self.client = openai.AsyncOpenAI()
+    OPENAI_MODEL: Final[str] = "gpt-4.1-nano"
+
+    def __init__(self, settings: Optional[LlmProviderSettings] = None):
+        self.settings = settings or LlmProviderSettings()
+        self.model = self.settings.model or self.OPENAI_MODEL
+        # The client with its connection pool is reused by all requests on the same event loop
+        self._clients: LoopLocal["openai.AsyncOpenAI"] = LoopLocal(self._create_client)
+
+    def _create_client(self) -> "openai.AsyncOpenAI":
+        # Imported on the first use, because importing openai takes half a second of the startup time
+        import openai
+
+        return openai.AsyncOpenAI(http_client=openai.DefaultAsyncHttpxClient(limits=self.settings.http_limits()))
+
+    async def aclose(self) -> None:
+        client = self._clients.pop()
+        if client is not None:
+            await client.close()
 
     async def ask_llm(self, prompt: str) -> str:
-        response = await self.client.responses.create(
-            model="gpt-4.1-nano",
+        response = await self._clients.get().responses.create(
+            model=self.model,
             input=prompt,
         )
         return response.output_text
 
+    async def ask_llm_stream(self, prompt: str, max_tokens: int) -> AsyncIterator[str]:
+        stream = await self._clients.get().responses.create(
+            model=self.model,
+            input=prompt,
+            max_output_tokens=max_tokens,
+            stream=True,
+        )
+        async with stream:
+            async for event in stream:
+                if event.type == "response.output_text.delta":
+                    yield event.delta
+
+    async def check_available(self) -> None:
+        if not os.environ.get("OPENAI_API_KEY"):
+            raise DependencyUnavailableError("OpenAI API key is not set in the environment variable OPENAI_API_KEY.")
 
-__LLM_PROVIDER_FACTORIES: Final[dict[str, Callable[[], LlmProvider]]] = {
+    def describe_model(self) -> dict[str, Any]:
+        return {"model": self.model}
+
+
+__LLM_PROVIDER_FACTORIES: Final[dict[str, Callable[[LlmProviderSettings], LlmProvider]]] = {
     # Order is important, the first one will be the default option
     "ollama": OllamaLlmProvider,
     "openai": OpenaiLlmProvider,
 }
 
 __LLM_PROVIDER: LlmProvider
+# Bigger models to ask when the response of the previous one is invalid
+__LLM_FALLBACK_PROVIDERS: list[LlmProvider] = []
+__LLM_MAX_ATTEMPTS: int = 2
+__LLM_ROUTING_STATS: collections.Counter[str] = collections.Counter()
+__LLM_CACHE: Optional[DiskCache] = None
+# Concurrency limiters by provider class name, created on the first request
+__LLM_CONCURRENCY_LIMITERS: dict[str, AdaptiveConcurrencyLimiter] = {}
+__LLM_CONCURRENCY_BOUNDS: tuple[int, int] = (1, 8)
+__LLM_SINGLE_FLIGHT: SingleFlight[str] = SingleFlight()
+# Hedged callers by provider class name, each one tracks the latency of its provider
+__LLM_HEDGED_CALLERS: dict[str, HedgedCaller] = {}
+__LLM_HEDGING_ENABLED: bool = True
+# Limit for streamed generations, so a model that doesn't stop isn't waited for
+__LLM_MAX_GENERATED_TOKENS: int = 256
 
 
 def llm_provider_choices() -> list[str]:
     return list(__LLM_PROVIDER_FACTORIES.keys())
 
 
-def set_global_llm_provider(provider: str) -> None:
-    global __LLM_PROVIDER
+def set_global_llm_provider(
+    provider: str, settings: Optional[LlmProviderSettings] = None, fallback_models: Optional[list[str]] = None
+) -> None:
+    """`fallback_models` are asked in order when the response of the previous model is invalid."""
+    global __LLM_PROVIDER, __LLM_FALLBACK_PROVIDERS
     logging.info(f"Using LLM provider {provider}")
     factory = __LLM_PROVIDER_FACTORIES[provider]
-    __LLM_PROVIDER = factory()
+    settings = settings or LlmProviderSettings()
+    __LLM_PROVIDER = factory(settings)
+    __LLM_FALLBACK_PROVIDERS = [factory(dataclasses.replace(settings, model=model)) for model in fallback_models or []]
 
 
-def override_global_llm_provider_for_test(llm_provider: LlmProvider) -> None:
-    global __LLM_PROVIDER
+def override_global_llm_provider_for_test(
+    llm_provider: LlmProvider, fallback_providers: Optional[list[LlmProvider]] = None
+) -> None:
+    global __LLM_PROVIDER, __LLM_FALLBACK_PROVIDERS
     __LLM_PROVIDER = llm_provider
+    __LLM_FALLBACK_PROVIDERS = fallback_providers or []
+
+
+def set_llm_max_attempts(max_attempts: int) -> None:
+    """Maximum number of requests for a prompt with a validator, including the retries on the fallback models."""
+    global __LLM_MAX_ATTEMPTS
+    check(max_attempts >= 1, f"Expected at least one attempt, but got {max_attempts}")
+    __LLM_MAX_ATTEMPTS = max_attempts
+
+
+def set_global_llm_cache(llm_cache: Optional[DiskCache]) -> None:
+    global __LLM_CACHE
+    __LLM_CACHE = llm_cache
+
+
+def get_global_llm_cache() -> Optional[DiskCache]:
+    return __LLM_CACHE
+
+
+def set_llm_concurrency_bounds(min_limit: int, max_limit: int) -> None:
+    """Sets the floor and the ceiling of the number of concurrent requests to every server of an LLM provider."""
+    global __LLM_CONCURRENCY_BOUNDS
+    __LLM_CONCURRENCY_BOUNDS = (min_limit, max_limit)
+    __LLM_CONCURRENCY_LIMITERS.clear()
+
+
+def get_llm_concurrency_limiter(llm_provider: LlmProvider) -> AdaptiveConcurrencyLimiter:
+    provider_name = llm_provider.__class__.__name__
+    limiter = __LLM_CONCURRENCY_LIMITERS.get(provider_name)
+    if limiter is None:
+        # The requests are balanced between the servers, so together they run as many requests as each of them
+        min_limit, max_limit = __LLM_CONCURRENCY_BOUNDS
+        server_count = llm_provider.server_count()
+        limiter = AdaptiveConcurrencyLimiter(min_limit * server_count, max_limit * server_count)
+        limiter = __LLM_CONCURRENCY_LIMITERS.setdefault(provider_name, limiter)
+    return limiter
+
+
+def set_llm_hedging_enabled(enabled: bool) -> None:
+    global __LLM_HEDGING_ENABLED
+    __LLM_HEDGING_ENABLED = enabled
+    for hedged_caller in __LLM_HEDGED_CALLERS.values():
+        hedged_caller.enabled = enabled
+
+
+def get_llm_hedged_caller(llm_provider: LlmProvider) -> HedgedCaller:
+    # Per model, unlike the concurrency limiter which protects the server: a bigger model is expected to be slower
+    provider_name = _provider_name(llm_provider)
+    hedged_caller = __LLM_HEDGED_CALLERS.get(provider_name)
+    if hedged_caller is None:
+        hedged_caller = HedgedCaller(f"LLM {provider_name}")
+        hedged_caller.enabled = __LLM_HEDGING_ENABLED
+        hedged_caller = __LLM_HEDGED_CALLERS.setdefault(provider_name, hedged_caller)
+    return hedged_caller
+
+
+def _provider_name(llm_provider: LlmProvider) -> str:
+    model = llm_provider.describe_model().get("model")
+    provider_name = llm_provider.__class__.__name__
+    return f"{provider_name}/{model}" if model is not None else provider_name
+
+
+def get_llm_metrics() -> dict[str, Any]:
+    return {
+        "concurrency": {name: limiter.stats() for name, limiter in __LLM_CONCURRENCY_LIMITERS.items()},
+        "hedging": {name: hedged_caller.metrics() for name, hedged_caller in __LLM_HEDGED_CALLERS.items()},
+        "cache": __LLM_CACHE.stats() if __LLM_CACHE is not None else None,
+        "coalesced_in_flight": __LLM_SINGLE_FLIGHT.in_flight_count(),
+        "routing": dict(__LLM_ROUTING_STATS),
+        "providers": {
+            _provider_name(llm_provider): llm_provider.metrics()
+            for llm_provider in ([__LLM_PROVIDER] if "__LLM_PROVIDER" in globals() else []) + __LLM_FALLBACK_PROVIDERS
+        },
+    }
+
+
+def set_llm_max_generated_tokens(max_tokens: int) -> None:
+    global __LLM_MAX_GENERATED_TOKENS
+    __LLM_MAX_GENERATED_TOKENS = max_tokens
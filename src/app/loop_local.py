@@ -0,0 +1,33 @@
+import asyncio
+import threading
+import weakref
+from typing import Callable, Generic, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class LoopLocal(Generic[T]):
+    """
+    Keeps a separate value for each running event loop.
+    Flask runs every async view on its own event loop, and asyncio objects (futures, clients, timers)
+    must not be shared between loops, so such objects are created lazily per loop.
+    """
+
+    def __init__(self, factory: Callable[[], T]) -> None:
+        self._factory = factory
+        self._values: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, T] = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def get(self) -> T:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            value = self._values.get(loop)
+            if value is None:
+                value = self._factory()
+                self._values[loop] = value
+            return value
+
+    def pop(self) -> Optional[T]:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            return self._values.pop(loop, None)
@@ -1,4 +1,5 @@
 import asyncio
+import atexit
 import logging
 import os
 import sys
@@ -13,16 +14,77 @@ from flask import Flask, jsonify, request, send_file, render_template, Response
 
 from app import english_anki_generate
 from app import german_anki_generate
+from app.common_data_extract import (
+    set_sentence_examples_batch_size,
+    set_stop_sentence_example_at_sentence_end,
+    set_all_in_one_llm_mode,
+    get_word_stage_metrics,
+)
 from app.configuration import parse_arguments
-from app.english_data_extract import prepare_data_for_english_word, EnglishWordData
-from app.german_data_extract import prepare_data_for_german_word, GermanWordData
-from app.llm_interact import set_global_llm_provider
-from app.translate import check_translator_is_available
-from app.tts import init_tts_engine
+from app.audio_cache import AudioCache
+from app.disk_cache import DiskCache
+from app.english_data_extract import prepare_data_for_english_word, EnglishWordData, canonical_english_word
+from app.german_data_extract import (
+    prepare_data_for_german_word,
+    GermanWordData,
+    preload_german_dictionaries,
+    canonical_german_word,
+)
+from app.latency import LatencyBudgets, set_latency_budgets, get_latency_budgets, with_latency_budget
+from app.llm_interact import (
+    set_global_llm_provider,
+    set_global_llm_cache,
+    release_llm_clients,
+    LlmProviderSettings,
+    set_llm_concurrency_bounds,
+    get_llm_metrics,
+    set_llm_max_generated_tokens,
+    set_llm_hedging_enabled,
+    check_llm_provider_and_warm_up,
+    set_llm_max_attempts,
+    start_llm_keep_warm,
+)
+from app.spelling import preload_spell_checkers
+from app.startup import StartupChecks
+from app.translate import (
+    check_translator_is_available,
+    get_translation_metrics,
+    set_translation_hedging_enabled,
+    set_global_translation_cache,
+    set_global_offline_dictionary,
+    set_translation_circuit_breaker,
+    set_fallback_translator,
+    TranslationCircuitBreakerSettings,
+    LlmTranslator,
+    set_translation_batching,
+    set_global_translator,
+    set_translation_concurrency_bounds,
+    release_translator_sessions,
+    TranslatorSettings,
+    translation_request_scope,
+)
+from app.offline_dictionary import OfflineDictionary
+from app.translation_cache import TranslationCache
+from app.tts import (
+    AudioEncoderSettings,
+    PiperSettings,
+    close_tts_engine,
+    get_tts_metrics,
+    init_tts_engine,
+    set_global_audio_cache,
+    set_piper_settings,
+    set_audio_encoder,
+    set_tts_batch_size,
+    set_tts_engine,
+    set_tts_max_workers,
+)
 from app.word_hints import WordHints
 
 app = Flask(__name__)
 
+# Set when the app is run with main(), absent in tests
+__STARTUP_CHECKS: StartupChecks | None = None
+
 
 def setup_logging() -> None:
     logging.basicConfig(
@@ -53,6 +115,7 @@ async def generate_cards_file() -> Tuple[Response, int] | Response:
         return await common_generate_cards_file(
             words_with_hints,
             prepare_data_fn=prepare_data_for_german_word,
+            canonicalize_fn=canonical_german_word,
             export_fn=german_anki_generate.export_results_to_anki_deck,
             file_suffix="to_import_german_anki_generated.apkg",
         )
@@ -61,6 +124,7 @@ async def generate_cards_file() -> Tuple[Response, int] | Response:
         return await common_generate_cards_file(
             words_with_hints,
             prepare_data_fn=prepare_data_for_english_word,
+            canonicalize_fn=canonical_english_word,
             export_fn=english_anki_generate.export_results_to_anki_deck,
             file_suffix="to_import_english_anki_generated.apkg",
         )
@@ -71,31 +135,88 @@ async def generate_cards_file() -> Tuple[Response, int] | Response:
 WD = TypeVar("WD", GermanWordData, EnglishWordData)
 
 
+def group_duplicate_words(
+    words: list[tuple[str, WordHints]], canonicalize_fn: Callable[[str], str]
+) -> tuple[list[tuple[str, WordHints]], list[int]]:
+    """
+    Returns the unique words and, for every word, the index of its unique word.
+    Words are the same if `canonicalize_fn` gives the same result. The most specific spelling is kept,
+    e.g., with the article and the grammatical case, and the first translation hint.
+    """
+    unique_words: list[tuple[str, WordHints]] = []
+    unique_indices: dict[str, int] = {}
+    indices: list[int] = []
+    for word, hints in words:
+        key = canonicalize_fn(word)
+        index = unique_indices.get(key)
+        if index is None:
+            index = unique_indices[key] = len(unique_words)
+            unique_words.append((word, hints))
+        else:
+            unique_word, unique_hints = unique_words[index]
+            unique_words[index] = (
+                max(unique_word, word, key=len),
+                unique_hints if unique_hints.translated_ru else hints,
+            )
+        indices.append(index)
+    return unique_words, indices
+
+
 async def common_generate_cards_file(
     words_with_hints: list[dict[str, Any]],
     prepare_data_fn: Callable[[str, WordHints], Coroutine[None, None, WD]],
-    export_fn: Callable[[list[WD], str], None],
+    canonicalize_fn: Callable[[str], str],
+    export_fn: Callable[[list[WD], str], Coroutine[None, None, None]],
     file_suffix: str,
 ) -> Tuple[Response, int] | Response:
-    tasks = []
+    words: list[tuple[str, WordHints]] = []
     for word_with_hints in words_with_hints:
         word: str = word_with_hints.get("word", "")
         word = word.strip()
         if not word:
             return jsonify({"error": f"The word is not specified for the word {word}"}), 400
+        words.append((word, parse_hints_from_dict(word_with_hints)))
 
-        hints = parse_hints_from_dict(word_with_hints)
-        task = asyncio.create_task(prepare_data_fn(word, hints))
-        tasks.append(task)
+    unique_words, unique_word_indices = group_duplicate_words(words, canonicalize_fn)
+    if len(unique_words) < len(words):
+        logging.info(f"Preparing {len(unique_words)} unique words out of {len(words)}")
 
-    results = await asyncio.gather(*tasks)
+    tasks = []
+    # Tasks share the translations of this request
+    with translation_request_scope():
+        for word, hints in unique_words:
+            prepare_data = with_latency_budget(
+                prepare_data_fn(word, hints),
+                get_latency_budgets().word_seconds,
+                description=f'Preparing the word "{word}"',
+            )
+            task = asyncio.create_task(prepare_data)
+            tasks.append(task)
+
+    try:
+        try:
+            unique_results = await asyncio.gather(*tasks)
+        except BaseException:
+            # No task may use the clients after they're released
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        results = [unique_results[i] for i in unique_word_indices]
+    except TimeoutError as e:
+        logging.error(str(e))
+        return jsonify({"error": str(e)}), 504
+    finally:
+        # Flask closes the event loop of this request after the response, connection pools must be closed before
+        await release_llm_clients()
+        await release_translator_sessions()
 
     with tempfile.NamedTemporaryFile(delete=False, suffix=file_suffix) as temp_file:
         deck_filename = temp_file.name
 
     logging.info(f'Exporting the results into the temporary Anki deck file "{deck_filename}"')
     try:
-        export_fn(results, deck_filename)
+        await export_fn(results, deck_filename)
 
         response = send_file(
             deck_filename,
@@ -110,6 +231,26 @@ async def common_generate_cards_file(
             logging.info(f'Removed temporary Anki deck file "{deck_filename}"')
 
 
+@app.route("/api/metrics", methods=["GET"])
+def metrics() -> Response:
+    return jsonify(
+        {
+            "llm": get_llm_metrics(),
+            "translation": get_translation_metrics(),
+            "word_stages": get_word_stage_metrics(),
+            "tts": get_tts_metrics(),
+        }
+    )
+
+
+@app.route("/api/ready", methods=["GET"])
+def ready() -> Tuple[Response, int]:
+    startup_checks = __STARTUP_CHECKS
+    if startup_checks is None:
+        return jsonify({"ready": True, "checks": {}, "errors": {}}), 200
+    return jsonify(startup_checks.report()), 200 if startup_checks.is_ready() else 503
+
+
 @app.route("/", methods=["GET"])
 def home() -> str:
     return render_template("index.html")
@@ -119,12 +260,111 @@ def open_in_browser(*, url: str, after_seconds: int) -> None:
     threading.Timer(after_seconds, lambda: webbrowser.open_new(url)).start()
 
 
+def exit_on_startup_failure(message: str) -> None:
+    print(f"Error: {message}")
+    sys.stdout.flush()
+    # Called from the startup checks thread, where sys.exit would only stop the thread
+    os._exit(1)
+
+
+def start_startup_checks() -> StartupChecks:
+    startup_checks = StartupChecks(
+        {
+            # The first card request doesn't wait for the model to be loaded
+            "llm": check_llm_provider_and_warm_up,
+            "tts": lambda: asyncio.to_thread(init_tts_engine),
+            "translator": check_translator_is_available,
+            "german_dictionaries": lambda: asyncio.to_thread(preload_german_dictionaries),
+            "spell_checkers": lambda: asyncio.to_thread(preload_spell_checkers),
+        },
+        on_failure=exit_on_startup_failure,
+    )
+    startup_checks.start_in_background()
+    return startup_checks
+
+
 def main():
+    global __STARTUP_CHECKS
     load_dotenv()
     setup_logging()
     args = parse_arguments()
-    set_global_llm_provider(args.llm_provider)
-    init_tts_engine()
-    check_translator_is_available()
+    set_global_llm_provider(
+        args.llm_provider,
+        LlmProviderSettings(
+            ollama_hosts=args.ollama_host,
+            model=args.llm_model,
+            ollama_keep_alive=args.ollama_keep_alive,
+            max_connections=args.llm_max_connections,
+            max_keepalive_connections=args.llm_max_connections,
+        ),
+        fallback_models=args.llm_fallback_model,
+    )
+    set_llm_max_attempts(args.llm_max_attempts)
+    if not args.no_llm_cache:
+        set_global_llm_cache(
+            DiskCache(
+                args.llm_cache_path,
+                max_entries=args.llm_cache_max_entries,
+                ttl_seconds=args.llm_cache_ttl_days * 24 * 60 * 60,
+            )
+        )
+    if not args.no_translation_cache:
+        set_global_translation_cache(
+            TranslationCache(DiskCache(args.translation_cache_path, max_entries=args.translation_cache_max_entries))
+        )
+    if args.offline_dictionary_path:
+        set_global_offline_dictionary(OfflineDictionary(args.offline_dictionary_path))
+    set_global_translator(
+        TranslatorSettings(
+            max_connections=args.translation_max_connections,
+            max_keepalive_connections=args.translation_max_connections,
+        )
+    )
+    set_translation_circuit_breaker(
+        TranslationCircuitBreakerSettings(
+            slow_call_seconds=args.translation_slow_call_seconds,
+            open_seconds=args.translation_circuit_open_seconds,
+        )
+    )
+    if not args.no_llm_translation_fallback:
+        set_fallback_translator(LlmTranslator())
+    set_translation_concurrency_bounds(args.translation_min_concurrency, args.translation_max_concurrency)
+    set_translation_batching(args.translation_batch_size, args.translation_batch_delay)
+    set_tts_engine(args.tts_engine)
+    set_tts_batch_size(args.tts_batch_size)
+    set_audio_encoder(
+        AudioEncoderSettings(
+            codec=args.audio_codec,
+            bitrate_kbps=args.audio_bitrate,
+            vbr=args.audio_vbr,
+            trim_silence=not args.no_audio_trim_silence,
+        )
+    )
+    set_piper_settings(
+        PiperSettings(voices_dir=args.piper_voices_dir, processes_per_voice=args.piper_processes_per_voice)
+    )
+    if not args.no_audio_cache:
+        set_global_audio_cache(AudioCache(args.audio_cache_path, max_bytes=int(args.audio_cache_max_mb * 1024 * 1024)))
+    if args.tts_max_workers is not None:
+        set_tts_max_workers(args.tts_max_workers)
+    set_sentence_examples_batch_size(args.llm_batch_size)
+    set_all_in_one_llm_mode(args.llm_all_in_one)
+    set_llm_concurrency_bounds(args.llm_min_concurrency, args.llm_max_concurrency)
+    set_stop_sentence_example_at_sentence_end(not args.no_llm_streaming)
+    set_llm_max_generated_tokens(args.llm_max_tokens)
+    set_llm_hedging_enabled(not args.no_hedging)
+    set_translation_hedging_enabled(not args.no_hedging)
+    set_latency_budgets(
+        LatencyBudgets(
+            word_seconds=args.word_latency_budget,
+            llm_seconds=args.llm_latency_budget,
+            translation_seconds=args.translation_latency_budget,
+        )
+    )
+    __STARTUP_CHECKS = start_startup_checks()
+    # The long-lived piper processes and their temporary directory aren't left behind
+    atexit.register(close_tts_engine)
+    if args.llm_keep_warm_interval is not None:
+        start_llm_keep_warm(args.llm_keep_warm_interval)
     open_in_browser(url="http://127.0.0.1:5000/", after_seconds=1)
     app.run(port=5000)
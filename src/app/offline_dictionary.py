@@ -0,0 +1,199 @@
+"""
+Local dictionary of single word translations, used before the online translator.
+Run `python -m app.offline_dictionary --help` to build it from the translation cache.
+"""
+
+import argparse
+import bisect
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from typing import Any, Iterable, Optional
+
+from app.configuration import default_translation_cache_path
+from app.disk_cache import DiskCache
+from app.translation_cache import TranslationCache
+from app.utils import check
+
+SUPPORTED_LANGUAGE_PAIRS = [("de", "en"), ("de", "ru"), ("en", "ru")]
+# Part of speech of the entries which fit any part of speech
+ANY_PART_OF_SPEECH = ""
+
+# The class name of the translator whose translations make the dictionary, the fallback one doesn't
+DEFAULT_DICTIONARY_BACKEND = "GoogleTranslatorImpl"
+
+_GERMAN_ARTICLES = ("der ", "die ", "das ")
+
+
+@dataclass
+class DictionaryEntry:
+    src: str
+    dest: str
+    # Value of PartOfSpeech, or ANY_PART_OF_SPEECH
+    part_of_speech: str
+    text: str
+    translation: str
+
+
+def _make_key(src: str, dest: str, part_of_speech: str, text: str) -> str:
+    return f"{src}\t{dest}\t{part_of_speech}\t{' '.join(text.split())}"
+
+
+class OfflineDictionary:
+    """
+    Translations loaded from a file with a tab separated entry per line: src, dest, part of speech, text, translation.
+    The lines are kept sorted by everything but the translation and looked up with a binary search.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        pairs = []
+        with open(path, encoding="utf-8") as f:
+            for line_number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                line = line.rstrip("\n")
+                check(
+                    line.count("\t") == 4,
+                    f'Expected 5 tab separated fields in line {line_number} of offline dictionary "{path}": {line!r}',
+                )
+                pairs.append(line.rsplit("\t", 1))
+        keys = [pair[0] for pair in pairs]
+        if any(keys[i] > keys[i + 1] for i in range(len(keys) - 1)):
+            logging.warning(f'Offline dictionary "{path}" is not sorted, sorting it in memory')
+            pairs.sort(key=lambda pair: pair[0])
+            keys = [pair[0] for pair in pairs]
+        self._keys = keys
+        self._translations = [pair[1] for pair in pairs]
+        self.lookups = 0
+        self.hits = 0
+        # Lookups are counted from several Flask threads
+        self._lock = threading.Lock()
+        logging.info(f'Loaded offline dictionary "{path}" with {len(self._keys)} entries')
+
+    def lookup(self, text: str, src: str, dest: str, part_of_speech: Optional[str] = None) -> Optional[str]:
+        """
+        Returns the translation for the part of speech, or the one for any part of speech if there is none.
+        The translation isn't post-processed, the caller applies the same post-processing as to online translations.
+        """
+        translation = None
+        if part_of_speech:
+            translation = self._find(_make_key(src, dest, part_of_speech, text))
+        if translation is None:
+            translation = self._find(_make_key(src, dest, ANY_PART_OF_SPEECH, text))
+        with self._lock:
+            self.lookups += 1
+            if translation is not None:
+                self.hits += 1
+        return translation
+
+    def _find(self, key: str) -> Optional[str]:
+        i = bisect.bisect_left(self._keys, key)
+        if i < len(self._keys) and self._keys[i] == key:
+            return self._translations[i]
+        return None
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "path": self.path,
+                "entries": len(self._keys),
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "hit_rate": self.hits / self.lookups if self.lookups else None,
+            }
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+
+def write_offline_dictionary(path: str, entries: Iterable[DictionaryEntry]) -> int:
+    """Writes the entries sorted, a later entry with the same key replaces an earlier one. Returns the entry count."""
+    lines: dict[str, str] = {}
+    for entry in entries:
+        key = _make_key(entry.src, entry.dest, entry.part_of_speech, entry.text)
+        # A tab or a line break in the translation would break the line into wrong fields
+        lines[key] = f"{key}\t{' '.join(entry.translation.split())}"
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        for key in sorted(lines):
+            f.write(lines[key] + "\n")
+    return len(lines)
+
+
+def is_dictionary_word(text: str, lang: str) -> bool:
+    """Single word, or a German noun with its article."""
+    if lang == "de" and text.startswith(_GERMAN_ARTICLES):
+        text = text[4:]
+    return len(text.split()) == 1
+
+
+def entries_from_translation_cache(
+    translation_cache: TranslationCache, backend: str = DEFAULT_DICTIONARY_BACKEND
+) -> list[DictionaryEntry]:
+    """
+    Single word translations of `backend` from the cache, for any part of speech: the cache doesn't know it.
+    Entries are in the least recently used order, so the newest translation of a word wins.
+    """
+    entries = []
+    for cached in translation_cache.entries():
+        if cached.backend != backend:
+            continue
+        if (cached.src, cached.dest) not in SUPPORTED_LANGUAGE_PAIRS or not is_dictionary_word(cached.text, cached.src):
+            continue
+        translation = " ".join(cached.translation.split())
+        if not translation:
+            continue
+        entries.append(
+            DictionaryEntry(
+                src=cached.src,
+                dest=cached.dest,
+                part_of_speech=ANY_PART_OF_SPEECH,
+                text=cached.text,
+                translation=translation,
+            )
+        )
+    return entries
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Build the offline dictionary from the translation cache")
+    default_cache_path = default_translation_cache_path()
+    parser.add_argument(
+        "--translation-cache-path",
+        default=default_cache_path,
+        help=f"Translation cache file to take the translations from (default: {default_cache_path})",
+    )
+    parser.add_argument(
+        "--merge",
+        help="Existing dictionary file to keep the entries of, its entries win over the cached translations",
+    )
+    parser.add_argument(
+        "--backend",
+        default=DEFAULT_DICTIONARY_BACKEND,
+        help=f"Translator whose cached translations are taken (default: {DEFAULT_DICTIONARY_BACKEND})",
+    )
+    parser.add_argument("output", help="Dictionary file to write")
+    args = parser.parse_args(argv)
+
+    # The size limit only matters when entries are added
+    cache = TranslationCache(DiskCache(args.translation_cache_path, max_entries=1))
+    try:
+        entries = entries_from_translation_cache(cache, args.backend)
+    finally:
+        cache.close()
+    if args.merge:
+        with open(args.merge, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    src, dest, part_of_speech, text, translation = line.rstrip("\n").split("\t")
+                    entries.append(DictionaryEntry(src, dest, part_of_speech, text, translation))
+    count = write_offline_dictionary(args.output, entries)
+    print(f"Wrote {count} entries to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
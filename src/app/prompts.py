@@ -1,3 +1,4 @@
+import json
 from typing import Literal
 
 from app.utils import check
@@ -6,8 +7,64 @@ PROMPT_TEMPLATE = """
 Generate one sentence in {LANGUAGE} using the {TYPE} "{WORD_OR_PHRASE}". Output only the sentence. Do not use markdown, formatting, or styling.
 """.strip()
 
+BATCH_PROMPT_TEMPLATE = """
+For each {TYPE} in the JSON array below, generate one sentence in {LANGUAGE} using that {TYPE}. Output only a JSON array of {COUNT} strings, one sentence per {TYPE}, in the same order. Do not use markdown, formatting, or styling.
+{WORDS_OR_PHRASES}
+""".strip()
+
+ALL_IN_ONE_PROMPT_TEMPLATE = """
+Generate one sentence in {LANGUAGE} using the {TYPE} "{WORD_OR_PHRASE}". Output only a JSON object with the following string fields:
+"sentence_example": the sentence
+{FIELDS}
+Do not use markdown, formatting, or styling.
+""".strip()
+
+TRANSLATION_PROMPT_TEMPLATE = """
+Translate the following {SRC_LANGUAGE} text into {DEST_LANGUAGE}. Output only the translation. Do not use markdown, formatting, or styling.
+{TEXT}
+""".strip()
+
+_LANGUAGE_NAMES = {"de": "German", "en": "English", "ru": "Russian"}
+
 
 def get_sentence_example_prompt(word_or_phrase: str, language: Literal["German", "English"], is_phrase: bool) -> str:
     check(language in ["German", "English"], f"Unsupported language: {language}")
     _type = "phrase" if is_phrase else "word"
     return PROMPT_TEMPLATE.format(LANGUAGE=language, TYPE=_type, WORD_OR_PHRASE=word_or_phrase)
+
+
+def get_sentence_examples_batch_prompt(
+    words_or_phrases: list[str], language: Literal["German", "English"], is_phrase: bool
+) -> str:
+    check(language in ["German", "English"], f"Unsupported language: {language}")
+    check(len(words_or_phrases) > 0, "Expected non empty list of words or phrases")
+    _type = "phrase" if is_phrase else "word"
+    return BATCH_PROMPT_TEMPLATE.format(
+        LANGUAGE=language,
+        TYPE=_type,
+        COUNT=len(words_or_phrases),
+        WORDS_OR_PHRASES=json.dumps(words_or_phrases, ensure_ascii=False),
+    )
+
+
+def get_all_in_one_prompt(
+    word_or_phrase: str, language: Literal["German", "English"], is_phrase: bool, fields: dict[str, str]
+) -> str:
+    """`fields` maps the names of the extra JSON fields to their descriptions."""
+    check(language in ["German", "English"], f"Unsupported language: {language}")
+    check("sentence_example" not in fields, "sentence_example field is always requested")
+    _type = "phrase" if is_phrase else "word"
+    return ALL_IN_ONE_PROMPT_TEMPLATE.format(
+        LANGUAGE=language,
+        TYPE=_type,
+        WORD_OR_PHRASE=word_or_phrase,
+        FIELDS="\n".join(f'"{name}": {description}' for name, description in fields.items()),
+    )
+
+
+def get_translation_prompt(text: str, src: str, dest: str) -> str:
+    check(src in _LANGUAGE_NAMES, f"Unsupported source language: {src}")
+    check(dest in _LANGUAGE_NAMES, f"Unsupported target language: {dest}")
+    return TRANSLATION_PROMPT_TEMPLATE.format(
+        SRC_LANGUAGE=_LANGUAGE_NAMES[src], DEST_LANGUAGE=_LANGUAGE_NAMES[dest], TEXT=text
+    )
@@ -0,0 +1,68 @@
+import asyncio
+import concurrent.futures
+import threading
+from typing import Awaitable, Callable, Generic, Hashable, TypeVar
+
+R = TypeVar("R")
+
+
+class _LeaderCancelledError(Exception):
+    pass
+
+
+class SingleFlight(Generic[R]):
+    """
+    Coalesces concurrent calls with the same key: the first caller (the leader) runs the call,
+    callers arriving while it is in flight wait for its result or its exception instead of running it again.
+    Nothing is kept after the call completes, a later call with the same key runs again.
+
+    Callers may run on different event loops (Flask serves every request on its own loop),
+    so the result is shared through a thread-safe future.
+    If the leader is cancelled, the call is not finished for the others: one of them retries it as a new leader.
+    """
+
+    def __init__(self) -> None:
+        self._in_flight: dict[Hashable, concurrent.futures.Future[R]] = {}
+        self._lock = threading.Lock()
+
+    def in_flight_count(self) -> int:
+        return len(self._in_flight)
+
+    async def run(self, key: Hashable, call: Callable[[], Awaitable[R]]) -> R:
+        while True:
+            with self._lock:
+                shared = self._in_flight.get(key)
+                is_leader = shared is None
+                if shared is None:
+                    shared = concurrent.futures.Future()
+                    self._in_flight[key] = shared
+
+            if is_leader:
+                return await self._run_as_leader(key, shared, call)
+
+            try:
+                # Shielded: a cancelled follower must not cancel the shared call
+                return await asyncio.shield(asyncio.wrap_future(shared))
+            except _LeaderCancelledError:
+                continue
+
+    async def _run_as_leader(
+        self, key: Hashable, shared: "concurrent.futures.Future[R]", call: Callable[[], Awaitable[R]]
+    ) -> R:
+        try:
+            result = await call()
+        except asyncio.CancelledError:
+            self._complete(key)
+            shared.set_exception(_LeaderCancelledError())
+            raise
+        except Exception as e:
+            self._complete(key)
+            shared.set_exception(e)
+            raise
+        self._complete(key)
+        shared.set_result(result)
+        return result
+
+    def _complete(self, key: Hashable) -> None:
+        with self._lock:
+            del self._in_flight[key]
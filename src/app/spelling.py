@@ -1,11 +1,23 @@
+import functools
+
 from spellchecker import SpellChecker
 
 from app.utils import check
 
-_spells = {
-    "en": SpellChecker(language="en"),
-    "de": SpellChecker(language="de"),
-}
+_SPELL_CHECKER_LANGUAGES = ["en", "de"]
+
+
+@functools.cache
+def _get_spell_checker(language: str) -> SpellChecker:
+    # Loading a dictionary takes a while, so it's done on the first use or by preload_spell_checkers
+    if language not in _SPELL_CHECKER_LANGUAGES:
+        raise ValueError(f"Unknown language {language}")
+    return SpellChecker(language=language)
+
+
+def preload_spell_checkers() -> None:
+    for language in _SPELL_CHECKER_LANGUAGES:
+        _get_spell_checker(language)
 
 
 def correct_spelling(word_or_phrase: str, language: str) -> str:
@@ -15,9 +27,7 @@ def correct_spelling(word_or_phrase: str, language: str) -> str:
         # No spell checking for phrases for now
         return word_or_phrase
 
-    spell = _spells.get(language)
-    if spell is None:
-        raise ValueError(f"Unknown language {language}")
+    spell = _get_spell_checker(language)
     orig = word_or_phrase
     corrected = spell.correction(word_or_phrase)
     if not corrected:
@@ -0,0 +1,184 @@
+import asyncio
+import collections
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+from app.utils import check
+
+
+class StageCache:
+    """Results of a stage, least recently used ones are evicted once `max_entries` is exceeded."""
+
+    def __init__(self, max_entries: int) -> None:
+        check(max_entries > 0, f"Expected max_entries to be positive, but got {max_entries}")
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: collections.OrderedDict[Hashable, Any] = collections.OrderedDict()
+        # Stages of different requests run in different threads
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> tuple[bool, Any]:
+        """Returns whether the key is cached and the cached result."""
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, self._entries[key]
+
+    def put(self, key: Hashable, result: Any) -> None:
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+@dataclass
+class Stage:
+    name: str
+    # Called with the results of the stages it depends on as keyword arguments
+    run: Callable[..., Awaitable[Any]]
+    depends_on: list[str] = field(default_factory=list)
+    # The result is cached by cache_key, called with the same arguments as `run`
+    cache: Optional[StageCache] = None
+    cache_key: Optional[Callable[..., Hashable]] = None
+
+    def __post_init__(self) -> None:
+        check((self.cache is None) == (self.cache_key is None), f"Stage {self.name} needs both cache and cache_key")
+
+
+class StageHooks:
+    """Called around every stage, e.g., to collect timings. Does nothing by default."""
+
+    def stage_started(self, graph_name: str, stage_name: str) -> None:
+        pass
+
+    def stage_finished(self, graph_name: str, stage_name: str, seconds: float, failed: bool) -> None:
+        pass
+
+
+@dataclass
+class StageTiming:
+    runs: int = 0
+    failures: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+
+
+class StageTimings(StageHooks):
+    """Collects the run time of the stages of every graph."""
+
+    def __init__(self) -> None:
+        self._timings: dict[str, StageTiming] = collections.defaultdict(StageTiming)
+        self._lock = threading.Lock()
+
+    def stage_finished(self, graph_name: str, stage_name: str, seconds: float, failed: bool) -> None:
+        with self._lock:
+            timing = self._timings[f"{graph_name}.{stage_name}"]
+            timing.runs += 1
+            timing.failures += int(failed)
+            timing.total_seconds += seconds
+            timing.max_seconds = max(timing.max_seconds, seconds)
+
+    def stats(self) -> dict[str, dict[str, float]]:
+        with self._lock:
+            return {
+                name: {
+                    "runs": timing.runs,
+                    "failures": timing.failures,
+                    "mean_seconds": timing.total_seconds / timing.runs,
+                    "max_seconds": timing.max_seconds,
+                }
+                for name, timing in sorted(self._timings.items())
+            }
+
+
+class StageGraph:
+    """
+    Runs async stages as soon as the stages they depend on are finished, so independent stages run concurrently.
+    If a stage fails, the other stages are cancelled and the error is raised.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        stages: list[Stage],
+        hooks: Optional[StageHooks] = None,
+        clock: Callable[[], float] = time.perf_counter,
+    ) -> None:
+        self.name = name
+        self.stages = {stage.name: stage for stage in stages}
+        check(len(self.stages) == len(stages), f"Expected unique stage names in graph {name}")
+        for stage in stages:
+            for dependency in stage.depends_on:
+                check(dependency in self.stages, f"Stage {stage.name} depends on unknown stage {dependency}")
+        self._check_no_cycles()
+        self.hooks = hooks or StageHooks()
+        self._clock = clock
+
+    def _check_no_cycles(self) -> None:
+        visited: set[str] = set()
+        visiting: set[str] = set()
+
+        def visit(stage_name: str) -> None:
+            check(stage_name not in visiting, f"Cyclic dependency on stage {stage_name} in graph {self.name}")
+            if stage_name in visited:
+                return
+            visiting.add(stage_name)
+            for dependency in self.stages[stage_name].depends_on:
+                visit(dependency)
+            visiting.remove(stage_name)
+            visited.add(stage_name)
+
+        for stage_name in self.stages:
+            visit(stage_name)
+
+    async def run(self) -> dict[str, Any]:
+        """Returns the results of all stages by their names."""
+        tasks: dict[str, asyncio.Task[Any]] = {}
+
+        async def run_stage(stage: Stage) -> Any:
+            # All the tasks are created before any of them starts
+            kwargs = {dependency: await tasks[dependency] for dependency in stage.depends_on}
+            return await self._run_stage(stage, kwargs)
+
+        for stage in self.stages.values():
+            tasks[stage.name] = asyncio.create_task(run_stage(stage))
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+        return {name: task.result() for name, task in tasks.items()}
+
+    async def _run_stage(self, stage: Stage, kwargs: dict[str, Any]) -> Any:
+        cache_key = None
+        if stage.cache is not None and stage.cache_key is not None:
+            cache_key = stage.cache_key(**kwargs)
+            is_cached, result = stage.cache.get(cache_key)
+            if is_cached:
+                return result
+
+        self.hooks.stage_started(self.name, stage.name)
+        start = self._clock()
+        try:
+            result = await stage.run(**kwargs)
+        except BaseException:
+            self.hooks.stage_finished(self.name, stage.name, self._clock() - start, failed=True)
+            raise
+        self.hooks.stage_finished(self.name, stage.name, self._clock() - start, failed=False)
+
+        if stage.cache is not None:
+            stage.cache.put(cache_key, result)
+        return result
@@ -0,0 +1,54 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Awaitable, Callable, Final, Literal
+
+from app.utils import DependencyUnavailableError
+
+StartupCheckStatus = Literal["pending", "ok", "failed"]
+
+
+class StartupChecks:
+    """
+    Checks the dependencies (LLM server, TTS engine, translator) and preloads the dictionaries
+    concurrently in a background thread, so the server accepts requests right away.
+    `on_failure` is called with the error message as soon as any check fails.
+    """
+
+    def __init__(self, checks: dict[str, Callable[[], Awaitable[None]]], on_failure: Callable[[str], None]) -> None:
+        self.checks: Final = checks
+        self.on_failure = on_failure
+        self.statuses: dict[str, StartupCheckStatus] = {name: "pending" for name in checks}
+        self.errors: dict[str, str] = {}
+
+    def start_in_background(self) -> None:
+        threading.Thread(target=lambda: asyncio.run(self.run()), name="startup-checks", daemon=True).start()
+
+    async def run(self) -> None:
+        await asyncio.gather(*(self._run_check(name, check) for name, check in self.checks.items()))
+
+    async def _run_check(self, name: str, check: Callable[[], Awaitable[None]]) -> None:
+        start = time.monotonic()
+        try:
+            await check()
+        except DependencyUnavailableError as e:
+            self._fail(name, str(e))
+            return
+        except Exception as e:
+            logging.exception(f"Startup check {name} failed")
+            self._fail(name, f"{name} check failed: {e}")
+            return
+        self.statuses[name] = "ok"
+        logging.info(f"Startup check {name} passed in {time.monotonic() - start:.2f}s")
+
+    def _fail(self, name: str, message: str) -> None:
+        self.statuses[name] = "failed"
+        self.errors[name] = message
+        self.on_failure(message)
+
+    def is_ready(self) -> bool:
+        return all(status == "ok" for status in self.statuses.values())
+
+    def report(self) -> dict[str, object]:
+        return {"ready": self.is_ready(), "checks": dict(self.statuses), "errors": dict(self.errors)}
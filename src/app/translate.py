@@ -1,32 +1,318 @@
 import asyncio
-import sys
+import contextlib
+import contextvars
+import logging
+import re
 from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Any, Final, Optional, Iterator
 
 import googletrans
 import httpx
 
+from app.batching import MicroBatcher
+from app.circuit_breaker import CircuitBreaker, CircuitOpenError, CircuitState
+from app.concurrency_limit import AdaptiveConcurrencyLimiter
+from app.latency import HedgedCaller, with_latency_budget, get_latency_budgets
+from app.llm_interact import ask_llm
+from app.loop_local import LoopLocal
+from app.offline_dictionary import OfflineDictionary
+from app.prompts import get_translation_prompt
+from app.single_flight import SingleFlight
+from app.translation_cache import TranslationCache
+from app.utils import DependencyUnavailableError, check
+
 
 class Translator(ABC):
     @abstractmethod
     async def translate_text(self, text: str, src: str, dest: str) -> str:
         pass
 
+    async def translate_many(self, texts: list[str], src: str, dest: str) -> list[str]:
+        """Returns the translations in the same order. By default, the texts are translated separately."""
+        return list(await asyncio.gather(*(self.translate_text(text, src, dest) for text in texts)))
+
+    async def aclose(self) -> None:
+        """Releases the resources bound to the running event loop, e.g., HTTP connection pools."""
+        pass
+
+
+@dataclass
+class TranslatorSettings:
+    # Limits of the connection pool kept by the translator session
+    max_connections: int = 8
+    max_keepalive_connections: int = 8
+    keepalive_expiry_seconds: float = 60.0
+
+    def http_limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry_seconds,
+        )
+
 
 class GoogleTranslatorImpl(Translator):
+    def __init__(self, settings: Optional[TranslatorSettings] = None):
+        self.settings = settings or TranslatorSettings()
+        # The session with its connection pool is reused by all translations on the same event loop
+        self._sessions: LoopLocal[googletrans.Translator] = LoopLocal(self._create_session)
+
+    def _create_session(self) -> googletrans.Translator:
+        session = googletrans.Translator()
+        # googletrans doesn't allow to configure the connection pool, so its client is replaced
+        session.client = httpx.AsyncClient(transport=self._create_http_transport(), headers=session.client.headers)
+        session.token_acquirer.client = session.client
+        return session
+
+    def _create_http_transport(self) -> httpx.AsyncBaseTransport:
+        return httpx.AsyncHTTPTransport(http2=True, limits=self.settings.http_limits())
+
+    async def aclose(self) -> None:
+        session = self._sessions.pop()
+        if session is not None:
+            await session.client.aclose()
+
     async def translate_text(self, text: str, src: str, dest: str) -> str:
-        async with googletrans.Translator() as translator:
-            res = await translator.translate(text, dest=dest, src=src)
-            res_text: str = res.text
-            return res_text
+        res = await self._sessions.get().translate(text, dest=dest, src=src)
+        res_text: str = res.text
+        return res_text
+
+    async def translate_many(self, texts: list[str], src: str, dest: str) -> list[str]:
+        # A list passed to googletrans is still translated with a request per text,
+        # while the lines of a text are translated line by line in one request
+        if len(texts) == 1 or any("\n" in text for text in texts):
+            return await super().translate_many(texts, src, dest)
+        # The lines are numbered, so that merged, split or reordered lines are noticed
+        numbered_lines = "\n".join(f"{i}. {text}" for i, text in enumerate(texts, start=1))
+        res = await self._sessions.get().translate(numbered_lines, dest=dest, src=src)
+        translations = _parse_numbered_lines(res.text, len(texts))
+        if translations is None:
+            logging.warning(f"The translation of {len(texts)} numbered lines is not aligned: {res.text!r}")
+            return await super().translate_many(texts, src, dest)
+        return translations
+
+
+_NUMBERED_LINE_PATTERN: Final[re.Pattern[str]] = re.compile(r"\s*(\d+)\s*[.)]\s*(.*\S)\s*")
+
+
+def _parse_numbered_lines(text: str, count: int) -> Optional[list[str]]:
+    """Returns the texts of the lines numbered from 1 to `count`, or None if the lines don't match the numbers."""
+    lines = text.strip().split("\n")
+    if len(lines) != count:
+        return None
+    texts = []
+    for number, line in enumerate(lines, start=1):
+        match = _NUMBERED_LINE_PATTERN.fullmatch(line)
+        if match is None or int(match.group(1)) != number:
+            return None
+        texts.append(match.group(2))
+    return texts
+
+
+class LlmTranslator(Translator):
+    """Translates with the global LLM provider. Slower than Google Translate, used when it is unavailable."""
+
+    async def translate_text(self, text: str, src: str, dest: str) -> str:
+        def validate(response: str) -> None:
+            check(len(response.strip()) > 0, "Expected non empty translation")
+            check(response.strip().count("\n") <= text.strip().count("\n"), "Expected no extra lines in translation")
+
+        response = await ask_llm(get_translation_prompt(text, src, dest), validate=validate)
+        return response.strip()
+
+
+@dataclass
+class TranslationCircuitBreakerSettings:
+    # Translations slower than this count as failures of the translator
+    slow_call_seconds: Optional[float] = 5.0
+    failure_rate_threshold: float = 0.5
+    open_seconds: float = 30.0
+
+
+def _create_translation_circuit_breaker(settings: TranslationCircuitBreakerSettings) -> CircuitBreaker:
+    return CircuitBreaker(
+        "Translation",
+        failure_rate_threshold=settings.failure_rate_threshold,
+        slow_call_seconds=settings.slow_call_seconds,
+        open_seconds=settings.open_seconds,
+    )
 
 
 __GLOBAL_TRANSLATOR: Translator = GoogleTranslatorImpl()
+# Used while the global translator fails or is slow
+__FALLBACK_TRANSLATOR: Optional[Translator] = None
+__TRANSLATION_CIRCUIT_BREAKER: CircuitBreaker = _create_translation_circuit_breaker(TranslationCircuitBreakerSettings())
+# Gives the translation and the backend which translated it
+__TRANSLATION_SINGLE_FLIGHT: SingleFlight[tuple[str, str]] = SingleFlight()
+__TRANSLATION_HEDGED_CALLER: HedgedCaller = HedgedCaller("Translation")
+__TRANSLATION_CACHE: Optional[TranslationCache] = None
+__OFFLINE_DICTIONARY: Optional[OfflineDictionary] = None
+# Translations done in the current request, set by translation_request_scope
+__REQUEST_TRANSLATIONS: contextvars.ContextVar[Optional[dict[tuple[str, str, str, str], str]]] = contextvars.ContextVar(
+    "request_translations", default=None
+)
+# Separate from the LLM limits: Google Translate isn't slowed down by the local LLM server load
+__TRANSLATION_CONCURRENCY_LIMITER: AdaptiveConcurrencyLimiter = AdaptiveConcurrencyLimiter(min_limit=1, max_limit=8)
+
+
+async def _translate_batch(batch_key: tuple[Translator, str, str], texts: list[str]) -> list[str]:
+    translator, src, dest = batch_key
+    async with __TRANSLATION_CIRCUIT_BREAKER.guard(wait_for=__TRANSLATION_CONCURRENCY_LIMITER.acquire()):
+        if len(texts) == 1:
+            return [await translator.translate_text(texts[0], src, dest)]
+        logging.info(f"Translating {len(texts)} texts in a batch, src={src}, dest={dest}")
+        return await translator.translate_many(texts, src, dest)
+
+
+# Collects the translations needed by all the words of a request (every request runs on its own event loop).
+# Batched by the translator too, so a translator replaced while texts wait for a batch doesn't get them
+__TRANSLATION_BATCHER: MicroBatcher[tuple[Translator, str, str], str, str] = MicroBatcher(
+    _translate_batch, max_batch_size=1, max_delay_seconds=0.05
+)
+
+
+async def _translate_once(translator: Translator, text: str, src: str, dest: str) -> str:
+    if __TRANSLATION_BATCHER.max_batch_size > 1:
+        return await __TRANSLATION_BATCHER.submit((translator, src, dest), text)
+    # Rejected calls don't take a slot of the limiter, and so don't count as its failures
+    async with __TRANSLATION_CIRCUIT_BREAKER.guard(wait_for=__TRANSLATION_CONCURRENCY_LIMITER.acquire()):
+        return await translator.translate_text(text, src, dest)
+
+
+async def _translate_with_fallback(translator: Translator, text: str, src: str, dest: str) -> tuple[str, str]:
+    fallback_translator = __FALLBACK_TRANSLATOR
+    try:
+        translation = await with_latency_budget(
+            __TRANSLATION_HEDGED_CALLER.call(lambda: _translate_once(translator, text, src, dest)),
+            get_latency_budgets().translation_seconds,
+            description="Translation",
+        )
+        return translation, translator.__class__.__name__
+    except Exception as e:
+        if fallback_translator is None:
+            raise
+        if not isinstance(e, CircuitOpenError):
+            logging.warning(f"Translation failed, using {fallback_translator.__class__.__name__}: {e!r}")
+    return await fallback_translator.translate_text(text, src, dest), fallback_translator.__class__.__name__
 
 
 async def translate_text(text: str, src: str, dest: str) -> str:
+    """
+    Translates with the global translator, or with the fallback translator while the global one fails or is slow.
+    Translations are served from and stored into the global cache, if set.
+    """
     global __GLOBAL_TRANSLATOR
 
-    return await __GLOBAL_TRANSLATOR.translate_text(text, src, dest)
+    translator = __GLOBAL_TRANSLATOR
+    backend = translator.__class__.__name__
+    request_translations = __REQUEST_TRANSLATIONS.get()
+    request_key = (backend, text, src, dest)
+    if request_translations is not None and request_key in request_translations:
+        return request_translations[request_key]
+
+    translation_cache = __TRANSLATION_CACHE
+    if translation_cache is not None:
+        cached_translation = translation_cache.get(text, src, dest, backend)
+        fallback_translator = __FALLBACK_TRANSLATOR
+        if (
+            cached_translation is None
+            and fallback_translator is not None
+            and __TRANSLATION_CIRCUIT_BREAKER.state != CircuitState.Closed
+        ):
+            # While the translator is unavailable, texts already translated by the fallback aren't asked again
+            cached_translation = translation_cache.get(text, src, dest, fallback_translator.__class__.__name__)
+        if cached_translation is not None:
+            logging.info(f"Translation cache hit, text='{text}', translation='{cached_translation}'")
+            return cached_translation
+
+    # The same text translated concurrently, e.g., the same word in two requests, is sent only once
+    key = (backend, " ".join(text.split()), src, dest)
+    translation, translated_by = await __TRANSLATION_SINGLE_FLIGHT.run(
+        key, lambda: _translate_with_fallback(translator, text, src, dest)
+    )
+    if translation_cache is not None:
+        # Fallback translations are stored under their own backend, so they aren't used once the translator is back
+        translation_cache.put(text, src, dest, translated_by, translation)
+    if request_translations is not None:
+        request_translations[request_key] = translation
+    return translation
+
+
+async def translate_word(word: str, src: str, dest: str, part_of_speech: Optional[str] = None) -> str:
+    """Translates a single word with the offline dictionary, if set and it has the word, or with translate_text."""
+    offline_dictionary = __OFFLINE_DICTIONARY
+    if offline_dictionary is not None:
+        translation = offline_dictionary.lookup(word, src, dest, part_of_speech)
+        if translation is not None:
+            logging.info(f"Offline dictionary hit, word='{word}', translation='{translation}'")
+            return translation
+    return await translate_text(word, src, dest)
+
+
+@contextlib.contextmanager
+def translation_request_scope() -> Iterator[None]:
+    """
+    Every text is translated once in the scope, even if the translation cache is disabled.
+    Tasks created in the scope share it.
+    """
+    token = __REQUEST_TRANSLATIONS.set({})
+    try:
+        yield
+    finally:
+        __REQUEST_TRANSLATIONS.reset(token)
+
+
+def set_translation_hedging_enabled(enabled: bool) -> None:
+    __TRANSLATION_HEDGED_CALLER.enabled = enabled
+
+
+def set_translation_batching(max_batch_size: int, max_delay_seconds: float) -> None:
+    """Batch size 1 disables batching: every text is translated with its own request."""
+    check(max_batch_size >= 1, f"Expected batch size to be at least 1, but got {max_batch_size}")
+    __TRANSLATION_BATCHER.max_batch_size = max_batch_size
+    __TRANSLATION_BATCHER.max_delay_seconds = max_delay_seconds
+
+
+def set_translation_concurrency_bounds(min_limit: int, max_limit: int) -> None:
+    """Sets the floor and the ceiling of the number of concurrent translation requests."""
+    global __TRANSLATION_CONCURRENCY_LIMITER
+    __TRANSLATION_CONCURRENCY_LIMITER = AdaptiveConcurrencyLimiter(min_limit, max_limit)
+
+
+def set_global_translator(settings: TranslatorSettings) -> None:
+    global __GLOBAL_TRANSLATOR
+    __GLOBAL_TRANSLATOR = GoogleTranslatorImpl(settings)
+
+
+def set_fallback_translator(translator: Optional[Translator]) -> None:
+    global __FALLBACK_TRANSLATOR
+    __FALLBACK_TRANSLATOR = translator
+
+
+def set_translation_circuit_breaker(settings: TranslationCircuitBreakerSettings) -> None:
+    global __TRANSLATION_CIRCUIT_BREAKER
+    __TRANSLATION_CIRCUIT_BREAKER = _create_translation_circuit_breaker(settings)
+
+
+def set_global_translation_cache(translation_cache: Optional[TranslationCache]) -> None:
+    global __TRANSLATION_CACHE
+    __TRANSLATION_CACHE = translation_cache
+
+
+def set_global_offline_dictionary(offline_dictionary: Optional[OfflineDictionary]) -> None:
+    global __OFFLINE_DICTIONARY
+    __OFFLINE_DICTIONARY = offline_dictionary
+
+
+def get_translation_metrics() -> dict[str, Any]:
+    return {
+        "hedging": __TRANSLATION_HEDGED_CALLER.metrics(),
+        "concurrency": __TRANSLATION_CONCURRENCY_LIMITER.stats(),
+        "circuit_breaker": __TRANSLATION_CIRCUIT_BREAKER.stats(),
+        "cache": __TRANSLATION_CACHE.stats() if __TRANSLATION_CACHE is not None else None,
+        "offline_dictionary": __OFFLINE_DICTIONARY.stats() if __OFFLINE_DICTIONARY is not None else None,
+    }
 
 
 def override_global_translator_for_test(translator: Translator) -> None:
@@ -34,9 +320,18 @@ def override_global_translator_for_test(translator: Translator) -> None:
     __GLOBAL_TRANSLATOR = translator
 
 
-def check_translator_is_available() -> None:
+async def check_translator_is_available() -> None:
+    translator = __GLOBAL_TRANSLATOR
     try:
-        asyncio.run(__GLOBAL_TRANSLATOR.translate_text("Katze", src="de", dest="ru"))
-    except httpx.ConnectError:
-        print("Error: Failed to connect to Google Translate. Check your internet connection.")
-        sys.exit(1)
+        await translator.translate_text("Katze", src="de", dest="ru")
+    except httpx.ConnectError as e:
+        raise DependencyUnavailableError(
+            "Failed to connect to Google Translate. Check your internet connection."
+        ) from e
+    finally:
+        await translator.aclose()
+
+
+async def release_translator_sessions() -> None:
+    """Closes the translator sessions created on the running event loop. Must be called before the loop is closed."""
+    await __GLOBAL_TRANSLATOR.aclose()
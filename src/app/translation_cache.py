@@ -0,0 +1,85 @@
+"""
+Persistent cache of translations. Run `python -m app.translation_cache --help` to inspect or clear it.
+"""
+
+import argparse
+import json
+from dataclasses import dataclass, asdict
+from typing import Any, Optional
+
+from app.configuration import default_translation_cache_path
+from app.disk_cache import DiskCache, make_cache_key
+
+
+@dataclass
+class CachedTranslation:
+    text: str
+    src: str
+    dest: str
+    # Class name of the translator, translations of different translators are not mixed
+    backend: str
+    translation: str
+
+
+class TranslationCache:
+    """Translations stored in a DiskCache, keyed by the text, the languages and the translator backend."""
+
+    def __init__(self, disk_cache: DiskCache) -> None:
+        self.disk_cache = disk_cache
+
+    def get(self, text: str, src: str, dest: str, backend: str) -> Optional[str]:
+        value = self.disk_cache.get(make_cache_key(backend, text, src, dest))
+        if value is None:
+            return None
+        translation: str = json.loads(value)["translation"]
+        return translation
+
+    def put(self, text: str, src: str, dest: str, backend: str, translation: str) -> None:
+        # The source text is stored along with the translation, so the entries can be inspected and reused
+        entry = CachedTranslation(text=text, src=src, dest=dest, backend=backend, translation=translation)
+        self.disk_cache.put(make_cache_key(backend, text, src, dest), json.dumps(asdict(entry), ensure_ascii=False))
+
+    def entries(self) -> list[CachedTranslation]:
+        return [CachedTranslation(**json.loads(value)) for _, value in self.disk_cache.items()]
+
+    def stats(self) -> dict[str, Any]:
+        return self.disk_cache.stats()
+
+    def clear(self) -> None:
+        self.disk_cache.clear()
+
+    def close(self) -> None:
+        self.disk_cache.close()
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Inspect or clear the translation cache")
+    default_path = default_translation_cache_path()
+    parser.add_argument("--path", default=default_path, help=f"Translation cache file (default: {default_path})")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("stats", help="Print the number of cached translations")
+    list_parser = subparsers.add_parser("list", help="Print the cached translations, least recently used first")
+    list_parser.add_argument("--limit", type=int, default=None, help="Print only the most recently used ones")
+    subparsers.add_parser("clear", help="Remove all cached translations")
+    args = parser.parse_args(argv)
+
+    # The size limit only matters when entries are added
+    cache = TranslationCache(DiskCache(args.path, max_entries=1))
+    try:
+        if args.command == "stats":
+            print(f"{cache.stats()['entries']} cached translations in {args.path}")
+        elif args.command == "list":
+            entries = cache.entries()
+            if args.limit is not None:
+                entries = entries[-args.limit :]
+            for entry in entries:
+                print(f"[{entry.backend} {entry.src}->{entry.dest}] {entry.text} -> {entry.translation}")
+        elif args.command == "clear":
+            cache.clear()
+            print(f"Cleared {args.path}")
+    finally:
+        cache.close()
+
+
+if __name__ == "__main__":
+    main()
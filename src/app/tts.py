@@ -1,59 +1,579 @@
+import asyncio
+import collections
+import functools
+import json
 import logging
+import os
 import platform
+import queue
+import shutil
 import subprocess
 import tempfile
+import threading
+import uuid
 from abc import ABC, abstractmethod
+from dataclasses import asdict, dataclass, field, replace
+from typing import Any, Callable, Optional
 
-from app.utils import check
+import numpy as np
+
+from app.audio_cache import AudioCache
+from app.audio_segments import pcm_from_wav, split_at_silences, trim_silence
+from app.concurrency_limit import AdaptiveConcurrencyLimiter
+from app.disk_cache import make_cache_key
+from app.utils import check, DependencyUnavailableError
+
+
+def audio_codec_choices() -> list[str]:
+    return ["mp3", "opus"]
+
+
+@dataclass(frozen=True)
+class AudioEncoderSettings:
+    """How the speech is encoded. Speech is always encoded as mono, the synthesizers don't produce stereo."""
+
+    # "mp3" with lame or "opus" with opusenc, in an Ogg file which Anki plays on desktop and AnkiDroid
+    codec: str = "mp3"
+    bitrate_kbps: int = 64
+    # The bitrate is the average, simple and quiet parts get fewer bits
+    vbr: bool = False
+    # Leading and trailing silence is removed before encoding
+    trim_silence: bool = True
+
+    def __post_init__(self) -> None:
+        check(self.codec in audio_codec_choices(), f"Expected one of {audio_codec_choices()}, but got {self.codec}")
+        check(self.bitrate_kbps > 0, f"Expected a positive bitrate, but got {self.bitrate_kbps}")
+
+    @property
+    def file_extension(self) -> str:
+        return "ogg" if self.codec == "opus" else "mp3"
+
+    def command(self, raw_sample_rate: Optional[int] = None) -> list[str]:
+        """
+        The encoder reading from stdin and writing into stdout. The input is a WAV file, or raw 16-bit
+        little-endian mono samples if `raw_sample_rate` is set.
+        """
+        bitrate = str(self.bitrate_kbps)
+        if self.codec == "opus":
+            args = ["opusenc", "--quiet", "--downmix-mono", "--bitrate", bitrate, "--vbr" if self.vbr else "--hard-cbr"]
+            if raw_sample_rate is not None:
+                args += ["--raw", "--raw-bits", "16", "--raw-rate", str(raw_sample_rate), "--raw-chan", "1"]
+                args += ["--raw-endianness", "0"]
+            return [*args, "-", "-"]
+        args = ["lame", "--quiet", "-m", "m", *(["--abr", bitrate] if self.vbr else ["-b", bitrate])]
+        if raw_sample_rate is not None:
+            args += ["-r", "-s", str(raw_sample_rate / 1000), "--bitwidth", "16", "--signed", "--little-endian"]
+        return [*args, "-", "-"]
+
+    def describe(self) -> dict[str, Any]:
+        return asdict(self)
+
+    async def encode_pcm(self, samples: np.ndarray, sample_rate: int) -> bytes:
+        if self.trim_silence:
+            samples = trim_silence(samples, sample_rate)
+        return await run_command(self.command(raw_sample_rate=sample_rate), input=samples.tobytes())
 
 
 class TextToSpeechEngine(ABC):
+    # Set by the engines which are configured with other settings
+    encoder: AudioEncoderSettings = AudioEncoderSettings()
+
     @abstractmethod
-    def text_to_speech_into_file(self, text: str, save_to_path: str, lang: str) -> None:
+    async def text_to_speech(self, text: str, lang: str) -> bytes:
+        """Returns the speech encoded by the encoder."""
         pass
 
+    async def text_to_speech_batch(self, texts: list[str], lang: str) -> list[bytes]:
+        """
+        Returns the speech of every text encoded by the encoder. Engines paying a startup cost per run override it
+        to speak all texts in one run, by default they are spoken one after another.
+        """
+        return [await self.text_to_speech(text, lang) for text in texts]
+
+    def describe(self, lang: str) -> dict[str, Any]:
+        """Everything which changes the audio for the same text, e.g., the voice and the encoder settings."""
+        return {"engine": self.__class__.__name__, "lang": lang, "encoder": self.encoder.describe()}
+
+    async def encode_wav(self, wav: bytes) -> bytes:
+        samples, sample_rate = pcm_from_wav(wav)
+        return await self.encode_pcm(samples, sample_rate)
 
-def check_command_exists(command: str) -> None:
-    check(
-        subprocess.run(["which", command], capture_output=True).returncode == 0,
-        f"Command '{command}' is not found. It is required for Mac TTS engine",
+    async def encode_pcm(self, samples: np.ndarray, sample_rate: int) -> bytes:
+        return await self.encoder.encode_pcm(samples, sample_rate)
+
+    async def text_to_speech_into_file(self, text: str, save_to_path: str, lang: str) -> None:
+        audio = await self.text_to_speech(text, lang)
+        with open(save_to_path, "wb") as f:
+            f.write(audio)
+
+    def close(self) -> None:
+        """Releases the long-lived resources, e.g., synthesizer processes."""
+        pass
+
+
+async def run_command(args: list[str], input: Optional[bytes] = None) -> bytes:
+    """Runs the command without blocking the event loop and returns its output. Raises CalledProcessError if it fails."""
+    process = await asyncio.create_subprocess_exec(
+        *args,
+        stdin=asyncio.subprocess.PIPE if input is not None else asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
     )
+    try:
+        output, stderr = await process.communicate(input)
+    except asyncio.CancelledError:
+        process.kill()
+        await process.wait()
+        raise
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode or 1, args, stderr=stderr)
+    return output
 
 
-class MacTextToSpeechEngineImpl(TextToSpeechEngine):
-    def __init__(self) -> None:
-        check(
-            platform.system() == "Darwin",
-            f"Mac TTS engine is only supported on macOS, but current OS is {platform.system()}",
+def check_command_exists(command: str, engine_name: str) -> None:
+    if shutil.which(command) is None:
+        raise DependencyUnavailableError(
+            f"Command '{command}' is not found. It is required for {engine_name} TTS engine"
         )
-        check_command_exists("say")
-        check_command_exists("lame")
 
-    def text_to_speech_into_file(self, text: str, save_to_path: str, lang: str) -> None:
+
+_SAY_SAMPLE_RATE = 22050
+# Spoken by `say` between the texts of a batch, the audio is split at these silences
+_SAY_BATCH_SILENCE_MS = 1000
+
+
+class MacTextToSpeechEngineImpl(TextToSpeechEngine):
+    """
+    Speaks with `say` into a WAV file, which is read back and encoded in memory.
+
+    A batch of texts is spoken by a single `say` run with long silences between the texts. The samples are split
+    at these silences and every clip is encoded separately.
+    """
+
+    def __init__(
+        self, encoder: AudioEncoderSettings = AudioEncoderSettings(), command: Optional[list[str]] = None
+    ) -> None:
+        """`command` replaces `say`, e.g., with a stand-in taking the same arguments."""
+        if command is None:
+            if platform.system() != "Darwin":
+                raise DependencyUnavailableError(
+                    f"Mac TTS engine is only supported on macOS, but current OS is {platform.system()}"
+                )
+            command = ["say"]
+        check_command_exists(command[0], "Mac")
+        check_command_exists(encoder.command()[0], "Mac")
+        self.command = command
+        self.encoder = encoder
+
+    @staticmethod
+    def _get_voice(lang: str) -> str:
         if lang == "de":
-            voice = "Anna"
+            return "Anna"
         elif lang == "en":
-            voice = "Samantha"
+            return "Samantha"
         else:
             raise ValueError(f"Unsupported language for Mac TTS: {lang}")
 
-        with tempfile.NamedTemporaryFile(mode="wb", suffix=".aiff") as temp_aiff:
-            temp_aiff_path = temp_aiff.name
-            subprocess.run(["say", "-v", voice, "-o", temp_aiff_path, text], check=True)
-            subprocess.run(["lame", "--quiet", "-b", "128", temp_aiff_path, save_to_path], check=True)
+    def describe(self, lang: str) -> dict[str, Any]:
+        return {
+            "engine": "say",
+            "voice": self._get_voice(lang),
+            "encoder": self.encoder.describe(),
+        }
+
+    async def text_to_speech(self, text: str, lang: str) -> bytes:
+        return await self.encode_wav(await self._say(self._get_voice(lang), text))
+
+    def _say_args(self, voice: str, output_path: str, text: str) -> list[str]:
+        data_format = f"--data-format=LEI16@{_SAY_SAMPLE_RATE}"
+        return [*self.command, "-v", voice, "--file-format=WAVE", data_format, "-o", output_path, text]
+
+    async def _say(self, voice: str, text: str) -> bytes:
+        """Returns the speech as WAV."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            wav_path = os.path.join(temp_dir, "speech.wav")
+            await run_command(self._say_args(voice, wav_path, text))
+            with open(wav_path, "rb") as f:
+                return f.read()
+
+    async def text_to_speech_batch(self, texts: list[str], lang: str) -> list[bytes]:
+        # `[[` starts an embedded command of `say`, such texts could break the separators
+        if len(texts) == 1 or any("[[" in text for text in texts):
+            return await super().text_to_speech_batch(texts, lang)
+        separator = f" [[slnc {_SAY_BATCH_SILENCE_MS}]] "
+        samples, sample_rate = pcm_from_wav(await self._say(self._get_voice(lang), separator.join(texts)))
+        segments = split_at_silences(
+            samples,
+            count=len(texts),
+            sample_rate=sample_rate,
+            min_silence_seconds=0.8 * _SAY_BATCH_SILENCE_MS / 1000,
+        )
+        if segments is None:
+            logging.warning(f"Could not split the speech of {len(texts)} texts, speaking them one by one")
+            return await super().text_to_speech_batch(texts, lang)
+        return [await self.encode_pcm(segment, sample_rate) for segment in segments]
+
+
+def default_piper_voices_dir() -> str:
+    data_home = os.environ.get("XDG_DATA_HOME") or os.path.join(os.path.expanduser("~"), ".local", "share")
+    return os.path.join(data_home, "piper")
+
+
+@dataclass
+class PiperSettings:
+    command: list[str] = field(default_factory=lambda: ["piper"])
+    # Voice models `<voice>.onnx` (with their `.onnx.json` configs) by language, downloaded into voices_dir
+    voices_dir: str = field(default_factory=default_piper_voices_dir)
+    voices: dict[str, str] = field(default_factory=lambda: {"de": "de_DE-thorsten-medium", "en": "en_US-lessac-medium"})
+    # Each process holds a loaded voice model in memory. None is the number of TTS workers, so that the workers
+    # can speak the same language at the same time, but not more than _MAX_DEFAULT_PIPER_PROCESSES_PER_VOICE
+    processes_per_voice: Optional[int] = None
+
+
+# Every piper process runs its own ONNX runtime with a thread pool over all cores,
+# so a few processes already keep the CPU busy, and more only take memory and contend for the cores
+_MAX_DEFAULT_PIPER_PROCESSES_PER_VOICE = 4
+
+
+class _PiperProcess:
+    """
+    A `piper --json-input` process with a loaded voice model. Utterances are written as JSON lines on its stdin,
+    and piper prints the path of every written WAV file on its stdout once it's done.
+    """
+
+    def __init__(self, args: list[str]) -> None:
+        self.args = args
+        self.process = subprocess.Popen(
+            args, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, bufsize=1
+        )
+        # Piper logs every utterance, stderr is drained so it never blocks on a full pipe
+        self._stderr_tail: collections.deque[str] = collections.deque(maxlen=20)
+        threading.Thread(target=self._drain_stderr, daemon=True).start()
+
+    def _drain_stderr(self) -> None:
+        assert self.process.stderr is not None
+        for line in self.process.stderr:
+            self._stderr_tail.append(line)
+
+    def is_alive(self) -> bool:
+        return self.process.poll() is None
+
+    def synthesize(self, text: str, wav_path: str) -> None:
+        assert self.process.stdin is not None and self.process.stdout is not None
+        try:
+            self.process.stdin.write(json.dumps({"text": text, "output_file": wav_path}) + "\n")
+            self.process.stdin.flush()
+            written_path = self.process.stdout.readline()
+        except (BrokenPipeError, ValueError):
+            written_path = ""
+        if not written_path:
+            self.close()
+            raise subprocess.CalledProcessError(
+                self.process.returncode or 1, self.args, stderr="".join(self._stderr_tail)
+            )
+
+    def close(self) -> None:
+        if self.process.poll() is None:
+            # Piper exits once its stdin is closed
+            assert self.process.stdin is not None
+            try:
+                self.process.stdin.close()
+                self.process.wait(timeout=5)
+            except (BrokenPipeError, subprocess.TimeoutExpired):
+                self.process.kill()
+                self.process.wait()
+
+
+class _PiperProcessPool:
+    """Up to `max_processes` processes of a voice, started when all the others are busy."""
+
+    def __init__(self, create_process: Callable[[], _PiperProcess], max_processes: int) -> None:
+        self._create_process = create_process
+        self._max_processes = max_processes
+        self._idle: queue.Queue[_PiperProcess] = queue.Queue()
+        self._processes: list[_PiperProcess] = []
+        self._lock = threading.Lock()
+
+    def acquire(self) -> _PiperProcess:
+        while True:
+            with self._lock:
+                # Crashed processes are replaced
+                self._processes = [process for process in self._processes if process.is_alive()]
+                if self._idle.empty() and len(self._processes) < self._max_processes:
+                    process = self._create_process()
+                    self._processes.append(process)
+                    return process
+            process = self._idle.get()
+            if process.is_alive():
+                return process
+
+    def release(self, process: _PiperProcess) -> None:
+        # A crashed process is put back too, it wakes up a waiting caller which then starts a new process
+        self._idle.put(process)
+
+    def close(self) -> None:
+        with self._lock:
+            for process in self._processes:
+                process.close()
+            self._processes.clear()
 
 
-__TTS_ENGINE: TextToSpeechEngine
+class PiperTextToSpeechEngineImpl(TextToSpeechEngine):
+    """
+    Speaks with piper (https://github.com/rhasspy/piper), which runs on Linux.
+    The voice models are loaded once into long-lived piper processes, which are fed one utterance after another,
+    instead of starting a process per clip. The processes are used from threads, so that requests running on
+    different event loops share them.
+    """
+
+    def __init__(self, settings: PiperSettings, encoder: AudioEncoderSettings = AudioEncoderSettings()) -> None:
+        check_command_exists(settings.command[0], "Piper")
+        check_command_exists(encoder.command()[0], "Piper")
+        check(settings.processes_per_voice is not None, "Expected the number of processes per voice to be resolved")
+        assert settings.processes_per_voice is not None
+        check(settings.processes_per_voice >= 1, f"Expected at least one process, got {settings.processes_per_voice}")
+        for voice in settings.voices.values():
+            model_path = self._model_path(settings, voice)
+            if not os.path.exists(model_path):
+                raise DependencyUnavailableError(
+                    f"Piper voice model '{model_path}' is not found, download '{voice}' into {settings.voices_dir}"
+                )
+        self.settings = settings
+        self.encoder = encoder
+        self._temp_dir = tempfile.TemporaryDirectory(prefix="anki_card_generator_piper_")
+        self._pools = {
+            lang: _PiperProcessPool(
+                functools.partial(self._start_process, voice), max_processes=settings.processes_per_voice
+            )
+            for lang, voice in settings.voices.items()
+        }
+
+    @staticmethod
+    def _model_path(settings: PiperSettings, voice: str) -> str:
+        return os.path.join(settings.voices_dir, f"{voice}.onnx")
+
+    def _start_process(self, voice: str) -> _PiperProcess:
+        logging.info(f"Starting piper process for voice {voice}")
+        model_path = self._model_path(self.settings, voice)
+        return _PiperProcess(
+            [*self.settings.command, "--model", model_path, "--json-input", "--output_dir", self._temp_dir.name]
+        )
+
+    def _get_pool(self, lang: str) -> _PiperProcessPool:
+        if lang not in self._pools:
+            raise ValueError(f"Unsupported language for Piper TTS: {lang}")
+        return self._pools[lang]
+
+    def describe(self, lang: str) -> dict[str, Any]:
+        self._get_pool(lang)
+        return {"engine": "piper", "voice": self.settings.voices[lang], "encoder": self.encoder.describe()}
+
+    def warm_up(self) -> None:
+        """Loads a model of every voice, so the first clips don't wait for it."""
+        for pool in self._pools.values():
+            pool.release(pool.acquire())
+
+    async def text_to_speech(self, text: str, lang: str) -> bytes:
+        pool = self._get_pool(lang)
+        # The clip is finished in the thread even if the caller is cancelled, so no process is left mid-utterance
+        wav = await asyncio.to_thread(self._synthesize_wav, pool, text)
+        return await self.encode_wav(wav)
+
+    def _synthesize_wav(self, pool: _PiperProcessPool, text: str) -> bytes:
+        wav_path = os.path.join(self._temp_dir.name, f"{uuid.uuid4().hex}.wav")
+        try:
+            process = pool.acquire()
+            try:
+                process.synthesize(text, wav_path)
+            finally:
+                pool.release(process)
+            with open(wav_path, "rb") as f:
+                return f.read()
+        finally:
+            if os.path.exists(wav_path):
+                os.remove(wav_path)
+
+    def close(self) -> None:
+        for pool in self._pools.values():
+            pool.close()
+        self._temp_dir.cleanup()
+
+
+__TTS_ENGINE: Optional[TextToSpeechEngine] = None
+__TTS_ENGINE_NAME: str = "auto"
+__TTS_BATCH_SIZE: int = 20
+__PIPER_SETTINGS: PiperSettings = PiperSettings()
+__AUDIO_ENCODER: AudioEncoderSettings = AudioEncoderSettings()
+__AUDIO_CACHE: Optional[AudioCache] = None
+__DECK_MEDIA_STATS: dict[str, int] = {"decks": 0, "files": 0, "bytes": 0}
+__DECK_MEDIA_STATS_LOCK = threading.Lock()
+# Synthesis is CPU bound, so by default there is a worker per core. Shared by all requests, which run on
+# their own event loops, so a fixed limit (min == max) of the cross-loop limiter is used
+__TTS_WORKER_LIMITER: AdaptiveConcurrencyLimiter = AdaptiveConcurrencyLimiter(
+    min_limit=os.cpu_count() or 1, max_limit=os.cpu_count() or 1
+)
+
+
+def tts_engine_choices() -> list[str]:
+    # "auto" is `say` on macOS and piper elsewhere
+    return ["auto", "say", "piper"]
 
 
 def init_tts_engine() -> None:
     global __TTS_ENGINE
-    logging.info("Using Mac 'say' as text-to-speech engine")
-    __TTS_ENGINE = MacTextToSpeechEngineImpl()
+    engine_name = __TTS_ENGINE_NAME
+    if engine_name == "auto":
+        engine_name = "say" if platform.system() == "Darwin" else "piper"
+    if engine_name == "say":
+        logging.info("Using Mac 'say' as text-to-speech engine")
+        __TTS_ENGINE = MacTextToSpeechEngineImpl(encoder=__AUDIO_ENCODER)
+    elif engine_name == "piper":
+        logging.info(f"Using piper as text-to-speech engine with voices {__PIPER_SETTINGS.voices}")
+        piper_settings = __PIPER_SETTINGS
+        if piper_settings.processes_per_voice is None:
+            processes_per_voice = min(__TTS_WORKER_LIMITER.max_limit, _MAX_DEFAULT_PIPER_PROCESSES_PER_VOICE)
+            piper_settings = replace(piper_settings, processes_per_voice=processes_per_voice)
+        piper_engine = PiperTextToSpeechEngineImpl(piper_settings, encoder=__AUDIO_ENCODER)
+        piper_engine.warm_up()
+        __TTS_ENGINE = piper_engine
+    else:
+        raise ValueError(f"Unknown TTS engine: {engine_name}")
+
+
+def set_tts_engine(engine_name: str) -> None:
+    """Must be called before the engine is initialized."""
+    global __TTS_ENGINE_NAME
+    check(engine_name in tts_engine_choices(), f"Expected one of {tts_engine_choices()}, but got {engine_name}")
+    __TTS_ENGINE_NAME = engine_name
+
+
+def set_audio_encoder(settings: AudioEncoderSettings) -> None:
+    """Must be called before the engine is initialized."""
+    global __AUDIO_ENCODER
+    __AUDIO_ENCODER = settings
+
+
+def set_piper_settings(settings: PiperSettings) -> None:
+    """Must be called before the engine is initialized."""
+    global __PIPER_SETTINGS
+    __PIPER_SETTINGS = settings
+
+
+def _get_tts_engine() -> TextToSpeechEngine:
+    # Normally initialized in the background on startup, but may be needed before that
+    if __TTS_ENGINE is None:
+        init_tts_engine()
+    assert __TTS_ENGINE is not None
+    return __TTS_ENGINE
+
+
+def close_tts_engine() -> None:
+    """Stops the synthesizer processes of the engine, if it's initialized. Called when the app exits."""
+    global __TTS_ENGINE
+    engine = __TTS_ENGINE
+    __TTS_ENGINE = None
+    if engine is not None:
+        engine.close()
+
+
+def override_tts_engine_for_test(engine: TextToSpeechEngine) -> None:
+    global __TTS_ENGINE
+    __TTS_ENGINE = engine
+
+
+def set_global_audio_cache(audio_cache: Optional[AudioCache]) -> None:
+    global __AUDIO_CACHE
+    __AUDIO_CACHE = audio_cache
+
+
+def record_deck_media(files: int, total_bytes: int) -> None:
+    with __DECK_MEDIA_STATS_LOCK:
+        __DECK_MEDIA_STATS["decks"] += 1
+        __DECK_MEDIA_STATS["files"] += files
+        __DECK_MEDIA_STATS["bytes"] += total_bytes
+
+
+def get_tts_metrics() -> dict[str, Any]:
+    with __DECK_MEDIA_STATS_LOCK:
+        deck_media = dict(__DECK_MEDIA_STATS)
+    return {
+        "audio_cache": __AUDIO_CACHE.stats() if __AUDIO_CACHE is not None else None,
+        "encoder": _get_tts_engine().encoder.describe() if __TTS_ENGINE is not None else None,
+        "deck_media": deck_media,
+    }
+
+
+def audio_key(text: str, lang: str) -> str:
+    """Content-addressed key of the speech: the same for the same text spoken by the same voice and encoder."""
+    return make_cache_key("tts", _get_tts_engine().describe(lang), text)
+
+
+def audio_file_extension() -> str:
+    return _get_tts_engine().encoder.file_extension
+
+
+def set_tts_max_workers(max_workers: int) -> None:
+    """Sets the number of texts synthesized at the same time."""
+    global __TTS_WORKER_LIMITER
+    check(max_workers >= 1, f"Expected at least one TTS worker, but got {max_workers}")
+    __TTS_WORKER_LIMITER = AdaptiveConcurrencyLimiter(min_limit=max_workers, max_limit=max_workers)
+
+
+def set_tts_batch_size(batch_size: int) -> None:
+    """Sets the maximum number of texts spoken by one synthesizer run, 1 speaks every text separately."""
+    global __TTS_BATCH_SIZE
+    check(batch_size >= 1, f"Expected a positive batch size, but got {batch_size}")
+    __TTS_BATCH_SIZE = batch_size
+
+
+async def text_to_speech(text: str, lang: str) -> bytes:
+    """Returns the encoded speech, without writing it to disk."""
+    engine = _get_tts_engine()
+    async with __TTS_WORKER_LIMITER.acquire():
+        logging.info(f"Generate text to speech for text={text} in lang={lang}")
+        return await engine.text_to_speech(text, lang)
+
+
+async def text_to_speech_into_file(text: str, save_to_path: str, lang: str) -> None:
+    """Takes the speech from the global audio cache, if set and it has it, otherwise synthesizes and caches it."""
+    await text_to_speech_batch_into_files([(text, save_to_path)], lang)
+
+
+async def text_to_speech_batch_into_files(texts_and_paths: list[tuple[str, str]], lang: str) -> None:
+    """
+    Like `text_to_speech_into_file` for many texts in the same language. The texts missing in the audio cache
+    are split into batches, so that every TTS worker gets one, and every batch is spoken by one synthesizer run.
+    """
+    extension = audio_file_extension()
+    for _, save_to_path in texts_and_paths:
+        check(
+            save_to_path.endswith(f".{extension}"),
+            f"Expected path to end with .{extension} extension, but got {save_to_path}",
+        )
+
+    audio_cache = __AUDIO_CACHE
+    missing = []
+    for text, save_to_path in texts_and_paths:
+        key = f"{audio_key(text, lang)}.{extension}"
+        if audio_cache is not None and audio_cache.copy_to(key, save_to_path):
+            logging.info(f"Audio cache hit for text={text} in lang={lang}")
+        else:
+            missing.append((text, save_to_path, key))
+    if not missing:
+        return
 
+    engine = _get_tts_engine()
+    limiter = __TTS_WORKER_LIMITER
+    batch_size = min(__TTS_BATCH_SIZE, -(-len(missing) // limiter.limit))
 
-def text_to_speech_into_file(text: str, save_to_path: str, lang: str) -> None:
-    check(save_to_path.endswith(".mp3"), f"Expected path to end with .mp3 extension, but got {save_to_path}")
+    async def speak_batch(batch: list[tuple[str, str, str]]) -> None:
+        async with limiter.acquire():
+            logging.info(f"Generate text to speech for {len(batch)} texts in lang={lang}")
+            clips = await engine.text_to_speech_batch([text for text, _, _ in batch], lang)
+        for (_, save_to_path, key), audio in zip(batch, clips, strict=True):
+            with open(save_to_path, "wb") as f:
+                f.write(audio)
+            if audio_cache is not None:
+                audio_cache.put(key, audio)
 
-    logging.info(f"Generate text to speech for text={text} in lang={lang} into {save_to_path}")
-    __TTS_ENGINE.text_to_speech_into_file(text, save_to_path, lang)
+    await asyncio.gather(*(speak_batch(missing[i : i + batch_size]) for i in range(0, len(missing), batch_size)))
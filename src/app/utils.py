@@ -1,3 +1,7 @@
 def check(condition: bool, message: str) -> None:
     if not condition:
         raise ValueError(message)
+
+
+class DependencyUnavailableError(Exception):
+    """A required external service or tool is not available. The message is shown to the user as is."""
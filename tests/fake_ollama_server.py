@@ -0,0 +1,64 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+from app.llm_interact import OllamaLlmProvider
+
+
+class FakeOllamaServer(ThreadingHTTPServer):
+    """Answers the Ollama API requests with `answer`, or with `status` error if it's not 200."""
+
+    def __init__(self, answer: str, status: int = 200, load_duration_ns: int = 0):
+        super().__init__(("127.0.0.1", 0), _FakeOllamaHandler)
+        self.answer = answer
+        self.status = status
+        self.load_duration_ns = load_duration_ns
+        self.requests = 0
+        self.request_bodies: list[dict[str, Any]] = []
+
+    @property
+    def host(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self) -> "FakeOllamaServer":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+class _FakeOllamaHandler(BaseHTTPRequestHandler):
+    server: FakeOllamaServer
+
+    def do_GET(self) -> None:
+        self._respond({"models": [{"model": OllamaLlmProvider.OLLAMA_MODEL, "name": OllamaLlmProvider.OLLAMA_MODEL}]})
+
+    def do_POST(self) -> None:
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.requests += 1
+        self.server.request_bodies.append(body)
+        if self.server.status != 200:
+            self._respond({"error": "server failure"}, self.server.status)
+        else:
+            self._respond(
+                {
+                    "model": body["model"],
+                    "response": self.server.answer if body.get("prompt") else "",
+                    "done": True,
+                    "load_duration": self.server.load_duration_ns,
+                }
+            )
+
+    def _respond(self, body: dict[str, Any], status: int = 200) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
@@ -0,0 +1,34 @@
+"""
+Stand-in for `piper --model <model> --json-input --output_dir <dir>`: writes a WAV file with "<pid> <model> <text>"
+as its samples into the output file of every JSON line and prints its path. Exits when asked to speak "crash".
+"""
+
+import argparse
+import json
+import os
+import sys
+import wave
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", required=True)
+    parser.add_argument("--json-input", action="store_true")
+    parser.add_argument("--output_dir", required=True)
+    args = parser.parse_args()
+    for line in sys.stdin:
+        utterance = json.loads(line)
+        if utterance["text"] == "crash":
+            sys.exit(1)
+        print(f"Speaking {utterance['text']}", file=sys.stderr)
+        samples = f"{os.getpid()} {os.path.basename(args.model)} {utterance['text']}".encode()
+        with wave.open(utterance["output_file"], "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(22050)
+            wav.writeframes(samples + b" " * (len(samples) % 2))
+        print(utterance["output_file"], flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+Stand-in for `say -v <voice> --file-format=WAVE --data-format=LEI16@<rate> -o <file> <text>`: writes the text as
+the samples of a WAV file, and the silence of every `[[slnc <ms>]]` command as zero samples. Texts asked to be
+spoken "without pause" swallow the silences around them. Every spoken text is appended to the `--log` file.
+"""
+
+import argparse
+import re
+import wave
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--log", required=True)
+    parser.add_argument("-v", dest="voice", required=True)
+    parser.add_argument("--file-format", required=True)
+    parser.add_argument("--data-format", required=True)
+    parser.add_argument("-o", dest="output", required=True)
+    parser.add_argument("text")
+    args = parser.parse_args()
+    with open(args.log, "a") as f:
+        f.write(args.text + "\n")
+    sample_rate = int(args.data_format.split("@")[1])
+    parts = re.split(r"\s*\[\[slnc (\d+)\]\]\s*", args.text)
+    samples = b""
+    for i, part in enumerate(parts):
+        if i % 2 == 1:
+            if "without pause" not in parts[i - 1] and "without pause" not in parts[i + 1]:
+                samples += b"\x00\x00" * (int(part) * sample_rate // 1000)
+            continue
+        samples += (part + " " * (len(part) % 2)).encode()
+    with wave.open(args.output, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(samples)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,8 @@ from app.llm_interact import LlmProvider
 class StubLlmProvider(LlmProvider):
     def __init__(self, response_test: str):
         self.response_test = response_test
+        self.prompts: list[str] = []
 
-    async def ask_llm(self, _: str) -> str:
+    async def ask_llm(self, prompt: str) -> str:
+        self.prompts.append(prompt)
         return self.response_test
@@ -1,3 +1,5 @@
+from typing import Optional
+
 from app.translate import Translator
 
 
@@ -7,3 +9,15 @@ class StubTranslator(Translator):
 
     async def translate_text(self, text: str, app: str, dest: str) -> str:
         return self.response
+
+
+class RecordingStubTranslator(Translator):
+    """Records the texts it's asked to translate, and returns `response` or, without it, the upper-cased text."""
+
+    def __init__(self, response: Optional[str] = None):
+        self.response = response
+        self.texts: list[str] = []
+
+    async def translate_text(self, text: str, src: str, dest: str) -> str:
+        self.texts.append(text)
+        return self.response if self.response is not None else text.upper()
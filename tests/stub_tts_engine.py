@@ -0,0 +1,32 @@
+import asyncio
+import sys
+from typing import Optional
+
+from app.tts import AudioEncoderSettings, TextToSpeechEngine
+
+
+class CopyingAudioEncoderSettings(AudioEncoderSettings):
+    """Returns the samples instead of encoding them."""
+
+    def command(self, raw_sample_rate: Optional[int] = None) -> list[str]:
+        return [sys.executable, "-c", "import sys; sys.stdout.buffer.write(sys.stdin.buffer.read())"]
+
+
+class StubTextToSpeechEngine(TextToSpeechEngine):
+    """Returns the text instead of the speech, tracks how many texts are spoken at the same time."""
+
+    def __init__(self, delay_seconds: float = 0.0) -> None:
+        self.delay_seconds = delay_seconds
+        self.texts: list[str] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def text_to_speech(self, text: str, lang: str) -> bytes:
+        self.texts.append(text)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay_seconds)
+            return text.encode()
+        finally:
+            self.in_flight -= 1
@@ -0,0 +1,90 @@
+import json
+
+import pytest
+
+from app.common_data_extract import set_all_in_one_llm_mode
+from app.english_data_extract import prepare_data_for_english_word
+from app.german_data_extract import prepare_data_for_german_word
+from app.llm_interact import override_global_llm_provider_for_test
+from app.translate import override_global_translator_for_test
+from app.word_hints import WordHints
+from stub_llm_provider import StubLlmProvider
+from stub_translator import RecordingStubTranslator
+
+
+@pytest.mark.asyncio(loop_scope="class")
+class TestAllInOneLlmMode:
+    def setup_method(self) -> None:
+        set_all_in_one_llm_mode(True)
+        self.translator = RecordingStubTranslator("translator")
+        override_global_translator_for_test(self.translator)
+
+    def teardown_method(self) -> None:
+        set_all_in_one_llm_mode(False)
+
+    async def test_german_verb_without_translation_requests(self):
+        response = {
+            "sentence_example": "Ich laufe jeden Morgen im Park.",
+            "sentence_example_translated_en": "I run in the park every morning.",
+            "translated_en": "Run",
+            "translated_ru": "Бегать",
+        }
+        override_global_llm_provider_for_test(StubLlmProvider(json.dumps(response, ensure_ascii=False)))
+        data = await prepare_data_for_german_word("laufen", WordHints(""))
+        assert data.sentence_example == "Ich laufe jeden Morgen im Park."
+        assert data.sentence_example_translated_en == "I run in the park every morning."
+        # The same post-processing as for the translator results
+        assert data.translated_en == "to run"
+        assert data.translated_ru == "бегать"
+        assert self.translator.texts == []
+
+    async def test_german_noun_invalid_field_translated_separately(self):
+        response = {
+            "sentence_example": "Die Katze schläft auf dem Sofa.",
+            "sentence_example_translated_en": "The cat sleeps on the sofa.",
+            "translated_en": "",
+            "translated_ru": ["кошка"],
+        }
+        provider = StubLlmProvider(json.dumps(response, ensure_ascii=False))
+        override_global_llm_provider_for_test(provider)
+        data = await prepare_data_for_german_word("Katze", WordHints(""))
+        assert "without an article" in provider.prompts[0]
+        assert data.sentence_example_translated_en == "The cat sleeps on the sofa."
+        assert data.translated_en == "translator"
+        assert data.translated_ru == "translator"
+        assert self.translator.texts == ["die Katze", "die Katze"]
+
+    async def test_russian_translation_not_asked_with_hint(self):
+        response = {
+            "sentence_example": "Wir müssen heute noch einkaufen.",
+            "sentence_example_translated_en": "We still have to go shopping today.",
+            "translated_en": "to shop",
+        }
+        provider = StubLlmProvider(json.dumps(response))
+        override_global_llm_provider_for_test(provider)
+        data = await prepare_data_for_german_word("einkaufen", WordHints("покупать"))
+        assert "Russian" not in provider.prompts[0]
+        assert data.translated_ru == "покупать"
+        assert self.translator.texts == []
+
+    async def test_invalid_response_falls_back_to_separate_requests(self):
+        provider = StubLlmProvider("Der Hund bellt laut im Garten.")
+        override_global_llm_provider_for_test(provider)
+        data = await prepare_data_for_german_word("Hund", WordHints(""))
+        assert data.sentence_example == "Der Hund bellt laut im Garten."
+        # The all-in-one prompt is retried before falling back to the single sentence example prompt
+        assert ["JSON" in prompt for prompt in provider.prompts] == [True, True, False]
+        assert data.sentence_example_translated_en == "translator"
+        assert len(self.translator.texts) == 3
+
+    async def test_english_word(self):
+        response = {
+            "sentence_example": "The weather is lovely today.",
+            "sentence_example_translated": "Сегодня прекрасная погода.",
+            "translated": "Погода",
+        }
+        override_global_llm_provider_for_test(StubLlmProvider(json.dumps(response, ensure_ascii=False)))
+        data = await prepare_data_for_english_word("weather", WordHints(""))
+        assert data.sentence_example_translated == "Сегодня прекрасная погода."
+        assert data.translated == "погода"
+        assert self.translator.texts == []
@@ -1,15 +1,18 @@
 import os
 import tempfile
 
+import pytest
+
 from app import tts, german_anki_generate
 from app.german_data_extract import GermanWordData, GermanNounProperties, PartOfSpeech
 
 
+@pytest.mark.asyncio(loop_scope="class")
 class TestWordDataExportToAnki:
     def setup_method(self):
         tts.init_tts_engine()
 
-    def test_export_singe_de_word(self):
+    async def test_export_singe_de_word(self):
         katze_word_data = GermanWordData(
             word="die Katze",
             pos_tag="NN",
@@ -31,5 +34,5 @@ class TestWordDataExportToAnki:
         with tempfile.NamedTemporaryFile(suffix=".apkg") as tmp_file:
             file_path = tmp_file.name
             assert os.path.getsize(file_path) == 0
-            german_anki_generate.export_results_to_anki_deck(word_data, file_path)
+            await german_anki_generate.export_results_to_anki_deck(word_data, file_path)
             assert os.path.getsize(file_path) > 0
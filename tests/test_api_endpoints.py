@@ -1,6 +1,12 @@
+import asyncio
 import json
 
-from app.main import app
+import pytest
+
+from app.llm_interact import override_global_llm_provider_for_test
+from app.main import app, common_generate_cards_file
+from app.word_hints import WordHints
+from stub_llm_provider import StubLlmProvider
 
 
 class TestApiEndpoints:
@@ -30,3 +36,45 @@ class TestApiEndpoints:
     def test_home_page_ok_response(self):
         res = self.app.get("/")
         assert res.status_code == 200
+
+    def test_ready_without_startup_checks(self):
+        res = self.app.get("/api/ready")
+        assert res.status_code == 200
+        assert res.get_json()["ready"]
+
+
+@pytest.mark.asyncio(loop_scope="class")
+class TestGenerateCardsFileFailure:
+    def setup_method(self):
+        override_global_llm_provider_for_test(StubLlmProvider(""))
+        self.finished_words: list[str] = []
+
+    async def prepare_data(self, word: str, hints: WordHints) -> str:
+        try:
+            if word == "fails":
+                raise ValueError(word)
+            if word == "times out":
+                raise TimeoutError(word)
+            await asyncio.sleep(60)
+            return word
+        finally:
+            self.finished_words.append(word)
+
+    async def export(self, results: list[str], filename: str) -> None:
+        pass
+
+    async def generate(self, words: list[str]):
+        with app.app_context():
+            return await common_generate_cards_file(
+                [{"word": word} for word in words], self.prepare_data, str.lower, self.export, ".apkg"
+            )
+
+    async def test_other_tasks_finished_after_failure(self):
+        with pytest.raises(ValueError):
+            await self.generate(["Hund", "fails", "Katze"])
+        assert sorted(self.finished_words) == ["Hund", "Katze", "fails"]
+
+    async def test_other_tasks_finished_after_timeout(self):
+        _, status = await self.generate(["Hund", "times out", "Katze"])
+        assert status == 504
+        assert sorted(self.finished_words) == ["Hund", "Katze", "times out"]
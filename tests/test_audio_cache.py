@@ -0,0 +1,78 @@
+import os
+import tempfile
+
+import pytest
+
+from app.audio_cache import AudioCache
+from app.tts import override_tts_engine_for_test, set_global_audio_cache, text_to_speech_into_file
+from stub_tts_engine import StubTextToSpeechEngine
+
+
+class TestAudioCache:
+    def setup_method(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.temp_dir.name, "audio")
+        self.out_path = os.path.join(self.temp_dir.name, "out.mp3")
+
+    def teardown_method(self) -> None:
+        self.temp_dir.cleanup()
+
+    def test_cached_clip_copied(self):
+        cache = AudioCache(self.cache_dir, max_bytes=100)
+        assert not cache.copy_to("katze.mp3", self.out_path)
+        cache.put("katze.mp3", b"miau")
+        assert cache.copy_to("katze.mp3", self.out_path)
+        with open(self.out_path, "rb") as f:
+            assert f.read() == b"miau"
+        assert cache.stats()["hits"] == 1
+
+    def test_least_recently_used_evicted_by_size(self):
+        cache = AudioCache(self.cache_dir, max_bytes=10)
+        cache.put("katze.mp3", b"1234")
+        cache.put("hund.mp3", b"1234")
+        assert cache.copy_to("katze.mp3", self.out_path)
+        cache.put("maus.mp3", b"1234")
+        assert cache.stats()["bytes"] == 8
+        assert not cache.copy_to("hund.mp3", os.path.join(self.temp_dir.name, "hund.mp3"))
+        assert sorted(os.listdir(self.cache_dir)) == ["katze.mp3", "maus.mp3"]
+
+    def test_removed_clip_is_miss(self):
+        cache = AudioCache(self.cache_dir, max_bytes=100)
+        cache.put("katze.mp3", b"miau")
+        os.remove(os.path.join(self.cache_dir, "katze.mp3"))
+        assert not cache.copy_to("katze.mp3", self.out_path)
+        assert cache.stats()["entries"] == 0
+        assert cache.stats()["bytes"] == 0
+        assert cache.stats()["misses"] == 1
+
+    def test_clips_kept_after_restart(self):
+        AudioCache(self.cache_dir, max_bytes=100).put("katze.mp3", b"miau")
+        cache = AudioCache(self.cache_dir, max_bytes=100)
+        assert cache.stats()["entries"] == 1
+        assert cache.copy_to("katze.mp3", self.out_path)
+
+
+@pytest.mark.asyncio(loop_scope="class")
+class TestCachedTextToSpeech:
+    def setup_method(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.engine = StubTextToSpeechEngine()
+        override_tts_engine_for_test(self.engine)
+        set_global_audio_cache(AudioCache(os.path.join(self.temp_dir.name, "audio"), max_bytes=1000))
+
+    def teardown_method(self) -> None:
+        set_global_audio_cache(None)
+        self.temp_dir.cleanup()
+
+    async def test_same_speech_synthesized_once_across_decks(self):
+        for deck in ["deck1", "deck2"]:
+            path = os.path.join(self.temp_dir.name, f"{deck}.mp3")
+            await text_to_speech_into_file("der Hund", path, lang="de")
+            with open(path, "rb") as f:
+                assert f.read() == b"der Hund"
+        assert self.engine.texts == ["der Hund"]
+
+    async def test_languages_cached_separately(self):
+        await text_to_speech_into_file("Hund", os.path.join(self.temp_dir.name, "de.mp3"), lang="de")
+        await text_to_speech_into_file("Hund", os.path.join(self.temp_dir.name, "en.mp3"), lang="en")
+        assert self.engine.texts == ["Hund", "Hund"]
@@ -0,0 +1,81 @@
+import os
+import tempfile
+
+import numpy as np
+import pytest
+
+from app.anki_common import AudioFiles, get_audio_file_name
+from app.audio_segments import trim_silence
+from app.tts import AudioEncoderSettings, audio_key, get_tts_metrics, override_tts_engine_for_test
+from stub_tts_engine import StubTextToSpeechEngine
+
+
+class OpusStubTextToSpeechEngine(StubTextToSpeechEngine):
+    encoder = AudioEncoderSettings(codec="opus", bitrate_kbps=24)
+
+
+class TestAudioEncoderSettings:
+    def test_mp3_mono_with_constant_bitrate(self):
+        command = AudioEncoderSettings(bitrate_kbps=48).command()
+        assert command[0] == "lame"
+        assert command[command.index("-m") + 1] == "m"
+        assert command[command.index("-b") + 1] == "48"
+        assert command[-2:] == ["-", "-"]
+
+    def test_mp3_variable_bitrate_from_raw_samples(self):
+        command = AudioEncoderSettings(bitrate_kbps=48, vbr=True).command(raw_sample_rate=22050)
+        assert command[command.index("--abr") + 1] == "48"
+        assert "-b" not in command
+        assert command[command.index("-s") + 1] == "22.05"
+
+    def test_opus(self):
+        settings = AudioEncoderSettings(codec="opus", bitrate_kbps=24)
+        command = settings.command(raw_sample_rate=16000)
+        assert command[0] == "opusenc"
+        assert "--hard-cbr" in command
+        assert command[command.index("--raw-rate") + 1] == "16000"
+        assert settings.file_extension == "ogg"
+
+    def test_unknown_codec(self):
+        with pytest.raises(ValueError):
+            AudioEncoderSettings(codec="flac")
+
+
+class TestTrimSilence:
+    def test_leading_and_trailing_silence_trimmed(self):
+        speech = np.full(500, 3000, dtype=np.int16)
+        samples = np.concatenate([np.zeros(300, dtype=np.int16), speech, np.zeros(400, dtype=np.int16)])
+        trimmed = trim_silence(samples, sample_rate=1000, keep_silence_seconds=0.05)
+        assert len(trimmed) == 600
+        assert np.array_equal(trimmed[50:550], speech)
+
+    def test_silence_only_kept(self):
+        samples = np.zeros(100, dtype=np.int16)
+        assert len(trim_silence(samples, sample_rate=1000)) == 100
+
+
+@pytest.mark.asyncio(loop_scope="class")
+class TestEncodedMediaFiles:
+    async def test_key_changes_with_encoder(self):
+        override_tts_engine_for_test(StubTextToSpeechEngine())
+        mp3_key = audio_key("Hund", "de")
+        override_tts_engine_for_test(OpusStubTextToSpeechEngine())
+        assert audio_key("Hund", "de") != mp3_key
+
+    async def test_opus_file_names(self):
+        override_tts_engine_for_test(OpusStubTextToSpeechEngine())
+        assert get_audio_file_name("Hund", "de").endswith(".ogg")
+
+    async def test_deck_media_bytes_reported(self):
+        override_tts_engine_for_test(StubTextToSpeechEngine())
+        deck_media_before = get_tts_metrics()["deck_media"]
+        with tempfile.TemporaryDirectory() as temp_dir:
+            audio_files = AudioFiles(temp_dir)
+            audio_files.add("der Hund", "de")
+            audio_files.add("die Katze", "de")
+            await audio_files.synthesize()
+            assert sum(os.path.getsize(path) for path in audio_files.media_files) == 17
+        deck_media = get_tts_metrics()["deck_media"]
+        assert deck_media["decks"] == deck_media_before["decks"] + 1
+        assert deck_media["files"] == deck_media_before["files"] + 2
+        assert deck_media["bytes"] == deck_media_before["bytes"] + 17
@@ -1,24 +1,33 @@
-import random
+from app.anki_common import get_audio_file_name
+from app.tts import override_tts_engine_for_test
+from stub_tts_engine import StubTextToSpeechEngine
 
-from app.anki_common import get_audio_file_name_for_phrase, get_audio_file_name_for_sentence
 
-
-class TestGetAudioFileNameForPhrase:
+class TestGetAudioFileName:
     def setup_method(self):
-        random.seed(42)
+        override_tts_engine_for_test(StubTextToSpeechEngine())
 
     def test_de_word(self):
-        res = get_audio_file_name_for_phrase("Katze", lang="de")
-        assert "anki_card_generator_de_Katze_phrase_NbrnTP.mp3" == res
+        res = get_audio_file_name("Katze", lang="de")
+        assert res.startswith("anki_card_generator_de_Katze_")
+        assert res.endswith(".mp3")
 
     def test_de_phrase(self):
-        res = get_audio_file_name_for_phrase("sich in Träumerei vertiefen", lang="de")
-        assert "anki_card_generator_de_sich_in_Träumerei_vertiefen_phrase_NbrnTP.mp3" == res
-
-    def test_de_sentence(self):
-        res = get_audio_file_name_for_sentence("Katze", lang="de")
-        assert "anki_card_generator_de_Katze_sentence_NbrnTP.mp3" == res
+        res = get_audio_file_name("sich in Träumerei vertiefen", lang="de")
+        assert res.startswith("anki_card_generator_de_sich_in_Träumerei_vertiefen_")
 
     def test_de_word_with_slash(self):
-        res = get_audio_file_name_for_sentence("sich/jdn. trösten", lang="de")
-        assert "anki_card_generator_de_sich_jdn__trösten_sentence_NbrnTP.mp3" == res
+        res = get_audio_file_name("sich/jdn. trösten", lang="de")
+        assert res.startswith("anki_card_generator_de_sich_jdn__trösten_")
+
+    def test_long_sentence_shortened(self):
+        res = get_audio_file_name("Die Katze schläft den ganzen Tag auf dem Sofa im Wohnzimmer.", lang="de")
+        assert res.startswith("anki_card_generator_de_Die_Katze_schläft_den_ganzen_Tag_auf_dem_")
+        assert len(res) < 100
+
+    def test_same_for_same_speech(self):
+        assert get_audio_file_name("Katze", lang="de") == get_audio_file_name("Katze", lang="de")
+
+    def test_different_for_different_speech(self):
+        assert get_audio_file_name("Katze", lang="de") != get_audio_file_name("Katze", lang="en")
+        assert get_audio_file_name("Katze", lang="de") != get_audio_file_name("Katze.", lang="de")
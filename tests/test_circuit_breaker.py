@@ -0,0 +1,204 @@
+import asyncio
+import os
+import tempfile
+
+import pytest
+
+from app.circuit_breaker import CircuitBreaker, CircuitOpenError, CircuitState
+from app.concurrency_limit import AdaptiveConcurrencyLimiter
+from app.disk_cache import DiskCache
+from app.llm_interact import override_global_llm_provider_for_test
+from app.translate import (
+    LlmTranslator,
+    TranslationCircuitBreakerSettings,
+    Translator,
+    get_translation_metrics,
+    override_global_translator_for_test,
+    set_fallback_translator,
+    set_global_translation_cache,
+    set_translation_circuit_breaker,
+    translate_text,
+)
+from app.translation_cache import TranslationCache
+from stub_llm_provider import StubLlmProvider
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.mark.asyncio(loop_scope="class")
+class TestCircuitBreaker:
+    def setup_method(self) -> None:
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker(
+            "Test", slow_call_seconds=2.0, window_size=4, min_calls=4, open_seconds=10.0, clock=self.clock
+        )
+
+    async def call(self, latency: float = 0.1, fail: bool = False) -> None:
+        async with self.breaker.guard():
+            self.clock.now += latency
+            if fail:
+                raise ConnectionError("Failed")
+
+    async def fail_calls(self, count: int) -> None:
+        for _ in range(count):
+            with pytest.raises(ConnectionError):
+                await self.call(fail=True)
+
+    async def test_closed_below_min_calls(self):
+        await self.fail_calls(3)
+        assert self.breaker.state == CircuitState.Closed
+
+    async def test_opens_on_failure_rate(self):
+        await self.call()
+        await self.call()
+        await self.fail_calls(2)
+        assert self.breaker.state == CircuitState.Open
+        with pytest.raises(CircuitOpenError):
+            await self.call()
+        assert self.breaker.stats()["rejected"] == 1
+
+    async def test_opens_on_slow_calls(self):
+        for _ in range(4):
+            await self.call(latency=3.0)
+        assert self.breaker.state == CircuitState.Open
+
+    async def test_slow_cancelled_call_counts(self):
+        for _ in range(4):
+            with pytest.raises(asyncio.CancelledError):
+                async with self.breaker.guard():
+                    self.clock.now += 3.0
+                    raise asyncio.CancelledError()
+        assert self.breaker.state == CircuitState.Open
+
+    async def test_half_open_probe_success_closes(self):
+        await self.fail_calls(4)
+        self.clock.now += 10.0
+        await self.call()
+        assert self.breaker.state == CircuitState.Closed
+
+    async def test_half_open_probe_failure_opens_again(self):
+        await self.fail_calls(4)
+        self.clock.now += 10.0
+        await self.fail_calls(1)
+        assert self.breaker.state == CircuitState.Open
+        assert self.breaker.stats()["opened"] == 2
+
+    async def test_only_probe_let_through_when_half_open(self):
+        await self.fail_calls(4)
+        self.clock.now += 10.0
+        probe_started = asyncio.Event()
+        finish_probe = asyncio.Event()
+
+        async def probe() -> None:
+            async with self.breaker.guard():
+                probe_started.set()
+                await finish_probe.wait()
+
+        probe_task = asyncio.create_task(probe())
+        await probe_started.wait()
+        assert self.breaker.state == CircuitState.HalfOpen
+        with pytest.raises(CircuitOpenError):
+            await self.call()
+        finish_probe.set()
+        await probe_task
+        assert self.breaker.state == CircuitState.Closed
+
+    async def test_rejected_calls_dont_lower_limit(self):
+        limiter = AdaptiveConcurrencyLimiter(min_limit=1, max_limit=8, initial_limit=8, clock=self.clock)
+        await self.fail_calls(4)
+        for _ in range(5):
+            with pytest.raises(CircuitOpenError):
+                async with self.breaker.guard(wait_for=limiter.acquire()):
+                    pass
+        assert limiter.limit == 8
+
+    async def test_waiting_for_slot_not_slow(self):
+        class SlowSlot:
+            async def __aenter__(slot) -> None:
+                self.clock.now += 3.0
+
+            async def __aexit__(slot, *args) -> None:
+                pass
+
+        for _ in range(4):
+            async with self.breaker.guard(wait_for=SlowSlot()):
+                self.clock.now += 0.1
+        assert self.breaker.state == CircuitState.Closed
+
+
+class FailingStubTranslator(Translator):
+    def __init__(self) -> None:
+        self.calls = 0
+
+    async def translate_text(self, text: str, src: str, dest: str) -> str:
+        self.calls += 1
+        raise ConnectionError("Throttled")
+
+
+class FallbackStubTranslator(Translator):
+    async def translate_text(self, text: str, src: str, dest: str) -> str:
+        return f"{text} (fallback)"
+
+
+class CountingFallbackStubTranslator(FallbackStubTranslator):
+    def __init__(self) -> None:
+        self.calls = 0
+
+    async def translate_text(self, text: str, src: str, dest: str) -> str:
+        self.calls += 1
+        return await super().translate_text(text, src, dest)
+
+
+@pytest.mark.asyncio(loop_scope="class")
+class TestTranslationFallback:
+    def setup_method(self) -> None:
+        set_translation_circuit_breaker(TranslationCircuitBreakerSettings(open_seconds=60.0))
+
+    def teardown_method(self) -> None:
+        set_fallback_translator(None)
+        set_translation_circuit_breaker(TranslationCircuitBreakerSettings())
+
+    async def test_failed_translations_go_to_fallback(self):
+        translator = FailingStubTranslator()
+        override_global_translator_for_test(translator)
+        set_fallback_translator(FallbackStubTranslator())
+        for i in range(10):
+            assert await translate_text(f"Katze {i}", src="de", dest="en") == f"Katze {i} (fallback)"
+        # Once the circuit is open, the translator is not called anymore
+        assert translator.calls == 5
+        assert get_translation_metrics()["circuit_breaker"]["state"] == "open"
+
+    async def test_fallback_translations_cached_while_open(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            set_global_translation_cache(TranslationCache(DiskCache(os.path.join(temp_dir, "tr.sqlite3"), 10)))
+            fallback_translator = CountingFallbackStubTranslator()
+            set_fallback_translator(fallback_translator)
+            override_global_translator_for_test(FailingStubTranslator())
+            try:
+                for i in range(5):
+                    await translate_text(f"Katze {i}", src="de", dest="en")
+                assert await translate_text("Katze 0", src="de", dest="en") == "Katze 0 (fallback)"
+                assert fallback_translator.calls == 5
+            finally:
+                set_global_translation_cache(None)
+
+    async def test_error_without_fallback(self):
+        override_global_translator_for_test(FailingStubTranslator())
+        for _ in range(5):
+            with pytest.raises(ConnectionError):
+                await translate_text("Katze", src="de", dest="en")
+        with pytest.raises(CircuitOpenError):
+            await translate_text("Katze", src="de", dest="en")
+
+    async def test_llm_translator(self):
+        llm_provider = StubLlmProvider(" the cat\n")
+        override_global_llm_provider_for_test(llm_provider)
+        assert await LlmTranslator().translate_text("die Katze", src="de", dest="en") == "the cat"
+        assert "German" in llm_provider.prompts[0]
+        assert "English" in llm_provider.prompts[0]
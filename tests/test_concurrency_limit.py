@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+
+from app.concurrency_limit import AdaptiveConcurrencyLimiter
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.mark.asyncio(loop_scope="class")
+class TestAdaptiveConcurrencyLimiter:
+    def setup_method(self) -> None:
+        self.clock = FakeClock()
+
+    def create_limiter(self, min_limit: int = 1, max_limit: int = 4, initial_limit: int = 1):
+        return AdaptiveConcurrencyLimiter(min_limit, max_limit, initial_limit=initial_limit, clock=self.clock)
+
+    async def call(self, limiter: AdaptiveConcurrencyLimiter, latency: float = 1.0) -> None:
+        async with limiter.acquire():
+            self.clock.now += latency
+
+    async def test_limit_increases_on_fast_successes(self):
+        limiter = self.create_limiter()
+        for _ in range(5):
+            await self.call(limiter)
+        assert limiter.limit > 1
+
+    async def test_limit_not_above_max(self):
+        limiter = self.create_limiter(max_limit=3)
+        for _ in range(100):
+            await self.call(limiter)
+        assert limiter.limit == 3
+
+    async def test_limit_decreases_on_error(self):
+        limiter = self.create_limiter(initial_limit=4)
+        with pytest.raises(RuntimeError):
+            async with limiter.acquire():
+                raise RuntimeError("LLM failed")
+        assert limiter.limit < 4
+        assert limiter.in_flight == 0
+
+    async def test_limit_decreases_on_slow_response(self):
+        limiter = self.create_limiter(initial_limit=4)
+        await self.call(limiter, latency=1.0)
+        before = limiter.limit
+        await self.call(limiter, latency=10.0)
+        assert limiter.limit < before
+
+    async def test_limit_not_below_min(self):
+        limiter = self.create_limiter(min_limit=2, initial_limit=2)
+        for _ in range(10):
+            with pytest.raises(RuntimeError):
+                async with limiter.acquire():
+                    raise RuntimeError("LLM failed")
+        assert limiter.limit == 2
+
+    async def test_calls_above_limit_are_queued(self):
+        limiter = self.create_limiter(initial_limit=1)
+        release = asyncio.Event()
+
+        async def blocked_call():
+            async with limiter.acquire():
+                await release.wait()
+
+        tasks = [asyncio.create_task(blocked_call()) for _ in range(3)]
+        await asyncio.sleep(0)
+        assert limiter.in_flight == 1
+        assert limiter.queue_depth == 2
+
+        release.set()
+        await asyncio.gather(*tasks)
+        assert limiter.in_flight == 0
+        assert limiter.queue_depth == 0
+
+    async def test_cancelled_waiter_releases_queue(self):
+        limiter = self.create_limiter(initial_limit=1)
+        release = asyncio.Event()
+
+        async def blocked_call():
+            async with limiter.acquire():
+                await release.wait()
+
+        running = asyncio.create_task(blocked_call())
+        waiting = asyncio.create_task(blocked_call())
+        await asyncio.sleep(0)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        assert limiter.queue_depth == 0
+
+        release.set()
+        await running
+        assert limiter.in_flight == 0
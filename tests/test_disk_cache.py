@@ -0,0 +1,75 @@
+import os
+import tempfile
+
+from app.disk_cache import DiskCache, make_cache_key
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        self.now += 1
+        return self.now
+
+
+class TestDiskCache:
+    def setup_method(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "cache.sqlite3")
+        self.clock = FakeClock()
+
+    def teardown_method(self):
+        self.temp_dir.cleanup()
+
+    def create_cache(self, max_entries: int = 10, ttl_seconds: float | None = None) -> DiskCache:
+        return DiskCache(self.path, max_entries=max_entries, ttl_seconds=ttl_seconds, clock=self.clock)
+
+    def test_get_absent(self):
+        cache = self.create_cache()
+        assert cache.get("key") is None
+        assert cache.misses == 1
+
+    def test_put_and_get(self):
+        cache = self.create_cache()
+        cache.put("key", "value")
+        assert cache.get("key") == "value"
+        assert cache.hits == 1
+
+    def test_persisted_between_instances(self):
+        cache = self.create_cache()
+        cache.put("key", "value")
+        cache.close()
+        assert self.create_cache().get("key") == "value"
+
+    def test_least_recently_used_evicted(self):
+        cache = self.create_cache(max_entries=2)
+        cache.put("a", "1")
+        cache.put("b", "2")
+        cache.get("a")
+        cache.put("c", "3")
+        assert len(cache) == 2
+        assert cache.get("b") is None
+        assert cache.get("a") == "1"
+        assert cache.get("c") == "3"
+
+    def test_expired_entry_absent(self):
+        cache = self.create_cache(ttl_seconds=10)
+        cache.put("key", "value")
+        self.clock.now += 100
+        assert cache.get("key") is None
+        assert len(cache) == 0
+
+    def test_clear(self):
+        cache = self.create_cache()
+        cache.put("key", "value")
+        cache.clear()
+        assert len(cache) == 0
+
+
+class TestMakeCacheKey:
+    def test_same_parts_same_key(self):
+        assert make_cache_key("a", {"x": 1, "y": 2}) == make_cache_key("a", {"y": 2, "x": 1})
+
+    def test_different_parts_different_keys(self):
+        assert make_cache_key("a", "b") != make_cache_key("ab")
@@ -0,0 +1,115 @@
+import json
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+import httpx
+import pytest
+
+from app.translate import GoogleTranslatorImpl, TranslatorSettings
+
+
+class _FakeGoogleTranslateServer(ThreadingHTTPServer):
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), _FakeGoogleTranslateHandler)
+        self.connections = 0
+        self.queries: list[str] = []
+        # Reorders the translated lines, like a translation which merges or splits sentences
+        self.reverse_lines = False
+
+
+class _FakeGoogleTranslateHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: _FakeGoogleTranslateServer
+
+    def setup(self) -> None:
+        super().setup()
+        self.server.connections += 1
+
+    def do_GET(self) -> None:
+        query = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)
+        text = query["q"][0]
+        self.server.queries.append(text)
+        translation = text.upper()
+        if self.server.reverse_lines:
+            translation = "\n".join(reversed(translation.split("\n")))
+        data = json.dumps([[[translation, text, None, None, 1]], None, query["sl"][0]]).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args: Any) -> None:
+        pass
+
+
+class _RedirectingTransport(httpx.AsyncHTTPTransport):
+    def __init__(self, port: int, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.port = port
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        request.url = request.url.copy_with(scheme="http", host="127.0.0.1", port=self.port)
+        return await super().handle_async_request(request)
+
+
+class _LocalGoogleTranslator(GoogleTranslatorImpl):
+    def __init__(self, port: int) -> None:
+        super().__init__(TranslatorSettings(max_connections=2))
+        self.port = port
+
+    def _create_http_transport(self) -> httpx.AsyncBaseTransport:
+        return _RedirectingTransport(self.port, limits=self.settings.http_limits())
+
+
+@pytest.fixture
+def fake_server():
+    server = _FakeGoogleTranslateServer()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.asyncio
+class TestGoogleTranslatorSession:
+    async def test_connections_reused_between_translations(self, fake_server):
+        translator = _LocalGoogleTranslator(fake_server.server_address[1])
+        try:
+            for _ in range(5):
+                assert await translator.translate_text("Katze", src="de", dest="en") == "KATZE"
+        finally:
+            await translator.aclose()
+        assert fake_server.connections == 1
+
+    async def test_new_session_after_close(self, fake_server):
+        translator = _LocalGoogleTranslator(fake_server.server_address[1])
+        await translator.translate_text("Katze", src="de", dest="en")
+        await translator.aclose()
+        try:
+            assert await translator.translate_text("Hund", src="de", dest="en") == "HUND"
+        finally:
+            await translator.aclose()
+        assert fake_server.connections == 2
+
+    async def test_many_texts_translated_in_one_request(self, fake_server):
+        translator = _LocalGoogleTranslator(fake_server.server_address[1])
+        try:
+            res = await translator.translate_many(["Katze", "Hund", "Maus"], src="de", dest="en")
+        finally:
+            await translator.aclose()
+        assert res == ["KATZE", "HUND", "MAUS"]
+        assert fake_server.queries == ["1. Katze\n2. Hund\n3. Maus"]
+
+    async def test_misaligned_lines_translated_separately(self, fake_server):
+        fake_server.reverse_lines = True
+        translator = _LocalGoogleTranslator(fake_server.server_address[1])
+        try:
+            res = await translator.translate_many(["Katze", "Hund"], src="de", dest="en")
+        finally:
+            await translator.aclose()
+        assert res == ["KATZE", "HUND"]
+        assert fake_server.queries[0] == "1. Katze\n2. Hund"
+        assert sorted(fake_server.queries[1:]) == ["Hund", "Katze"]
@@ -0,0 +1,133 @@
+import asyncio
+
+import pytest
+
+from app.latency import HedgedCaller, LatencyBudgets, LatencyTracker, set_latency_budgets, with_latency_budget
+from app.llm_interact import (
+    LlmProvider,
+    ask_llm,
+    get_llm_hedged_caller,
+    override_global_llm_provider_for_test,
+    set_llm_concurrency_bounds,
+)
+
+
+class TestLatencyTracker:
+    def test_no_percentile_without_enough_samples(self):
+        tracker = LatencyTracker(min_samples=3)
+        tracker.record(1.0)
+        assert tracker.percentile(0.5) is None
+
+    def test_percentile(self):
+        tracker = LatencyTracker(min_samples=1)
+        for latency in range(1, 101):
+            tracker.record(float(latency))
+        assert tracker.percentile(0.95) == 95.0
+        assert tracker.percentile(0.5) == 50.0
+
+
+@pytest.mark.asyncio(loop_scope="class")
+class TestHedgedCaller:
+    def setup_method(self) -> None:
+        tracker = LatencyTracker(min_samples=1)
+        tracker.record(0.01)
+        self.caller = HedgedCaller("test", min_hedge_delay_seconds=0.02, tracker=tracker)
+
+    async def test_fast_call_not_hedged(self):
+        async def fast():
+            return "fast"
+
+        assert await self.caller.call(fast) == "fast"
+        assert self.caller.stats.hedged == 0
+
+    async def test_slow_call_hedged_and_cancelled(self):
+        calls = []
+        slow_call_cancelled = asyncio.Event()
+
+        async def first_slow_then_fast():
+            calls.append(len(calls))
+            if len(calls) == 1:
+                try:
+                    await asyncio.sleep(10)
+                except asyncio.CancelledError:
+                    slow_call_cancelled.set()
+                    raise
+                return "slow"
+            return "hedge"
+
+        assert await self.caller.call(first_slow_then_fast) == "hedge"
+        assert self.caller.stats.hedged == 1
+        assert self.caller.stats.hedge_won == 1
+        await asyncio.wait_for(slow_call_cancelled.wait(), 1)
+
+    async def test_original_used_if_hedge_fails(self):
+        calls = []
+
+        async def original_slow_hedge_fails():
+            calls.append(len(calls))
+            if len(calls) == 1:
+                await asyncio.sleep(0.1)
+                return "original"
+            raise RuntimeError("hedge failed")
+
+        assert await self.caller.call(original_slow_hedge_fails) == "original"
+        assert self.caller.stats.hedged == 1
+        assert self.caller.stats.hedge_won == 0
+
+    async def test_disabled(self):
+        self.caller.enabled = False
+        calls = []
+
+        async def slow():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "slow"
+
+        assert await self.caller.call(slow) == "slow"
+        assert len(calls) == 1
+
+
+@pytest.mark.asyncio(loop_scope="class")
+class TestWithLatencyBudget:
+    async def test_over_budget(self):
+        with pytest.raises(TimeoutError):
+            await with_latency_budget(asyncio.sleep(10), 0.01, description="test")
+
+    async def test_no_budget(self):
+        assert await with_latency_budget(asyncio.sleep(0, result="ok"), None, description="test") == "ok"
+
+
+class SlowStubLlmProvider(LlmProvider):
+    def __init__(self, latency_seconds: float) -> None:
+        self.latency_seconds = latency_seconds
+
+    async def ask_llm(self, prompt: str) -> str:
+        await asyncio.sleep(self.latency_seconds)
+        return prompt
+
+    def describe_model(self) -> dict:
+        return {"model": f"slow-{self.latency_seconds}"}
+
+
+@pytest.mark.asyncio(loop_scope="class")
+class TestLlmRequestLatency:
+    def teardown_method(self) -> None:
+        set_latency_budgets(LatencyBudgets())
+        set_llm_concurrency_bounds(1, 8)
+
+    async def test_time_waiting_for_slot_not_hedged(self):
+        llm_provider = SlowStubLlmProvider(0.08)
+        override_global_llm_provider_for_test(llm_provider)
+        set_llm_concurrency_bounds(1, 1)
+        hedged_caller = get_llm_hedged_caller(llm_provider)
+        for _ in range(hedged_caller.tracker.min_samples):
+            hedged_caller.tracker.record(0.01)
+        # The second request waits for the first one, so it takes longer than the hedging delay of 0.1s
+        await asyncio.gather(ask_llm("first", bypass_cache=True), ask_llm("second", bypass_cache=True))
+        assert hedged_caller.stats.hedged == 0
+
+    async def test_over_budget_is_timeout(self):
+        override_global_llm_provider_for_test(SlowStubLlmProvider(10))
+        set_latency_budgets(LatencyBudgets(llm_seconds=0.01))
+        with pytest.raises(TimeoutError):
+            await ask_llm("slow", bypass_cache=True)
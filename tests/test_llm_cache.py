@@ -0,0 +1,53 @@
+import os
+import tempfile
+
+import pytest
+
+from app.disk_cache import DiskCache
+from app.llm_interact import ask_llm, override_global_llm_provider_for_test, set_global_llm_cache
+from app.utils import check
+from stub_llm_provider import StubLlmProvider
+
+
+def check_not_empty(response: str) -> None:
+    check(response != "", "Empty response")
+
+
+@pytest.mark.asyncio(loop_scope="class")
+class TestAskLlmCache:
+    def setup_method(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache = DiskCache(os.path.join(self.temp_dir.name, "llm.sqlite3"), max_entries=10)
+        set_global_llm_cache(self.cache)
+
+    def teardown_method(self) -> None:
+        set_global_llm_cache(None)
+        self.cache.close()
+        self.temp_dir.cleanup()
+
+    async def test_second_request_served_from_cache(self):
+        provider = StubLlmProvider("Die Katze schläft.")
+        override_global_llm_provider_for_test(provider)
+        assert await ask_llm("prompt") == "Die Katze schläft."
+        assert await ask_llm("prompt") == "Die Katze schläft."
+        assert provider.prompts == ["prompt"]
+
+    async def test_different_prompts_not_mixed(self):
+        provider = StubLlmProvider("response")
+        override_global_llm_provider_for_test(provider)
+        await ask_llm("prompt 1")
+        await ask_llm("prompt 2")
+        assert provider.prompts == ["prompt 1", "prompt 2"]
+
+    async def test_bypass_cache(self):
+        provider = StubLlmProvider("response")
+        override_global_llm_provider_for_test(provider)
+        await ask_llm("prompt")
+        await ask_llm("prompt", bypass_cache=True)
+        assert provider.prompts == ["prompt", "prompt"]
+
+    async def test_invalid_response_not_cached(self):
+        override_global_llm_provider_for_test(StubLlmProvider(""))
+        with pytest.raises(ValueError):
+            await ask_llm("prompt", validate=check_not_empty)
+        assert len(self.cache) == 0
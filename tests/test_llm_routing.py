@@ -0,0 +1,115 @@
+import os
+import tempfile
+
+import pytest
+
+from app.common_data_extract import check_sentence_example, generate_sentence_example_with_llm
+from app.llm_interact import (
+    InvalidLlmResponseError,
+    ask_llm,
+    override_global_llm_provider_for_test,
+    set_global_llm_cache,
+    set_llm_max_attempts,
+)
+from app.disk_cache import DiskCache
+from stub_llm_provider import StubLlmProvider
+
+
+def check_contains_katze(response: str) -> None:
+    if "Katze" not in response:
+        raise ValueError(f"No Katze in {response}")
+
+
+@pytest.mark.asyncio(loop_scope="class")
+class TestTieredModelRouting:
+    def teardown_method(self) -> None:
+        set_llm_max_attempts(2)
+
+    async def test_valid_response_of_small_model_used(self):
+        small, big = StubLlmProvider("Die Katze schläft."), StubLlmProvider("Die große Katze schläft.")
+        override_global_llm_provider_for_test(small, fallback_providers=[big])
+        assert await ask_llm("routing prompt 1", validate=check_contains_katze) == "Die Katze schläft."
+        assert big.prompts == []
+
+    async def test_invalid_response_asked_from_bigger_model(self):
+        small, big = StubLlmProvider("Der Hund bellt."), StubLlmProvider("Die Katze schläft.")
+        override_global_llm_provider_for_test(small, fallback_providers=[big])
+        assert await ask_llm("routing prompt 2", validate=check_contains_katze) == "Die Katze schläft."
+        assert len(small.prompts) == 1
+        assert len(big.prompts) == 1
+
+    async def test_last_model_retried_up_to_max_attempts(self):
+        set_llm_max_attempts(3)
+        small, big = StubLlmProvider("Der Hund bellt."), StubLlmProvider("Die Maus piepst.")
+        override_global_llm_provider_for_test(small, fallback_providers=[big])
+        with pytest.raises(InvalidLlmResponseError) as e:
+            await ask_llm("routing prompt 3", validate=check_contains_katze)
+        assert e.value.response == "Die Maus piepst."
+        assert len(small.prompts) == 1
+        assert len(big.prompts) == 2
+
+    async def test_not_retried_without_validator(self):
+        provider = StubLlmProvider("Der Hund bellt.")
+        override_global_llm_provider_for_test(provider)
+        await ask_llm("routing prompt 4")
+        assert len(provider.prompts) == 1
+
+    async def test_sentence_example_which_failed_validation_used_after_all_attempts(self):
+        provider = StubLlmProvider("Die **Katze** schläft.")
+        override_global_llm_provider_for_test(provider)
+        sentence = await generate_sentence_example_with_llm("Katze", language="German", is_phrase=False)
+        assert sentence == "Die **Katze** schläft."
+        assert len(provider.prompts) == 2
+
+    async def test_accepted_invalid_response_not_cached(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            set_global_llm_cache(DiskCache(os.path.join(temp_dir, "llm.sqlite3"), max_entries=10))
+            try:
+                small, big = StubLlmProvider("Die **Katze** schläft."), StubLlmProvider("Die **Katze** döst.")
+                override_global_llm_provider_for_test(small, fallback_providers=[big])
+                for _ in range(2):
+                    sentence = await generate_sentence_example_with_llm("Katze", language="German", is_phrase=False)
+                    assert sentence == "Die **Katze** döst."
+                # The second time the models are asked again, maybe this time they answer well
+                assert len(small.prompts) == 2
+                assert len(big.prompts) == 2
+            finally:
+                set_global_llm_cache(None)
+
+    async def test_too_short_sentence_example_still_fails(self):
+        override_global_llm_provider_for_test(StubLlmProvider("Ja"))
+        with pytest.raises(ValueError):
+            await generate_sentence_example_with_llm("Katze", language="German", is_phrase=False)
+
+
+class TestCheckSentenceExample:
+    def test_valid(self):
+        check_sentence_example("die Katze", "Die Katze schläft auf dem Sofa.")
+
+    def test_inflected_verb_with_umlaut(self):
+        check_sentence_example("fahren", "Er fährt jeden Tag mit dem Fahrrad.")
+
+    def test_reflexive_verb(self):
+        check_sentence_example("sich freuen", "Ich freue mich auf den Urlaub.")
+
+    def test_separable_verb_not_asked_again(self):
+        check_sentence_example("aufstehen", "Er steht jeden Morgen um sechs Uhr auf.")
+
+    def test_irregular_form_not_asked_again(self):
+        check_sentence_example("go", "Yesterday we went to the cinema.")
+
+    def test_several_sentences(self):
+        with pytest.raises(ValueError):
+            check_sentence_example("Katze", "Die Katze schläft. Der Hund bellt.")
+
+    def test_markdown(self):
+        with pytest.raises(ValueError):
+            check_sentence_example("Katze", "Die **Katze** schläft.")
+
+    def test_several_lines(self):
+        with pytest.raises(ValueError):
+            check_sentence_example("Katze", "Die Katze schläft.\nDer Hund bellt.")
+
+    def test_too_short(self):
+        with pytest.raises(ValueError):
+            check_sentence_example("Katze", "Katze")
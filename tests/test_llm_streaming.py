@@ -0,0 +1,101 @@
+from typing import AsyncIterator
+
+import pytest
+
+from app.common_data_extract import generate_sentence_example_with_llm
+from app.llm_interact import LlmProvider, ask_llm, find_first_sentence_end, override_global_llm_provider_for_test
+
+
+class StreamingStubLlmProvider(LlmProvider):
+    def __init__(self, chunks: list[str]):
+        self.chunks = chunks
+        self.yielded_chunks = 0
+        self.closed = False
+
+    async def ask_llm(self, prompt: str) -> str:
+        return "".join(self.chunks)
+
+    async def ask_llm_stream(self, prompt: str, max_tokens: int) -> AsyncIterator[str]:
+        try:
+            for chunk in self.chunks:
+                self.yielded_chunks += 1
+                yield chunk
+        finally:
+            self.closed = True
+
+
+@pytest.mark.asyncio(loop_scope="class")
+class TestAskLlmStopAtSentenceEnd:
+    async def test_generation_stopped_after_first_sentence(self):
+        provider = StreamingStubLlmProvider(["Die Katze ", "schläft. ", "Der Hund ", "bellt. ", "Und dann"])
+        override_global_llm_provider_for_test(provider)
+        assert await ask_llm("stream prompt 1", stop_at_sentence_end=True) == "Die Katze schläft."
+        assert provider.yielded_chunks == 3
+        assert provider.closed
+
+    async def test_whole_response_if_single_sentence(self):
+        provider = StreamingStubLlmProvider(["Die Katze ", "schläft."])
+        override_global_llm_provider_for_test(provider)
+        assert await ask_llm("stream prompt 2", stop_at_sentence_end=True) == "Die Katze schläft."
+
+    async def test_not_stopped_at_unaccepted_sentence_end(self):
+        provider = StreamingStubLlmProvider(["Er heißt Ing. ", "Weber und ", "mag Katzen. ", "Der Hund bellt."])
+        override_global_llm_provider_for_test(provider)
+        response = await ask_llm(
+            "stream prompt 4", stop_at_sentence_end=True, accept_sentence_end=lambda sentence: "Katzen" in sentence
+        )
+        # The generation isn't stopped at a sentence end after a false one, the whole response is validated
+        assert response == "Er heißt Ing. Weber und mag Katzen. Der Hund bellt."
+
+    async def test_stopped_at_accepted_sentence_end(self):
+        provider = StreamingStubLlmProvider(["Die Katze ", "schläft. ", "Der Hund ", "bellt."])
+        override_global_llm_provider_for_test(provider)
+        response = await ask_llm(
+            "stream prompt 5", stop_at_sentence_end=True, accept_sentence_end=lambda sentence: "Katze" in sentence
+        )
+        assert response == "Die Katze schläft."
+        assert provider.closed
+
+    async def test_sentence_example_not_cut_at_unknown_abbreviation(self):
+        provider = StreamingStubLlmProvider(["Dipl.-Ing. ", "Weber repariert ", "das Auto."])
+        override_global_llm_provider_for_test(provider)
+        sentence_example = await generate_sentence_example_with_llm("das Auto", "German", is_phrase=False)
+        assert sentence_example == "Dipl.-Ing. Weber repariert das Auto."
+
+    async def test_not_stopped_by_default(self):
+        provider = StreamingStubLlmProvider(["Die Katze schläft. ", "Der Hund bellt."])
+        override_global_llm_provider_for_test(provider)
+        assert await ask_llm("stream prompt 3") == "Die Katze schläft. Der Hund bellt."
+
+
+class TestFindFirstSentenceEnd:
+    def test_two_sentences(self):
+        assert find_first_sentence_end("Die Katze schläft. Der Hund") == len("Die Katze schläft.")
+
+    def test_incomplete_second_sentence_not_started(self):
+        assert find_first_sentence_end("Die Katze schläft.") is None
+
+    def test_question(self):
+        assert find_first_sentence_end("Wo ist sie? Hier") == len("Wo ist sie?")
+
+    def test_abbreviation_skipped(self):
+        text = "Ich mag z. B. Hunde. Und"
+        assert find_first_sentence_end(text) == len("Ich mag z. B. Hunde.")
+
+    @pytest.mark.parametrize(
+        "text",
+        [
+            "Mrs. Brown feeds her cat every morning.",
+            "Prof. Müller liest heute.",
+            "Er kauft Brot, Milch usw. Morgen kommt sein Bruder.",
+            "Er wohnt in der Hauptstr. Nummer fünf.",
+        ],
+    )
+    def test_longer_abbreviation_skipped(self, text):
+        assert find_first_sentence_end(text) is None
+
+    def test_ordinal_number_skipped(self):
+        assert find_first_sentence_end("Er kommt am 3. Mai") is None
+
+    def test_closing_quote_included(self):
+        assert find_first_sentence_end('Er sagt: "Hallo." Dann') == len('Er sagt: "Hallo."')
@@ -0,0 +1,60 @@
+import pytest
+
+from app.llm_interact import (
+    LlmProviderSettings,
+    OllamaLlmProvider,
+    check_llm_provider_and_warm_up,
+    override_global_llm_provider_for_test,
+)
+from fake_ollama_server import FakeOllamaServer
+
+
+@pytest.fixture
+def cold_server():
+    server = FakeOllamaServer("answer", load_duration_ns=3_000_000_000).start()
+    yield server
+    server.stop()
+
+
+@pytest.mark.asyncio
+class TestOllamaWarmUp:
+    async def test_warm_up_loads_model_with_keep_alive(self, cold_server):
+        provider = OllamaLlmProvider(LlmProviderSettings(ollama_hosts=[cold_server.host], ollama_keep_alive="30m"))
+        try:
+            await provider.warm_up()
+        finally:
+            await provider.aclose()
+        [body] = cold_server.request_bodies
+        assert body["model"] == OllamaLlmProvider.OLLAMA_MODEL
+        assert body["keep_alive"] == "30m"
+        assert "prompt" not in body
+
+    async def test_startup_check_warms_up_after_checking(self, cold_server):
+        provider = OllamaLlmProvider(LlmProviderSettings(ollama_hosts=[cold_server.host]))
+        override_global_llm_provider_for_test(provider)
+        await check_llm_provider_and_warm_up()
+        # The check doesn't close the client under the warm-up
+        assert len(cold_server.request_bodies) == 1
+        assert provider.metrics()["model_loads"]["cold_loads"] == 1
+
+    async def test_keep_alive_sent_with_requests(self, cold_server):
+        provider = OllamaLlmProvider(LlmProviderSettings(ollama_hosts=[cold_server.host], ollama_keep_alive=-1))
+        try:
+            assert await provider.ask_llm("prompt") == "answer"
+        finally:
+            await provider.aclose()
+        assert cold_server.request_bodies[0]["keep_alive"] == -1
+
+    async def test_cold_loads_recorded(self, cold_server):
+        provider = OllamaLlmProvider(LlmProviderSettings(ollama_hosts=[cold_server.host]))
+        try:
+            await provider.ask_llm("prompt")
+            cold_server.load_duration_ns = 1_000_000
+            await provider.ask_llm("prompt")
+        finally:
+            await provider.aclose()
+        assert provider.metrics()["model_loads"] == {
+            "cold_loads": 1,
+            "total_load_seconds": 3.0,
+            "last_load_seconds": 3.0,
+        }
@@ -0,0 +1,124 @@
+import os
+import tempfile
+
+import pytest
+
+from app.disk_cache import DiskCache
+from app.german_data_extract import PartOfSpeech, translate_de_to_en, translate_de_to_ru
+from app.offline_dictionary import DictionaryEntry, OfflineDictionary, main, write_offline_dictionary
+from app.translate import (
+    get_translation_metrics,
+    override_global_translator_for_test,
+    set_global_offline_dictionary,
+)
+from app.translation_cache import TranslationCache
+from app.word_hints import WordHints
+from stub_translator import RecordingStubTranslator
+
+
+class TestOfflineDictionary:
+    def setup_method(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "dictionary.tsv")
+        write_offline_dictionary(
+            self.path,
+            [
+                DictionaryEntry("de", "en", "", "die Katze", "the cat"),
+                DictionaryEntry("de", "en", "verb", "essen", "eat"),
+                DictionaryEntry("de", "en", "", "essen", "food"),
+                DictionaryEntry("de", "ru", "", "essen", "есть"),
+            ],
+        )
+
+    def teardown_method(self) -> None:
+        self.temp_dir.cleanup()
+
+    def test_lookup_by_part_of_speech(self):
+        dictionary = OfflineDictionary(self.path)
+        assert dictionary.lookup("essen", "de", "en", "verb") == "eat"
+        assert dictionary.lookup("essen", "de", "en", "other") == "food"
+        assert dictionary.lookup("essen", "de", "en") == "food"
+
+    def test_lookup_miss(self):
+        dictionary = OfflineDictionary(self.path)
+        assert dictionary.lookup("Hund", "de", "en") is None
+        assert dictionary.lookup("essen", "en", "ru") is None
+        assert dictionary.stats()["hit_rate"] == 0.0
+
+    def test_unsorted_file_sorted_on_load(self):
+        with open(self.path, encoding="utf-8") as f:
+            lines = f.readlines()
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.writelines(reversed(lines))
+        assert OfflineDictionary(self.path).lookup("die Katze", "de", "en") == "the cat"
+
+    def test_malformed_line(self):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("de en  Hund dog\n")
+        with pytest.raises(ValueError, match="line 5"):
+            OfflineDictionary(self.path)
+
+
+@pytest.mark.asyncio(loop_scope="class")
+class TestOfflineDictionaryTranslation:
+    def setup_method(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        path = os.path.join(self.temp_dir.name, "dictionary.tsv")
+        write_offline_dictionary(
+            path,
+            [
+                DictionaryEntry("de", "en", "", "die Katze", "the cat"),
+                DictionaryEntry("de", "en", "verb", "essen", "eat"),
+                DictionaryEntry("de", "ru", "", "die Katze", "кошка"),
+            ],
+        )
+        set_global_offline_dictionary(OfflineDictionary(path))
+        self.translator = RecordingStubTranslator("online")
+        override_global_translator_for_test(self.translator)
+
+    def teardown_method(self) -> None:
+        set_global_offline_dictionary(None)
+        self.temp_dir.cleanup()
+
+    async def test_words_translated_offline_and_post_processed(self):
+        assert await translate_de_to_en("die Katze", PartOfSpeech.Noun) == "cat"
+        assert await translate_de_to_en("essen", PartOfSpeech.Verb) == "to eat"
+        assert await translate_de_to_ru("die Katze", WordHints(translated_ru="")) == "кошка"
+        assert self.translator.texts == []
+        assert get_translation_metrics()["offline_dictionary"]["hit_rate"] == 1.0
+
+    async def test_missing_words_and_phrases_translated_online(self):
+        assert await translate_de_to_en("essen", PartOfSpeech.Other) == "online"
+        assert await translate_de_to_en("die Katze essen", PartOfSpeech.Other) == "online"
+        assert self.translator.texts == ["essen", "die Katze essen"]
+        assert get_translation_metrics()["offline_dictionary"]["lookups"] == 1
+
+
+class TestBuildOfflineDictionary:
+    def setup_method(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache_path = os.path.join(self.temp_dir.name, "tr.sqlite3")
+        self.output = os.path.join(self.temp_dir.name, "dictionary.tsv")
+        cache = TranslationCache(DiskCache(self.cache_path, max_entries=10))
+        cache.put("die Katze", "de", "en", "GoogleTranslatorImpl", "the cat")
+        cache.put("Hund", "de", "ru", "GoogleTranslatorImpl", "собака")
+        cache.put("Die Katze schläft.", "de", "en", "GoogleTranslatorImpl", "The cat is sleeping.")
+        cache.put("Katze", "de", "sv", "GoogleTranslatorImpl", "katt")
+        cache.put("Maus", "de", "en", "LlmTranslator", "mouse")
+        cache.close()
+
+    def teardown_method(self) -> None:
+        self.temp_dir.cleanup()
+
+    def test_single_words_taken_from_cache(self, capsys):
+        main(["--translation-cache-path", self.cache_path, self.output])
+        assert "Wrote 2 entries" in capsys.readouterr().out
+        dictionary = OfflineDictionary(self.output)
+        assert dictionary.lookup("die Katze", "de", "en", "noun") == "the cat"
+        assert dictionary.lookup("Hund", "de", "ru") == "собака"
+
+    def test_merged_entries_win(self):
+        merge_path = os.path.join(self.temp_dir.name, "curated.tsv")
+        write_offline_dictionary(merge_path, [DictionaryEntry("de", "ru", "", "Hund", "пёс")])
+        main(["--translation-cache-path", self.cache_path, "--merge", merge_path, self.output])
+        assert OfflineDictionary(self.output).lookup("Hund", "de", "ru") == "пёс"
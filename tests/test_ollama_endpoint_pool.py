@@ -0,0 +1,149 @@
+import random
+
+import pytest
+
+from app.endpoint_pool import EndpointPool
+from app.llm_interact import (
+    LlmProviderSettings,
+    OllamaLlmProvider,
+    get_llm_concurrency_limiter,
+    set_llm_concurrency_bounds,
+)
+from fake_ollama_server import FakeOllamaServer
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestEndpointPool:
+    def test_less_loaded_endpoint_chosen(self):
+        pool = EndpointPool(["a", "b"], rng=random.Random(0))
+        pool.endpoints[0].outstanding = 5
+        assert all(pool.choose().address == "b" for _ in range(10))
+
+    def test_lower_latency_chosen_when_load_equal(self):
+        pool = EndpointPool(["a", "b"], rng=random.Random(0))
+        pool.endpoints[0].latency_ewma_seconds = 2.0
+        pool.endpoints[1].latency_ewma_seconds = 0.5
+        assert pool.choose().address == "b"
+
+    def test_excluded_endpoint_not_chosen(self):
+        pool = EndpointPool(["a", "b", "c"], rng=random.Random(0))
+        assert all(pool.choose(exclude={"a", "b"}).address == "c" for _ in range(10))
+
+    @pytest.mark.asyncio
+    async def test_endpoint_unhealthy_after_failures_and_recovers_after_cooldown(self):
+        clock = FakeClock()
+        pool = EndpointPool(["a", "b"], failure_threshold=2, unhealthy_cooldown_seconds=10, clock=clock)
+        for _ in range(2):
+            with pytest.raises(ConnectionError):
+                async with pool.use(exclude={"b"}):
+                    raise ConnectionError()
+        assert [e.address for e in pool.healthy_endpoints()] == ["b"]
+        assert all(pool.choose().address == "b" for _ in range(10))
+
+        clock.now = 10
+        assert len(pool.healthy_endpoints()) == 2
+
+    @pytest.mark.asyncio
+    async def test_success_resets_consecutive_failures(self):
+        pool = EndpointPool(["a"], failure_threshold=2)
+        with pytest.raises(ConnectionError):
+            async with pool.use():
+                raise ConnectionError()
+        async with pool.use():
+            pass
+        with pytest.raises(ConnectionError):
+            async with pool.use():
+                raise ConnectionError()
+        assert pool.stats()[0]["healthy"]
+        assert pool.stats()[0]["requests"] == 3
+        assert pool.stats()[0]["failures"] == 2
+
+
+@pytest.fixture
+def fake_servers():
+    servers: list[FakeOllamaServer] = []
+
+    def start(answer: str, status: int = 200) -> FakeOllamaServer:
+        server = FakeOllamaServer(answer, status).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
+
+
+def _closed_port_host() -> str:
+    server = FakeOllamaServer("")
+    host = server.host
+    server.server_close()
+    return host
+
+
+@pytest.mark.asyncio
+class TestOllamaLlmProviderWithSeveralServers:
+    async def test_load_spread_between_servers(self, fake_servers):
+        first, second = fake_servers("first"), fake_servers("second")
+        provider = OllamaLlmProvider(LlmProviderSettings(ollama_hosts=[first.host, second.host]))
+        try:
+            answers = [await provider.ask_llm("prompt") for _ in range(20)]
+        finally:
+            await provider.aclose()
+        assert set(answers) == {"first", "second"}
+        assert first.requests + second.requests == 20
+
+    async def test_failed_over_from_server_errors(self, fake_servers):
+        failing, working = fake_servers("", status=500), fake_servers("working")
+        provider = OllamaLlmProvider(LlmProviderSettings(ollama_hosts=[failing.host, working.host]))
+        try:
+            answers = [await provider.ask_llm("prompt") for _ in range(10)]
+        finally:
+            await provider.aclose()
+        assert answers == ["working"] * 10
+        # Removed from the rotation after the failure threshold
+        assert failing.requests == provider.endpoint_pool.failure_threshold
+        assert [e["healthy"] for e in provider.metrics()["endpoints"]] == [False, True]
+
+    async def test_failed_over_from_closed_server(self, fake_servers):
+        working = fake_servers("working")
+        provider = OllamaLlmProvider(LlmProviderSettings(ollama_hosts=[_closed_port_host(), working.host]))
+        try:
+            answers = [await provider.ask_llm("prompt") for _ in range(5)]
+        finally:
+            await provider.aclose()
+        assert answers == ["working"] * 5
+
+    async def test_error_if_all_servers_fail(self, fake_servers):
+        provider = OllamaLlmProvider(LlmProviderSettings(ollama_hosts=[_closed_port_host(), _closed_port_host()]))
+        try:
+            with pytest.raises(ConnectionError):
+                await provider.ask_llm("prompt")
+        finally:
+            await provider.aclose()
+
+    async def test_concurrency_limit_scaled_by_server_count(self, fake_servers):
+        first, second = fake_servers("first"), fake_servers("second")
+        provider = OllamaLlmProvider(LlmProviderSettings(ollama_hosts=[first.host, second.host]))
+        set_llm_concurrency_bounds(1, 8)
+        try:
+            limiter = get_llm_concurrency_limiter(provider)
+            assert (limiter.min_limit, limiter.max_limit) == (2, 16)
+        finally:
+            set_llm_concurrency_bounds(1, 8)
+            await provider.aclose()
+
+    async def test_check_available_marks_unavailable_server_unhealthy(self, fake_servers):
+        closed_host, working = _closed_port_host(), fake_servers("working")
+        provider = OllamaLlmProvider(LlmProviderSettings(ollama_hosts=[closed_host, working.host]))
+        try:
+            await provider.check_available()
+        finally:
+            await provider.aclose()
+        assert [e.address for e in provider.endpoint_pool.healthy_endpoints()] == [working.host]
@@ -0,0 +1,84 @@
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+
+import pytest
+
+from app.tts import PiperSettings, PiperTextToSpeechEngineImpl, close_tts_engine, override_tts_engine_for_test
+from app.utils import DependencyUnavailableError
+from stub_tts_engine import CopyingAudioEncoderSettings
+
+FAKE_PIPER_PATH = os.path.join(os.path.dirname(__file__), "fake_piper.py")
+
+
+@pytest.mark.asyncio(loop_scope="class")
+class TestPiperTextToSpeech:
+    def setup_method(self) -> None:
+        self.voices_dir = tempfile.TemporaryDirectory()
+        for voice in ["de_voice", "en_voice"]:
+            open(os.path.join(self.voices_dir.name, f"{voice}.onnx"), "w").close()
+        self.engine = PiperTextToSpeechEngineImpl(
+            self.settings(processes_per_voice=2), encoder=CopyingAudioEncoderSettings(trim_silence=False)
+        )
+
+    def teardown_method(self) -> None:
+        self.engine.close()
+        self.voices_dir.cleanup()
+
+    def settings(self, processes_per_voice: int) -> PiperSettings:
+        return PiperSettings(
+            command=[sys.executable, FAKE_PIPER_PATH],
+            voices_dir=self.voices_dir.name,
+            voices={"de": "de_voice", "en": "en_voice"},
+            processes_per_voice=processes_per_voice,
+        )
+
+    async def speak(self, text: str, lang: str = "de") -> tuple[str, str, str]:
+        pid, voice, spoken_text = (await self.engine.text_to_speech(text, lang)).decode().strip().split(" ", 2)
+        return pid, voice, spoken_text
+
+    async def test_process_reused_for_clips(self):
+        clips = [await self.speak(f"Satz {i}") for i in range(5)]
+        assert [text for _, _, text in clips] == [f"Satz {i}" for i in range(5)]
+        assert len({pid for pid, _, _ in clips}) == 1
+
+    async def test_voice_by_language(self):
+        assert (await self.speak("Hund", "de"))[1] == "de_voice.onnx"
+        assert (await self.speak("dog", "en"))[1] == "en_voice.onnx"
+        with pytest.raises(ValueError):
+            await self.engine.text_to_speech("chien", "fr")
+
+    async def test_concurrent_clips_limited_to_processes_per_voice(self):
+        clips = await asyncio.gather(*[self.speak(f"Satz {i}") for i in range(10)])
+        assert sorted(text for _, _, text in clips) == sorted(f"Satz {i}" for i in range(10))
+        assert 1 <= len({pid for pid, _, _ in clips}) <= 2
+
+    async def test_crashed_process_replaced(self):
+        pid_before, _, _ = await self.speak("Hund")
+        with pytest.raises(subprocess.CalledProcessError):
+            await self.engine.text_to_speech("crash", "de")
+        pid_after, _, text = await self.speak("Katze")
+        assert text == "Katze"
+        assert pid_after != pid_before
+
+    async def test_temporary_wav_files_removed(self):
+        await self.speak("Hund")
+        assert os.listdir(self.engine._temp_dir.name) == []
+
+    async def test_missing_voice_model(self):
+        os.remove(os.path.join(self.voices_dir.name, "en_voice.onnx"))
+        with pytest.raises(DependencyUnavailableError):
+            PiperTextToSpeechEngineImpl(self.settings(processes_per_voice=1))
+
+    async def test_description_changes_with_voice(self):
+        assert self.engine.describe("de") != self.engine.describe("en")
+
+    async def test_processes_stopped_when_engine_closed(self):
+        await self.speak("Hund")
+        processes = [process.process for pool in self.engine._pools.values() for process in pool._processes]
+        assert processes
+        override_tts_engine_for_test(self.engine)
+        close_tts_engine()
+        assert all(process.poll() is not None for process in processes)
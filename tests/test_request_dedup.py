@@ -0,0 +1,71 @@
+import asyncio
+import os
+import tempfile
+
+import pytest
+
+from app.anki_common import AudioFiles
+from app.english_data_extract import canonical_english_word
+from app.german_data_extract import canonical_german_word
+from app.main import group_duplicate_words
+from app.translate import override_global_translator_for_test, translate_text, translation_request_scope
+from app.tts import override_tts_engine_for_test
+from app.word_hints import WordHints
+from stub_translator import RecordingStubTranslator
+from stub_tts_engine import StubTextToSpeechEngine
+
+
+class TestCanonicalWord:
+    def test_german_article_and_note_removed(self):
+        assert canonical_german_word("die Katze") == canonical_german_word("Katze")
+        assert canonical_german_word("Katze (+Dat)") == canonical_german_word("  Katze ")
+
+    def test_german_case_kept(self):
+        assert canonical_german_word("Essen") != canonical_german_word("essen")
+
+    def test_english_case_and_spaces_ignored(self):
+        assert canonical_english_word("Give  Up") == canonical_english_word("give up")
+
+
+class TestGroupDuplicateWords:
+    def test_duplicates_share_unique_word(self):
+        words = [
+            ("Katze", WordHints(translated_ru="")),
+            ("Hund", WordHints(translated_ru="")),
+            ("die Katze", WordHints(translated_ru="кошка")),
+        ]
+        unique_words, indices = group_duplicate_words(words, canonical_german_word)
+        assert unique_words == [("die Katze", WordHints(translated_ru="кошка")), ("Hund", WordHints(translated_ru=""))]
+        assert indices == [0, 1, 0]
+
+
+@pytest.mark.asyncio(loop_scope="class")
+class TestTranslationRequestScope:
+    async def test_text_translated_once_in_scope(self):
+        translator = RecordingStubTranslator()
+        override_global_translator_for_test(translator)
+        with translation_request_scope():
+            tasks = [asyncio.create_task(translate_text("Katze", src="de", dest="en")) for _ in range(2)]
+        assert await asyncio.gather(*tasks) == ["KATZE", "KATZE"]
+        with translation_request_scope():
+            await translate_text("Katze", src="de", dest="en")
+            await translate_text("Katze", src="de", dest="en")
+            await translate_text("Katze", src="de", dest="ru")
+        assert translator.texts == ["Katze", "Katze", "Katze"]
+
+
+@pytest.mark.asyncio(loop_scope="class")
+class TestAudioFiles:
+    async def test_same_text_spoken_once(self):
+        engine = StubTextToSpeechEngine()
+        override_tts_engine_for_test(engine)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            audio_files = AudioFiles(temp_dir)
+            first = audio_files.add("die Katze", "de")
+            second = audio_files.add("die Katze", "de")
+            audio_files.add("die Katze", "en")
+            await audio_files.synthesize()
+            assert all(os.path.exists(path) for path in audio_files.media_files)
+        assert first == second
+        assert engine.texts == ["die Katze", "die Katze"]
+        assert len(audio_files.media_files) == 2
@@ -0,0 +1,72 @@
+import asyncio
+import json
+import re
+
+import pytest
+
+from app.common_data_extract import generate_sentence_example_with_llm, set_sentence_examples_batch_size
+from app.llm_interact import LlmProvider, override_global_llm_provider_for_test
+
+
+class BatchAwareStubLlmProvider(LlmProvider):
+    def __init__(self, batch_response: str):
+        self.batch_response = batch_response
+        self.prompts: list[str] = []
+
+    async def ask_llm(self, prompt: str) -> str:
+        self.prompts.append(prompt)
+        if "JSON array" in prompt:
+            return self.batch_response
+        word = re.search(r'"(.+)"', prompt).group(1)
+        return f"Ein Satz mit {word}."
+
+
+@pytest.mark.asyncio(loop_scope="class")
+class TestSentenceExamplesBatch:
+    def setup_method(self) -> None:
+        set_sentence_examples_batch_size(3)
+
+    def teardown_method(self) -> None:
+        set_sentence_examples_batch_size(1)
+
+    @staticmethod
+    async def generate_all(words: list[str]) -> list[str]:
+        return await asyncio.gather(
+            *[generate_sentence_example_with_llm(w, language="German", is_phrase=False) for w in words]
+        )
+
+    async def test_one_request_for_batch(self):
+        provider = BatchAwareStubLlmProvider(json.dumps(["Die Katze schläft.", "Der Hund bellt.", "Ich lese."]))
+        override_global_llm_provider_for_test(provider)
+        res = await self.generate_all(["Katze", "Hund", "lesen"])
+        assert res == ["Die Katze schläft.", "Der Hund bellt.", "Ich lese."]
+        assert len(provider.prompts) == 1
+
+    async def test_markdown_code_block_accepted(self):
+        response = "```json\n" + json.dumps(["Die Katze schläft.", "Der Hund bellt."]) + "\n```"
+        override_global_llm_provider_for_test(BatchAwareStubLlmProvider(response))
+        res = await self.generate_all(["Katze", "Hund"])
+        assert res == ["Die Katze schläft.", "Der Hund bellt."]
+
+    async def test_only_invalid_sentences_retried(self):
+        provider = BatchAwareStubLlmProvider(json.dumps(["Die Katze schläft.", "", "Ich lese."]))
+        override_global_llm_provider_for_test(provider)
+        res = await self.generate_all(["Katze", "Hund", "lesen"])
+        assert res == ["Die Katze schläft.", "Ein Satz mit Hund.", "Ich lese."]
+        assert len(provider.prompts) == 2
+        assert '"Hund"' in provider.prompts[1]
+
+    async def test_all_retried_on_wrong_count(self):
+        provider = BatchAwareStubLlmProvider(json.dumps(["Die Katze schläft."]))
+        override_global_llm_provider_for_test(provider)
+        res = await self.generate_all(["Katze", "Hund"])
+        assert res == ["Ein Satz mit Katze.", "Ein Satz mit Hund."]
+        # The batch prompt is asked again once before falling back to the single word prompts
+        assert len(provider.prompts) == 4
+
+    async def test_split_into_batches_by_size(self):
+        provider = BatchAwareStubLlmProvider(json.dumps(["Die Katze schläft.", "Der Hund bellt.", "Ich lese."]))
+        override_global_llm_provider_for_test(provider)
+        await self.generate_all(["Katze", "Hund", "lesen", "Maus"])
+        # Second batch contains a single word, so it's asked with the single word prompt
+        assert len(provider.prompts) == 2
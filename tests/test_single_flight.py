@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+from app.single_flight import SingleFlight
+
+
+class CountingCall:
+    def __init__(self, result: str = "result", error: Exception | None = None):
+        self.result = result
+        self.error = error
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self) -> str:
+        self.calls += 1
+        await self.release.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+@pytest.mark.asyncio(loop_scope="class")
+class TestSingleFlight:
+    def setup_method(self) -> None:
+        self.single_flight: SingleFlight[str] = SingleFlight()
+
+    async def test_concurrent_calls_with_same_key_coalesced(self):
+        call = CountingCall()
+        tasks = [asyncio.create_task(self.single_flight.run("key", call)) for _ in range(3)]
+        await asyncio.sleep(0)
+        call.release.set()
+        assert await asyncio.gather(*tasks) == ["result"] * 3
+        assert call.calls == 1
+        assert self.single_flight.in_flight_count() == 0
+
+    async def test_different_keys_not_coalesced(self):
+        call = CountingCall()
+        call.release.set()
+        await asyncio.gather(self.single_flight.run("a", call), self.single_flight.run("b", call))
+        assert call.calls == 2
+
+    async def test_completed_call_not_reused(self):
+        call = CountingCall()
+        call.release.set()
+        await self.single_flight.run("key", call)
+        await self.single_flight.run("key", call)
+        assert call.calls == 2
+
+    async def test_error_propagated_to_all_callers(self):
+        call = CountingCall(error=RuntimeError("failed"))
+        tasks = [asyncio.create_task(self.single_flight.run("key", call)) for _ in range(2)]
+        await asyncio.sleep(0)
+        call.release.set()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert call.calls == 1
+
+    async def test_cancelled_leader_doesnt_fail_follower(self):
+        call = CountingCall()
+        leader = asyncio.create_task(self.single_flight.run("key", call))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(self.single_flight.run("key", call))
+        await asyncio.sleep(0)
+        leader.cancel()
+        await asyncio.sleep(0)
+        call.release.set()
+        assert await follower == "result"
+        assert leader.cancelled()
+        assert call.calls == 2
+
+    async def test_cancelled_follower_doesnt_cancel_leader(self):
+        call = CountingCall()
+        leader = asyncio.create_task(self.single_flight.run("key", call))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(self.single_flight.run("key", call))
+        await asyncio.sleep(0)
+        follower.cancel()
+        await asyncio.sleep(0)
+        call.release.set()
+        assert await leader == "result"
+        assert follower.cancelled()
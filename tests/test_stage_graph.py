@@ -0,0 +1,129 @@
+import asyncio
+
+import pytest
+
+from app.german_data_extract import prepare_data_for_german_word
+from app.llm_interact import LlmProvider, override_global_llm_provider_for_test
+from app.stage_graph import Stage, StageCache, StageGraph, StageHooks
+from app.translate import Translator, override_global_translator_for_test
+from app.word_hints import WordHints
+
+
+class RecordingHooks(StageHooks):
+    def __init__(self) -> None:
+        self.finished: list[tuple[str, bool]] = []
+
+    def stage_finished(self, graph_name: str, stage_name: str, seconds: float, failed: bool) -> None:
+        self.finished.append((stage_name, failed))
+
+
+@pytest.mark.asyncio(loop_scope="class")
+class TestStageGraph:
+    async def test_independent_stages_run_concurrently(self):
+        both_started = asyncio.Barrier(2)
+
+        async def first() -> int:
+            await both_started.wait()
+            return 1
+
+        async def second() -> int:
+            await both_started.wait()
+            return 2
+
+        async def total(first: int, second: int) -> int:
+            return first + second
+
+        graph = StageGraph(
+            "test",
+            [Stage("total", total, depends_on=["first", "second"]), Stage("first", first), Stage("second", second)],
+        )
+        results = await asyncio.wait_for(graph.run(), timeout=1)
+        assert results == {"first": 1, "second": 2, "total": 3}
+
+    async def test_failure_cancels_other_stages(self):
+        cancelled = asyncio.Event()
+
+        async def failing() -> None:
+            raise ConnectionError("Failed")
+
+        async def slow() -> None:
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        hooks = RecordingHooks()
+        with pytest.raises(ConnectionError):
+            await StageGraph("test", [Stage("failing", failing), Stage("slow", slow)], hooks=hooks).run()
+        assert cancelled.is_set()
+        assert sorted(hooks.finished) == [("failing", True), ("slow", True)]
+
+    async def test_cached_stage_runs_once(self):
+        runs = []
+        cache = StageCache(max_entries=10)
+
+        async def word() -> str:
+            runs.append("word")
+            return "Katze"
+
+        async def upper(word: str) -> str:
+            return word.upper()
+
+        for _ in range(2):
+            graph = StageGraph(
+                "test",
+                [
+                    Stage("word", word, cache=cache, cache_key=lambda: "katze"),
+                    Stage("upper", upper, depends_on=["word"]),
+                ],
+            )
+            assert (await graph.run())["upper"] == "KATZE"
+        assert runs == ["word"]
+        assert cache.stats() == {"entries": 1, "hits": 1, "misses": 1}
+
+    async def test_cycle_rejected(self):
+        async def stage(**kwargs) -> None:
+            pass
+
+        with pytest.raises(ValueError):
+            StageGraph("test", [Stage("a", stage, depends_on=["b"]), Stage("b", stage, depends_on=["a"])])
+
+    async def test_unknown_dependency_rejected(self):
+        async def stage(**kwargs) -> None:
+            pass
+
+        with pytest.raises(ValueError):
+            StageGraph("test", [Stage("a", stage, depends_on=["b"])])
+
+
+class WaitingLlmProvider(LlmProvider):
+    """Answers only after the word was translated, so it hangs if the translations wait for the LLM."""
+
+    def __init__(self, word_translated: asyncio.Event) -> None:
+        self.word_translated = word_translated
+
+    async def ask_llm(self, prompt: str) -> str:
+        await self.word_translated.wait()
+        return "Die Katze schläft auf dem Sofa und träumt von Mäusen."
+
+
+class SignallingTranslator(Translator):
+    def __init__(self, word_translated: asyncio.Event) -> None:
+        self.word_translated = word_translated
+
+    async def translate_text(self, text: str, src: str, dest: str) -> str:
+        if text == "die Katze":
+            self.word_translated.set()
+        return "cat"
+
+
+@pytest.mark.asyncio(loop_scope="class")
+class TestGermanWordStages:
+    async def test_word_translated_while_sentence_generated(self):
+        word_translated = asyncio.Event()
+        override_global_llm_provider_for_test(WaitingLlmProvider(word_translated))
+        override_global_translator_for_test(SignallingTranslator(word_translated))
+        word_data = await asyncio.wait_for(prepare_data_for_german_word("Katze", WordHints("")), timeout=3)
+        assert word_data.sentence_example.startswith("Die Katze")
+        assert word_data.translated_en == "cat"
@@ -0,0 +1,47 @@
+import asyncio
+
+import pytest
+
+from app.startup import StartupChecks
+from app.utils import DependencyUnavailableError
+
+
+async def passing_check() -> None:
+    await asyncio.sleep(0)
+
+
+async def failing_check() -> None:
+    raise DependencyUnavailableError("Ollama is not accessible")
+
+
+@pytest.mark.asyncio(loop_scope="class")
+class TestStartupChecks:
+    def setup_method(self) -> None:
+        self.failures: list[str] = []
+
+    async def test_all_passed(self):
+        checks = StartupChecks({"a": passing_check, "b": passing_check}, on_failure=self.failures.append)
+        assert not checks.is_ready()
+        await checks.run()
+        assert checks.is_ready()
+        assert self.failures == []
+
+    async def test_failed_check_reported(self):
+        checks = StartupChecks({"llm": failing_check, "tts": passing_check}, on_failure=self.failures.append)
+        await checks.run()
+        assert not checks.is_ready()
+        assert checks.statuses == {"llm": "failed", "tts": "ok"}
+        assert self.failures == ["Ollama is not accessible"]
+
+    async def test_checks_run_concurrently(self):
+        started = asyncio.Event()
+
+        async def waits_for_other() -> None:
+            await asyncio.wait_for(started.wait(), 1)
+
+        async def starts() -> None:
+            started.set()
+
+        checks = StartupChecks({"first": waits_for_other, "second": starts}, on_failure=self.failures.append)
+        await checks.run()
+        assert checks.is_ready()
@@ -1,23 +1,38 @@
+import asyncio
 import os
 import tempfile
 
+import pytest
+
 from app import tts
 
 
+@pytest.mark.asyncio(loop_scope="class")
 class TestTextToSpeech:
     def setup_method(self):
         tts.init_tts_engine()
 
     @staticmethod
-    def run_test(word: str, lang: str):
+    async def run_test(word: str, lang: str):
         with tempfile.TemporaryDirectory() as tmp_dir:
             file_path = os.path.join(tmp_dir, "tts_test_file.mp3")
-            tts.text_to_speech_into_file(word, file_path, lang=lang)
+            await tts.text_to_speech_into_file(word, file_path, lang=lang)
             assert os.path.exists(file_path)
             assert os.path.getsize(file_path) > 0
 
-    def test_tts_works_for_german(self):
-        self.run_test("die Katze", lang="de")
+    async def test_tts_works_for_german(self):
+        await self.run_test("die Katze", lang="de")
+
+    async def test_tts_works_for_english(self):
+        await self.run_test("cat", lang="en")
 
-    def test_tts_works_for_english(self):
-        self.run_test("cat", lang="en")
+    async def test_tts_in_memory(self):
+        audio = await tts.text_to_speech("die Katze", lang="de")
+        # MPEG frame sync or ID3 tag
+        assert audio[:3] == b"ID3" or audio[0] == 0xFF
+
+    async def test_clips_synthesized_concurrently(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_paths = [os.path.join(tmp_dir, f"tts_test_file_{i}.mp3") for i in range(4)]
+            await asyncio.gather(*(tts.text_to_speech_into_file("die Katze", p, lang="de") for p in file_paths))
+            assert all(os.path.getsize(p) > 0 for p in file_paths)
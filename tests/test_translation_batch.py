@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+
+from app.translate import Translator, override_global_translator_for_test, set_translation_batching, translate_text
+
+
+class BatchRecordingStubTranslator(Translator):
+    def __init__(self) -> None:
+        self.batches: list[list[str]] = []
+
+    async def translate_text(self, text: str, src: str, dest: str) -> str:
+        self.batches.append([text])
+        return f"{text} ({dest})"
+
+    async def translate_many(self, texts: list[str], src: str, dest: str) -> list[str]:
+        self.batches.append(texts)
+        return [f"{text} ({dest})" for text in texts]
+
+
+class SingleTextStubTranslator(Translator):
+    async def translate_text(self, text: str, src: str, dest: str) -> str:
+        return text.upper()
+
+
+@pytest.mark.asyncio(loop_scope="class")
+class TestTranslationBatch:
+    def setup_method(self) -> None:
+        set_translation_batching(max_batch_size=3, max_delay_seconds=0.01)
+
+    def teardown_method(self) -> None:
+        set_translation_batching(max_batch_size=1, max_delay_seconds=0.05)
+
+    async def test_concurrent_translations_batched_by_languages(self):
+        translator = BatchRecordingStubTranslator()
+        override_global_translator_for_test(translator)
+        res = await asyncio.gather(
+            translate_text("Katze", src="de", dest="en"),
+            translate_text("Hund", src="de", dest="ru"),
+            translate_text("Maus", src="de", dest="en"),
+        )
+        assert res == ["Katze (en)", "Hund (ru)", "Maus (en)"]
+        assert sorted(translator.batches) == [["Hund"], ["Katze", "Maus"]]
+
+    async def test_split_into_batches_by_size(self):
+        translator = BatchRecordingStubTranslator()
+        override_global_translator_for_test(translator)
+        words = ["Katze", "Hund", "Maus", "Vogel"]
+        res = await asyncio.gather(*(translate_text(w, src="de", dest="en") for w in words))
+        assert res == [f"{w} (en)" for w in words]
+        assert [len(batch) for batch in translator.batches] == [3, 1]
+
+    async def test_batched_by_translator(self):
+        first_translator, second_translator = BatchRecordingStubTranslator(), BatchRecordingStubTranslator()
+        override_global_translator_for_test(first_translator)
+        first_task = asyncio.create_task(translate_text("Katze", src="de", dest="en"))
+        await asyncio.sleep(0)
+        override_global_translator_for_test(second_translator)
+        await asyncio.gather(first_task, translate_text("Hund", src="de", dest="en"))
+        assert first_translator.batches == [["Katze"]]
+        assert second_translator.batches == [["Hund"]]
+
+    async def test_default_translate_many_translates_separately(self):
+        override_global_translator_for_test(SingleTextStubTranslator())
+        res = await asyncio.gather(translate_text("katze", "de", "en"), translate_text("hund", "de", "en"))
+        assert res == ["KATZE", "HUND"]
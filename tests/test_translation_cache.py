@@ -0,0 +1,86 @@
+import os
+import tempfile
+
+import pytest
+
+from app.disk_cache import DiskCache
+from app.translate import (
+    override_global_translator_for_test,
+    set_global_translation_cache,
+    translate_text,
+    get_translation_metrics,
+)
+from app.translation_cache import CachedTranslation, TranslationCache, main
+from stub_translator import RecordingStubTranslator
+
+
+class OtherStubTranslator(RecordingStubTranslator):
+    pass
+
+
+@pytest.mark.asyncio(loop_scope="class")
+class TestTranslateTextCache:
+    def setup_method(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache = TranslationCache(DiskCache(os.path.join(self.temp_dir.name, "tr.sqlite3"), max_entries=10))
+        set_global_translation_cache(self.cache)
+
+    def teardown_method(self) -> None:
+        set_global_translation_cache(None)
+        self.cache.close()
+        self.temp_dir.cleanup()
+
+    async def test_second_translation_served_from_cache(self):
+        translator = RecordingStubTranslator("cat")
+        override_global_translator_for_test(translator)
+        assert await translate_text("Katze", src="de", dest="en") == "cat"
+        assert await translate_text("Katze", src="de", dest="en") == "cat"
+        assert translator.texts == ["Katze"]
+        assert get_translation_metrics()["cache"]["hits"] == 1
+
+    async def test_languages_not_mixed(self):
+        translator = RecordingStubTranslator("translation")
+        override_global_translator_for_test(translator)
+        await translate_text("Katze", src="de", dest="en")
+        await translate_text("Katze", src="de", dest="ru")
+        assert translator.texts == ["Katze", "Katze"]
+
+    async def test_backends_not_mixed(self):
+        override_global_translator_for_test(RecordingStubTranslator("cat"))
+        await translate_text("Katze", src="de", dest="en")
+        other_translator = OtherStubTranslator("kitty")
+        override_global_translator_for_test(other_translator)
+        assert await translate_text("Katze", src="de", dest="en") == "kitty"
+
+    async def test_source_text_stored(self):
+        override_global_translator_for_test(RecordingStubTranslator("cat"))
+        await translate_text("Katze", src="de", dest="en")
+        assert self.cache.entries() == [
+            CachedTranslation(text="Katze", src="de", dest="en", backend="RecordingStubTranslator", translation="cat")
+        ]
+
+
+class TestTranslationCacheCli:
+    def setup_method(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "tr.sqlite3")
+        cache = TranslationCache(DiskCache(self.path, max_entries=10))
+        cache.put("Katze", "de", "en", "GoogleTranslatorImpl", "cat")
+        cache.put("Hund", "de", "en", "GoogleTranslatorImpl", "dog")
+        cache.close()
+
+    def teardown_method(self) -> None:
+        self.temp_dir.cleanup()
+
+    def test_stats(self, capsys):
+        main(["--path", self.path, "stats"])
+        assert "2 cached translations" in capsys.readouterr().out
+
+    def test_list(self, capsys):
+        main(["--path", self.path, "list", "--limit", "1"])
+        assert capsys.readouterr().out == "[GoogleTranslatorImpl de->en] Hund -> dog\n"
+
+    def test_clear(self, capsys):
+        main(["--path", self.path, "clear"])
+        main(["--path", self.path, "stats"])
+        assert "0 cached translations" in capsys.readouterr().out
@@ -0,0 +1,164 @@
+import io
+import os
+import struct
+import sys
+import tempfile
+import wave
+
+import numpy as np
+import pytest
+
+from app.audio_cache import AudioCache
+from app.audio_segments import pcm_from_wav, split_at_silences
+from app.tts import (
+    MacTextToSpeechEngineImpl,
+    override_tts_engine_for_test,
+    set_global_audio_cache,
+    set_tts_batch_size,
+    set_tts_max_workers,
+    text_to_speech_batch_into_files,
+)
+from stub_tts_engine import CopyingAudioEncoderSettings, StubTextToSpeechEngine
+
+FAKE_SAY_PATH = os.path.join(os.path.dirname(__file__), "fake_say.py")
+
+SAMPLE_RATE = 1000
+
+
+def speech(seconds: float) -> np.ndarray:
+    return np.full(int(seconds * SAMPLE_RATE), 5000, dtype=np.int16)
+
+
+def silence(seconds: float) -> np.ndarray:
+    return np.zeros(int(seconds * SAMPLE_RATE), dtype=np.int16)
+
+
+class TestAudioSegments:
+    def test_pcm_from_wav(self):
+        samples = np.arange(-100, 100, dtype=np.int16)
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(SAMPLE_RATE)
+            wav.writeframes(samples.tobytes())
+        decoded_samples, sample_rate = pcm_from_wav(buffer.getvalue())
+        assert np.array_equal(decoded_samples, samples)
+        assert sample_rate == SAMPLE_RATE
+
+    def test_pcm_from_streamed_wav_with_unknown_size(self):
+        samples = np.arange(10, dtype=np.int16)
+        fmt = struct.pack("<HHIIHH", 1, 1, 22050, 44100, 2, 16)
+        header = b"RIFF\xff\xff\xff\xffWAVEfmt \x10\x00\x00\x00" + fmt + b"data\xff\xff\xff\xff"
+        decoded_samples, sample_rate = pcm_from_wav(header + samples.tobytes())
+        assert np.array_equal(decoded_samples, samples)
+        assert sample_rate == 22050
+
+    def test_not_wav(self):
+        with pytest.raises(ValueError):
+            pcm_from_wav(b"ID3 not a wav file")
+
+    def test_split_at_longest_silences(self):
+        # The short pause inside the second utterance is not a separator
+        samples = np.concatenate(
+            [silence(0.2), speech(0.5), silence(1.0), speech(0.3), silence(0.4), speech(0.3), silence(1.0), speech(1)]
+        )
+        segments = split_at_silences(
+            samples, count=3, sample_rate=SAMPLE_RATE, min_silence_seconds=0.8, keep_silence_seconds=0.1
+        )
+        assert segments is not None
+        assert [len(segment) for segment in segments] == [800, 1200, 1100]
+        assert np.array_equal(np.concatenate([segments[0], silence(0.8)]), samples[:1600])
+
+    def test_not_split_without_enough_silences(self):
+        samples = np.concatenate([speech(0.5), silence(0.4), speech(0.5)])
+        assert split_at_silences(samples, count=2, sample_rate=SAMPLE_RATE, min_silence_seconds=0.8) is None
+
+    def test_single_segment(self):
+        samples = speech(1)
+        assert split_at_silences(samples, count=1, sample_rate=SAMPLE_RATE, min_silence_seconds=0.8) == [samples]
+
+
+class BatchingStubTextToSpeechEngine(StubTextToSpeechEngine):
+    def __init__(self) -> None:
+        super().__init__()
+        self.batches: list[list[str]] = []
+
+    async def text_to_speech_batch(self, texts: list[str], lang: str) -> list[bytes]:
+        self.batches.append(texts)
+        return [f"{lang}:{text}".encode() for text in texts]
+
+
+@pytest.mark.asyncio(loop_scope="class")
+class TestBatchTextToSpeech:
+    def setup_method(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.engine = BatchingStubTextToSpeechEngine()
+        override_tts_engine_for_test(self.engine)
+
+    def teardown_method(self) -> None:
+        set_tts_batch_size(20)
+        set_tts_max_workers(os.cpu_count() or 1)
+        set_global_audio_cache(None)
+        self.temp_dir.cleanup()
+
+    def texts_and_paths(self, texts: list[str]) -> list[tuple[str, str]]:
+        return [(text, os.path.join(self.temp_dir.name, f"{i}.mp3")) for i, text in enumerate(texts)]
+
+    async def test_clips_written_to_their_files(self):
+        texts_and_paths = self.texts_and_paths(["Hund", "Katze", "Maus"])
+        await text_to_speech_batch_into_files(texts_and_paths, lang="de")
+        for text, path in texts_and_paths:
+            with open(path, "rb") as f:
+                assert f.read() == f"de:{text}".encode()
+
+    async def test_one_batch_per_worker(self):
+        set_tts_max_workers(2)
+        await text_to_speech_batch_into_files(self.texts_and_paths([f"Wort {i}" for i in range(10)]), lang="de")
+        assert [len(batch) for batch in self.engine.batches] == [5, 5]
+
+    async def test_batch_size_limited(self):
+        set_tts_max_workers(1)
+        set_tts_batch_size(4)
+        await text_to_speech_batch_into_files(self.texts_and_paths([f"Wort {i}" for i in range(10)]), lang="de")
+        assert [len(batch) for batch in self.engine.batches] == [4, 4, 2]
+
+    async def test_cached_clips_not_synthesized(self):
+        set_global_audio_cache(AudioCache(os.path.join(self.temp_dir.name, "audio"), max_bytes=1000))
+        await text_to_speech_batch_into_files(self.texts_and_paths(["Hund"]), lang="de")
+        await text_to_speech_batch_into_files(self.texts_and_paths(["Hund", "Katze"]), lang="de")
+        assert self.engine.batches == [["Hund"], ["Katze"]]
+
+
+@pytest.mark.asyncio(loop_scope="class")
+class TestMacTextToSpeechBatch:
+    def setup_method(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.log_path = os.path.join(self.temp_dir.name, "say.log")
+        self.engine = MacTextToSpeechEngineImpl(
+            encoder=CopyingAudioEncoderSettings(trim_silence=False),
+            command=[sys.executable, FAKE_SAY_PATH, "--log", self.log_path],
+        )
+
+    def teardown_method(self) -> None:
+        self.temp_dir.cleanup()
+
+    def spoken_texts(self) -> list[str]:
+        with open(self.log_path) as f:
+            return f.read().splitlines()
+
+    @staticmethod
+    def clip_text(clip: bytes) -> str:
+        # The silence kept around the clip is zero samples
+        return clip.strip(b"\x00").decode().strip()
+
+    async def test_batch_spoken_by_one_run_with_silences(self):
+        clips = await self.engine.text_to_speech_batch(["die Katze", "der Hund", "die Maus"], "de")
+        assert [self.clip_text(clip) for clip in clips] == ["die Katze", "der Hund", "die Maus"]
+        assert self.spoken_texts() == ["die Katze [[slnc 1000]] der Hund [[slnc 1000]] die Maus"]
+
+    async def test_spoken_separately_if_not_split(self):
+        texts = ["die Katze", "without pause"]
+        clips = await self.engine.text_to_speech_batch(texts, "de")
+        assert [self.clip_text(clip) for clip in clips] == texts
+        assert self.spoken_texts() == ["die Katze [[slnc 1000]] without pause", "die Katze", "without pause"]
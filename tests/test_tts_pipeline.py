@@ -0,0 +1,9 @@
+import pytest
+
+from app.tts import run_command
+
+
+@pytest.mark.asyncio(loop_scope="class")
+class TestTtsPipeline:
+    async def test_command_output_returned(self):
+        assert await run_command(["printf", "mp3"]) == b"mp3"
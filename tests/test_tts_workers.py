@@ -0,0 +1,44 @@
+import os
+import tempfile
+
+import pytest
+
+from app import english_anki_generate
+from app.english_data_extract import EnglishWordData
+from app.tts import override_tts_engine_for_test, set_tts_max_workers
+from stub_tts_engine import StubTextToSpeechEngine
+
+
+@pytest.mark.asyncio(loop_scope="class")
+class TestTtsWorkers:
+    def setup_method(self) -> None:
+        self.engine = StubTextToSpeechEngine(delay_seconds=0.01)
+        override_tts_engine_for_test(self.engine)
+
+    def teardown_method(self) -> None:
+        set_tts_max_workers(os.cpu_count() or 1)
+
+    async def export_deck(self, words: list[str]) -> None:
+        word_data = [
+            EnglishWordData(
+                original_word=word,
+                translated="_",
+                sentence_example=f"A sentence with {word}.",
+                sentence_example_translated="_",
+            )
+            for word in words
+        ]
+        with tempfile.NamedTemporaryFile(suffix=".apkg") as tmp_file:
+            await english_anki_generate.export_results_to_anki_deck(word_data, tmp_file.name)
+            assert os.path.getsize(tmp_file.name) > 0
+
+    async def test_clips_synthesized_concurrently_up_to_limit(self):
+        set_tts_max_workers(3)
+        await self.export_deck([f"word{i}" for i in range(10)])
+        assert len(self.engine.texts) == 20
+        assert self.engine.max_in_flight == 3
+
+    async def test_single_worker(self):
+        set_tts_max_workers(1)
+        await self.export_deck(["cat", "dog"])
+        assert self.engine.max_in_flight == 1